@@ -1,4 +1,12 @@
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+import time
+
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework.permissions import AllowAny
 
@@ -8,3 +16,44 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
     permission_classes = [AllowAny]  # Allow any user to access this view
+
+def blacklist_key(jti):
+    return f'token:blacklisted:{jti}'
+
+def remember_blacklisted(jti, blacklisted, exp):
+    """
+    Cache the blacklist answer for a token until it expires (exp is a Unix
+    time); once expired the token fails verification anyway.
+
+    A blacklisted answer overwrites whatever is cached. A not-blacklisted
+    answer is only added, so a lookup that read the database just before
+    the token was blacklisted cannot hide it.
+    """
+    timeout = int(exp - time.time())
+    if timeout <= 0:
+        return
+    if blacklisted:
+        cache.set(blacklist_key(jti), True, timeout)
+    else:
+        cache.add(blacklist_key(jti), False, timeout)
+
+class CachedBlacklistRefreshToken(RefreshToken):
+    """
+    RefreshToken whose blacklist check reads the cache first.
+
+    Most refresh tokens are never blacklisted, and the same token is
+    refreshed many times, so the answer is cached for the token's
+    lifetime. Blacklisting (accounts.signals) updates the cached answer.
+    """
+
+    def check_blacklist(self):
+        jti = self.payload[api_settings.JTI_CLAIM]
+        blacklisted = cache.get(blacklist_key(jti))
+        if blacklisted is None:
+            blacklisted = BlacklistedToken.objects.filter(token__jti=jti).exists()
+            remember_blacklisted(jti, blacklisted, self.payload['exp'])
+        if blacklisted:
+            raise TokenError(_('Token is blacklisted'))
+
+class CachedBlacklistTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = CachedBlacklistRefreshToken
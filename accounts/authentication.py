@@ -0,0 +1,147 @@
+"""
+JWT authentication without a user query on most requests.
+
+JWTAuthentication loads request.user from the database on every request.
+CachedJWTAuthentication looks the user up in two cache layers first:
+
+* a small LRU in this process, whose entries live AUTH_USER_LOCAL_TTL
+  seconds, so that a change made through another process shows within
+  that time;
+* the shared cache, for AUTH_USER_CACHE_TIMEOUT seconds.
+
+Only the fields that request handling reads (CACHED_FIELDS) are cached,
+with a digest of the password hash for token revocation, never the hash
+itself. The user is rebuilt from them with every other field deferred, so
+a view that reads one still gets it, with a query.
+
+Saving or deleting a user (accounts.signals) drops it from both layers and
+leaves a short-lived tombstone in the shared cache. While it is there,
+lookups go to the database and their results are not cached, so a request
+that read the row just before the change cannot put the old row back.
+Bulk updates (QuerySet.update) send no signals; call invalidate_user() for
+them.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+TOMBSTONE = 'invalidated'
+# Seconds; longer than the transaction that saved the user takes to commit
+TOMBSTONE_TIMEOUT = 10
+
+# What views read from request.user
+CACHED_FIELDS = ('id', 'email', 'is_active', 'is_staff')
+
+def user_key(user_id):
+    return f'auth:user:{user_id}'
+
+def user_entry(user):
+    """The cached form of a user: (CACHED_FIELDS values, password hash digest)"""
+    return tuple(getattr(user, field) for field in CACHED_FIELDS), get_md5_hash_password(user.password)
+
+class LocalUserCache:
+    """Thread-safe LRU of cached users, each kept for `ttl` seconds"""
+
+    def __init__(self, size=1000, ttl=5.0, clock=time.monotonic):
+        self.size = size
+        self.ttl = ttl
+        self.clock = clock
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, user_id):
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is None:
+                return None
+            user, expires = entry
+            if self.clock() >= expires:
+                del self.entries[user_id]
+                return None
+            self.entries.move_to_end(user_id)
+            return user
+
+    def set(self, user_id, user):
+        with self.lock:
+            self.entries[user_id] = (user, self.clock() + self.ttl)
+            self.entries.move_to_end(user_id)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def delete(self, user_id):
+        with self.lock:
+            self.entries.pop(user_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+local_users = LocalUserCache(settings.AUTH_USER_LOCAL_SIZE, settings.AUTH_USER_LOCAL_TTL)
+
+def invalidate_user(user_id):
+    """Make the next lookup of this user read the database"""
+    local_users.delete(str(user_id))
+    cache.set(user_key(user_id), TOMBSTONE, TOMBSTONE_TIMEOUT)
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that takes the user from the cache; see the module docstring"""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_('Token contained no recognizable user identification')) from e
+
+        user, password_digest = self.load_user(user_id)
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != password_digest:
+                raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+        return user
+
+    def load_user(self, user_id):
+        """Return (user, digest of their password hash)"""
+        # Tokens carry the id as a string; the cache keys use it as is
+        user_id = str(user_id)
+        entry = local_users.get(user_id)
+        if entry is not None:
+            return self.build_user(entry)
+
+        key = user_key(user_id)
+        cached = cache.get(key)
+        if cached is not None and cached != TOMBSTONE:
+            local_users.set(user_id, cached)
+            return self.build_user(cached)
+
+        try:
+            user = self.user_model.objects.get(**{api_settings.USER_ID_FIELD: user_id})
+        except self.user_model.DoesNotExist as e:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found') from e
+        entry = user_entry(user)
+        if cached is None:
+            # add() loses to a tombstone set since the read above
+            if cache.add(key, entry, settings.AUTH_USER_CACHE_TIMEOUT):
+                local_users.set(user_id, entry)
+        return user, entry[1]
+
+    def build_user(self, entry):
+        # A new instance per request, since views may change request.user
+        values, password_digest = entry
+        fields = dict(zip(CACHED_FIELDS, values))
+        # from_db() takes the values in the model's field order
+        names = [field.attname for field in self.user_model._meta.concrete_fields if field.attname in fields]
+        user = self.user_model.from_db(
+            router.db_for_read(self.user_model), names, [fields[name] for name in names],
+        )
+        return user, password_digest
@@ -0,0 +1,28 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from events.signals import EVENTS_VERSION
+from movie2gether.conditional import bump_version
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from .auth import remember_blacklisted
+from .authentication import invalidate_user
+
+User = get_user_model()
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, update_fields=None, **kwargs):
+    # Now, so this process stops serving the old row at once, and again on
+    # commit, since a lookup may have cached it before the commit
+    invalidate_user(instance.pk)
+    transaction.on_commit(lambda: invalidate_user(instance.pk))
+    # Cached public event lists show the host's email; saves that name
+    # their fields without it (last_login on every login) leave them be
+    if update_fields is None or 'email' in update_fields:
+        transaction.on_commit(lambda: bump_version(EVENTS_VERSION))
+
+@receiver(post_save, sender=BlacklistedToken)
+def token_blacklisted(sender, instance, **kwargs):
+    token = instance.token
+    remember_blacklisted(token.jti, True, token.expires_at.timestamp())
@@ -0,0 +1,34 @@
+from celery import shared_task
+from django.conf import settings
+from django.db import transaction
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.utils import aware_utcnow
+import logging
+
+logger = logging.getLogger(__name__)
+
+@shared_task
+def flush_expired_tokens(batch_size=None):
+    """
+    Delete expired outstanding tokens and their blacklist entries.
+
+    Like simplejwt's flushexpiredtokens command, but in batches of
+    TOKEN_CLEANUP_BATCH_SIZE, each in its own short transaction, so the
+    tables are never locked for long. Returns the number of tokens deleted.
+    """
+    batch_size = batch_size or settings.TOKEN_CLEANUP_BATCH_SIZE
+    now = aware_utcnow()
+    deleted = 0
+    while True:
+        ids = list(
+            OutstandingToken.objects.filter(expires_at__lte=now).order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        with transaction.atomic():
+            BlacklistedToken.objects.filter(token_id__in=ids).delete()
+            OutstandingToken.objects.filter(id__in=ids).delete()
+        deleted += len(ids)
+    if deleted:
+        logger.info('Deleted %s expired tokens', deleted)
+    return deleted
@@ -0,0 +1,111 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from .authentication import CachedJWTAuthentication, LocalUserCache, local_users, user_key
+from .tasks import flush_expired_tokens
+
+User = get_user_model()
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    """Authenticated requests take the user from the cache until it changes"""
+
+    def setUp(self):
+        cache.clear()
+        local_users.clear()
+        self.user = User.objects.create_user(email='user@example.com', username='user', password='pw')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def user_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/accounts/profile/')
+        self.assertEqual(response.status_code, 200)
+        return sum('FROM "accounts_customuser"' in query['sql'] for query in queries)
+
+    def test_cached(self):
+        # The profile view itself reads the user once
+        cache.clear()
+        self.assertEqual(self.user_queries(), 2)
+        self.assertEqual(self.user_queries(), 1)
+        local_users.clear()
+        self.assertEqual(self.user_queries(), 1)
+
+    def test_deactivated(self):
+        self.client.get('/api/accounts/profile/')
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/accounts/profile/').status_code, 401)
+
+    def test_profile_update(self):
+        self.client.get('/api/accounts/profile/')
+        response = self.client.patch('/api/accounts/profile/', {'bio': 'Hello'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get('/api/accounts/profile/').data['bio'], 'Hello')
+
+    def test_cache_holds_no_password_hash(self):
+        cache.clear()
+        self.client.get('/api/accounts/profile/')
+        entry = cache.get(user_key(self.user.id))
+        self.assertIsNotNone(entry)
+        self.assertNotIn(self.user.password, repr(entry))
+        user, password_digest = CachedJWTAuthentication().load_user(self.user.id)
+        self.assertEqual((user.pk, user.email, user.is_active), (self.user.pk, self.user.email, True))
+        # Other fields are deferred, not stale
+        with self.assertNumQueries(1):
+            self.assertEqual(user.username, 'user')
+
+    def test_local_cache(self):
+        now = [0.0]
+        users = LocalUserCache(size=2, ttl=5, clock=lambda: now[0])
+        users.set('1', 'a')
+        users.set('2', 'b')
+        users.get('1')
+        users.set('3', 'c')
+        self.assertEqual((users.get('1'), users.get('2'), users.get('3')), ('a', None, 'c'))
+        now[0] = 5
+        self.assertIsNone(users.get('1'))
+
+
+class TokenBlacklistTests(TestCase):
+    """Refreshes check the blacklist in the cache; expired tokens get flushed"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='user@example.com', username='user', password='pw')
+        self.client = APIClient()
+
+    def refresh(self, token):
+        return self.client.post('/api/accounts/token/refresh/', {'refresh': str(token)}, format='json')
+
+    def test_refresh(self):
+        token = RefreshToken.for_user(self.user)
+        self.assertEqual(self.refresh(token).status_code, 200)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.refresh(token).status_code, 200)
+        self.assertFalse(any('token_blacklist' in query['sql'] for query in queries))
+
+        self.client.force_authenticate(self.user)
+        response = self.client.post('/api/accounts/logout/', {'refresh': str(token)}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.refresh(token).status_code, 401)
+
+    def test_flush_expired_tokens(self):
+        expired = [RefreshToken.for_user(self.user) for _ in range(5)]
+        current = RefreshToken.for_user(self.user)
+        expired[0].blacklist()
+        OutstandingToken.objects.filter(jti__in=[token['jti'] for token in expired]).update(
+            expires_at=timezone.now() - timedelta(minutes=1)
+        )
+        self.assertEqual(flush_expired_tokens(batch_size=2), 5)
+        self.assertEqual(list(OutstandingToken.objects.values_list('jti', flat=True)), [current['jti']])
+        self.assertFalse(BlacklistedToken.objects.exists())
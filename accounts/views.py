@@ -5,6 +5,7 @@ from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import BlacklistMixin, RefreshToken
 from rest_framework_simplejwt.exceptions import TokenError
 from django.contrib.auth import authenticate, get_user_model
+from .auth import CachedBlacklistRefreshToken
 from .serializers import (
     UserRegistrationSerializer,
     LoginSerializer,
@@ -57,7 +58,7 @@ class LogoutView(generics.GenericAPIView):
         try:
             refresh_token = request.data.get('refresh')
             if refresh_token:
-                token = RefreshToken(refresh_token)
+                token = CachedBlacklistRefreshToken(refresh_token)
                 token.blacklist()
                 return Response(
                     {"detail": "Successfully logged out."},
@@ -84,27 +85,30 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
     permission_classes = [IsAuthenticated]
 
     def get_object(self):
-        return self.request.user
+        # request.user may come from the authentication cache; never save
+        # a cached row back over the current one
+        return User.objects.get(pk=self.request.user.pk)
 
 class ChangePasswordView(generics.UpdateAPIView):
     serializer_class = ChangePasswordSerializer
     permission_classes = [IsAuthenticated]
 
     def get_object(self):
-        return self.request.user
+        return User.objects.get(pk=self.request.user.pk)
 
     def update(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
+        user = self.get_object()
 
         # Check old password
-        if not self.get_object().check_password(serializer.data.get("old_password")):
+        if not user.check_password(serializer.data.get("old_password")):
             return Response({"old_password": ["Wrong password."]}, 
                           status=status.HTTP_400_BAD_REQUEST)
 
         # Set new password
-        self.get_object().set_password(serializer.data.get("new_password"))
-        self.get_object().save()
+        user.set_password(serializer.data.get("new_password"))
+        user.save()
 
         return Response({"message": "Password updated successfully"}, 
                       status=status.HTTP_200_OK)
@@ -0,0 +1,112 @@
+"""
+Compare the WSGI and ASGI OMDb search endpoints under concurrent load.
+
+Start a fake OMDb with realistic latency, then the same project under a
+threaded WSGI server and under a single ASGI worker, both pointed at it:
+
+    python -m movies.fake_omdb --port 8765 --latency 0.2
+    OMDB_BASE_URL=http://127.0.0.1:8765/ gunicorn movie2gether.wsgi -w 1 --threads 8 -b 127.0.0.1:8000
+    OMDB_BASE_URL=http://127.0.0.1:8765/ uvicorn movie2gether.asgi:application --workers 1 --port 8001
+
+and run:
+
+    python -m benchmarks.omdb_proxy --email user@example.com --password secret \\
+        --wsgi http://127.0.0.1:8000 --asgi http://127.0.0.1:8001 --concurrency 200 --requests 2000
+
+Every request asks for a distinct title so that the cache never answers it.
+Results are printed as JSON.
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import uuid
+
+import httpx
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def obtain_token(client, base_url, email, password):
+    response = await client.post(f'{base_url}/api/accounts/token/', json={'email': email, 'password': password})
+    response.raise_for_status()
+    return response.json()['access']
+
+
+async def run(base_url, path, token, concurrency, total):
+    run_id = uuid.uuid4().hex[:8]
+    latencies = []
+    errors = 0
+    queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(f'Benchmark {run_id} {i}')
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+        headers = {'Authorization': f'Bearer {token}'}
+
+        async def worker():
+            nonlocal errors
+            while not queue.empty():
+                title = queue.get_nowait()
+                started = time.perf_counter()
+                try:
+                    response = await client.get(f'{base_url}{path}', params={'title': title}, headers=headers)
+                    if response.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        'url': f'{base_url}{path}',
+        'requests': total,
+        'errors': errors,
+        'concurrency': concurrency,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(total / elapsed, 1),
+        'latency_ms': {
+            'mean': round(statistics.mean(latencies) * 1000, 1),
+            'p50': round(percentile(latencies, 0.50) * 1000, 1),
+            'p95': round(percentile(latencies, 0.95) * 1000, 1),
+            'p99': round(percentile(latencies, 0.99) * 1000, 1),
+        },
+    }
+
+
+async def main(args):
+    async with httpx.AsyncClient() as client:
+        token = await obtain_token(client, args.wsgi or args.asgi, args.email, args.password)
+
+    results = {}
+    if args.wsgi:
+        results['wsgi'] = await run(args.wsgi, '/api/movies/omdb/', token, args.concurrency, args.requests)
+    if args.asgi:
+        results['asgi'] = await run(args.asgi, '/api/movies/omdb/async/', token, args.concurrency, args.requests)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the WSGI and ASGI OMDb search endpoints.')
+    parser.add_argument('--wsgi', help='Base URL of the WSGI server')
+    parser.add_argument('--asgi', help='Base URL of the ASGI server')
+    parser.add_argument('--email', required=True)
+    parser.add_argument('--password', required=True)
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--requests', type=int, default=1000)
+    args = parser.parse_args()
+    if not (args.wsgi or args.asgi):
+        parser.error('pass --wsgi, --asgi or both')
+    asyncio.run(main(args))
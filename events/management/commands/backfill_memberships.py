@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from events.models import Event, EventMembership, Invitation
+
+class Command(BaseCommand):
+    """
+    Build EventMembership rows from existing events and invitations.
+
+    Migration 0007 does this once when the membership table is created.
+    The command is idempotent, so it can be re-run to repair memberships,
+    e.g. after data was written with signals disabled. Rows are written in batches, each in its
+    own transaction, walking the tables by primary key.
+    """
+    help = 'Create the event memberships of existing hosts and invitees'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        # Hosts first, so a host who is also invited keeps the host role
+        hosts = self.backfill(
+            Event.objects.only('id', 'host_id'),
+            EventMembership.objects.add_hosts,
+            batch_size,
+        )
+        self.stdout.write(f'{hosts} events processed')
+
+        invitees = self.backfill(
+            Invitation.objects.filter(invitee__isnull=False).only('id', 'event_id', 'invitee_id'),
+            EventMembership.objects.add_invitees,
+            batch_size,
+        )
+        self.stdout.write(f'{invitees} invitations processed')
+        self.stdout.write(self.style.SUCCESS('Memberships backfilled'))
+
+    def backfill(self, queryset, add, batch_size):
+        processed = 0
+        last_id = 0
+        while True:
+            batch = list(queryset.filter(id__gt=last_id).order_by('id')[:batch_size])
+            if not batch:
+                return processed
+            with transaction.atomic():
+                add(batch)
+            processed += len(batch)
+            last_id = batch[-1].id
@@ -0,0 +1,98 @@
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import RequestFactory
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from events.models import Event, Invitation
+from events.serializers import InvitationSerializer, PublicEventSerializer, invitation_projection, public_event_projection
+from movie2gether.renderers import ORJSONRenderer
+from movies.models import Movie
+
+User = get_user_model()
+
+class Rollback(Exception):
+    pass
+
+class Command(BaseCommand):
+    """
+    Compare ModelSerializer + JSONRenderer with the .values() projections
+    + ORJSONRenderer used by the public event and invitation lists.
+
+    The data is generated inside a transaction that is rolled back at the
+    end, so the command can be pointed at any database. Each run times the
+    whole read: query, building the response data and rendering it. The
+    command fails if the two paths do not produce the same bytes.
+    """
+    help = 'Benchmark the fast list serializers against the DRF serializers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=500, help='Events and invitations to generate')
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options['rows'], options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, rows, repeat):
+        host = User.objects.create_user(email='benchmark-host@example.com', username='benchmark-host')
+        guest = User.objects.create_user(email='benchmark-guest@example.com', username='benchmark-guest')
+        movie = Movie.objects.create(
+            title='Benchmark', description='Benchmark movie', release_date=date(2000, 1, 1),
+            poster_url='https://example.com/poster.jpg', imdb_id='tt-benchmark',
+        )
+        start = timezone.now() + timedelta(days=1)
+        events = Event.objects.bulk_create([
+            Event(movie=movie, title=f'Event {i}', description='Movie night   snacks', date=start + timedelta(hours=i),
+                  location='Somewhere', host=host)
+            for i in range(rows)
+        ])
+        Invitation.objects.bulk_create([
+            Invitation(event=event, invitee=guest if i % 2 else None, invitee_email=guest.email)
+            for i, event in enumerate(events)
+        ])
+
+        request = Request(RequestFactory().get('/'))
+        request.user = guest
+        context = {'request': request}
+
+        public_events = Event.objects.filter(date__gte=timezone.now()).select_related('movie', 'host').order_by('-created_at', '-id')
+        self.compare(
+            'Public events', repeat,
+            lambda: JSONRenderer().render(PublicEventSerializer(public_events.all(), many=True, context=context).data),
+            lambda: ORJSONRenderer().render(public_event_projection.serialize(public_event_projection.values(public_events.all()), context)),
+        )
+
+        invitations = Invitation.objects.filter(invitee_email=guest.email).select_related('event__movie', 'event__host', 'invitee').order_by('id')
+        self.compare(
+            'Invitations', repeat,
+            lambda: JSONRenderer().render(InvitationSerializer(invitations.all(), many=True, context=context).data),
+            lambda: ORJSONRenderer().render(invitation_projection.serialize(invitation_projection.values(invitations.all()), context)),
+        )
+
+    def compare(self, name, repeat, baseline, fast):
+        if baseline() != fast():
+            raise CommandError(f'{name}: the fast path output differs from the serializer output')
+        baseline_time = self.time(baseline, repeat)
+        fast_time = self.time(fast, repeat)
+        self.stdout.write(
+            f'{name}: serializer {baseline_time * 1000:.1f}ms, projection {fast_time * 1000:.1f}ms, '
+            f'{baseline_time / fast_time:.1f}x faster'
+        )
+
+    def time(self, func, repeat):
+        # Best of `repeat`, to leave out noise from other processes
+        best = float('inf')
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - started)
+        return best
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+from movie2gether.db import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # Build the indexes without blocking writes to large tables
+    atomic = False
+
+    dependencies = [
+        ('events', '0005_eventmembership'),
+        ('movies', '0003_movie_search_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='event',
+            index=models.Index(fields=['date', 'created_at'], name='event_date_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='invitation',
+            index=models.Index(fields=['invitee_email', 'status'], name='invitation_email_status_idx'),
+        ),
+    ]
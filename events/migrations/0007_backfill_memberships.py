@@ -0,0 +1,57 @@
+from django.db import migrations
+
+BATCH_SIZE = 5000
+
+
+def batches(queryset):
+    """Walk a queryset by primary key, BATCH_SIZE rows at a time"""
+    last_id = 0
+    while True:
+        batch = list(queryset.filter(id__gt=last_id).order_by('id')[:BATCH_SIZE])
+        if not batch:
+            return
+        yield batch
+        last_id = batch[-1].id
+
+
+def backfill_memberships(apps, schema_editor):
+    """
+    Fill EventMembership from existing hosts and invitees, as the
+    backfill_memberships command does, so that no event drops out of the
+    "my events" feeds between deploying 0005 and running the command.
+    """
+    db = schema_editor.connection.alias
+    Event = apps.get_model('events', 'Event')
+    Invitation = apps.get_model('events', 'Invitation')
+    EventMembership = apps.get_model('events', 'EventMembership')
+
+    # Hosts first, so a host who is also invited keeps the host role
+    for events in batches(Event.objects.using(db).only('id', 'host_id')):
+        EventMembership.objects.using(db).bulk_create(
+            [EventMembership(event_id=event.id, user_id=event.host_id, role='host') for event in events],
+            update_conflicts=True,
+            unique_fields=['user', 'event'],
+            update_fields=['role'],
+        )
+
+    invitations = Invitation.objects.using(db).filter(invitee__isnull=False).only('id', 'event_id', 'invitee_id')
+    for batch in batches(invitations):
+        EventMembership.objects.using(db).bulk_create(
+            [
+                EventMembership(event_id=invitation.event_id, user_id=invitation.invitee_id, role='invitee')
+                for invitation in batch
+            ],
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0006_hot_filter_indexes'),
+    ]
+
+    operations = [
+        # Reversing 0005 drops the table, so there is nothing to undo here
+        migrations.RunPython(backfill_memberships, migrations.RunPython.noop),
+    ]
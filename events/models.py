@@ -1,7 +1,17 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
+from movie2gether.conditional import bump_version
 from movies.models import Movie
 
+def memberships_version(user_id):
+    """Version of a user's event memberships, for validating their feed"""
+    return f'memberships:{user_id}'
+
+def bump_memberships(user_ids):
+    """Bump the membership version of these users once the transaction commits"""
+    user_ids = set(user_ids)
+    transaction.on_commit(lambda: [bump_version(memberships_version(user_id)) for user_id in user_ids])
+
 class Event(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -18,12 +28,22 @@ class Event(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Backs the keyset pagination of event lists
+            models.Index(fields=['-created_at', '-id'], name='event_created_id_idx'),
+            # Upcoming events for the public list
+            models.Index(fields=['date', 'created_at'], name='event_date_created_idx'),
+        ]
+
     def __str__(self):
         return f"{self.title} - {self.date}"
 
 class Invitation(models.Model):
     event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='invitations')
-    invitee = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='invitations')
+    # Empty until someone with invitee_email signs up and accepts
+    invitee = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='invitations',
+                                null=True, blank=True)
     invitee_email = models.EmailField()  
     status = models.CharField(max_length=20, choices=Event.STATUS_CHOICES, default='pending')
     invited_at = models.DateTimeField(auto_now_add=True)
@@ -31,6 +51,10 @@ class Invitation(models.Model):
 
     class Meta:
         unique_together = ['event', 'invitee_email']  
+        indexes = [
+            # A user's invitations, and the RSVP lookup, by email and status
+            models.Index(fields=['invitee_email', 'status'], name='invitation_email_status_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.invitee_email and self.invitee:
@@ -39,3 +63,57 @@ class Invitation(models.Model):
 
     def __str__(self):
         return f"{self.invitee_email} - {self.event.title}"
+
+
+class EventMembershipManager(models.Manager):
+    def add_hosts(self, events):
+        """Record each event's host; a host who was also invited becomes host"""
+        bump_memberships(event.host_id for event in events)
+        return self.bulk_create(
+            [EventMembership(event_id=event.id, user_id=event.host_id, role=EventMembership.HOST) for event in events],
+            update_conflicts=True,
+            unique_fields=['user', 'event'],
+            update_fields=['role'],
+        )
+
+    def add_invitees(self, invitations):
+        """Record the signed-up invitees; existing memberships are left alone"""
+        bump_memberships(invitation.invitee_id for invitation in invitations if invitation.invitee_id)
+        return self.bulk_create(
+            [
+                EventMembership(event_id=invitation.event_id, user_id=invitation.invitee_id, role=EventMembership.INVITEE)
+                for invitation in invitations if invitation.invitee_id
+            ],
+            ignore_conflicts=True,
+        )
+
+class EventMembership(models.Model):
+    """
+    Who can see an event: its host and everyone invited to it.
+
+    Denormalized from Event.host and Invitation.invitee (see events.signals)
+    so that "my events" is one indexed lookup instead of an OR across the
+    invitations join followed by a DISTINCT. Rebuild it with the
+    backfill_memberships command.
+    """
+    HOST = 'host'
+    INVITEE = 'invitee'
+    ROLE_CHOICES = [
+        (HOST, 'Host'),
+        (INVITEE, 'Invitee'),
+    ]
+
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='memberships')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='event_memberships')
+    role = models.CharField(max_length=10, choices=ROLE_CHOICES)
+
+    objects = EventMembershipManager()
+
+    class Meta:
+        constraints = [
+            # Leads with user, so it also serves the per-user lookups
+            models.UniqueConstraint(fields=['user', 'event'], name='event_membership_user_event_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.event_id} ({self.role})"
@@ -1,10 +1,19 @@
 from rest_framework import serializers
 from .models import Event, Invitation
 from movies.serializers import MovieSerializer
+from movie2gether.projection import Method, Projection
 import logging
 
 logger = logging.getLogger(__name__)
 
+POSTER_PLACEHOLDER = "https://via.placeholder.com/300x450?text=No+Poster+Available"
+
+def viewer_id(context):
+    request = context.get('request')
+    if request and hasattr(request, 'user') and request.user.is_authenticated:
+        return request.user.id
+    return None
+
 class EventSerializer(serializers.ModelSerializer):
     movie_details = MovieSerializer(source='movie', read_only=True)
     host_email = serializers.EmailField(source='host.email', read_only=True)
@@ -14,17 +23,23 @@ class EventSerializer(serializers.ModelSerializer):
     def get_poster_url(self, obj):
         if obj.movie and obj.movie.poster_url:
             return obj.movie.poster_url
-        return "https://via.placeholder.com/300x450?text=No+Poster+Available"
+        return POSTER_PLACEHOLDER
     
     def get_is_host(self, obj):
         request = self.context.get('request')
-        logger.info(f"get_is_host - Request: {request}")
-        logger.info(f"get_is_host - User authenticated: {request.user.is_authenticated if request and hasattr(request, 'user') else False}")
         if request and hasattr(request, 'user') and request.user.is_authenticated:
-            is_host = obj.host == request.user
-            logger.info(f"get_is_host - Event host: {obj.host.email}, User: {request.user.email}, Is host: {is_host}")
+            # Compare keys so that no host row has to be loaded
+            is_host = obj.host_id == request.user.id
+            # Once per serialized event: lazily formatted, and sampled
+            logger.debug('get_is_host - event %s, host %s, is host: %s', obj.pk, obj.host_id, is_host)
             return is_host
         return False
+
+    # The method fields above, for lists built from .values() rows
+    projected_methods = {
+        'poster_url': Method(['movie__poster_url'], lambda poster_url, context: poster_url or POSTER_PLACEHOLDER),
+        'is_host': Method(['host'], lambda host_id, context: host_id == viewer_id(context)),
+    }
     
     class Meta:
         model = Event
@@ -33,6 +48,13 @@ class EventSerializer(serializers.ModelSerializer):
                  'poster_url', 'is_host']
         read_only_fields = ('host', 'host_email', 'created_at', 'updated_at')
 
+class PublicEventSerializer(EventSerializer):
+    """EventSerializer without the per-viewer is_host, so its output can be shared"""
+    is_host = None
+
+    class Meta(EventSerializer.Meta):
+        fields = [field for field in EventSerializer.Meta.fields if field != 'is_host']
+
 class InvitationSerializer(serializers.ModelSerializer):
     event = EventSerializer(read_only=True)
     invitee_email = serializers.EmailField()
@@ -44,13 +66,32 @@ class InvitationSerializer(serializers.ModelSerializer):
                 'email': obj.invitee.email
             }
         return None
+
+    projected_methods = {
+        'invitee': Method(
+            ['invitee', 'invitee__email'],
+            lambda invitee_id, email, context: None if invitee_id is None else {'email': email},
+        ),
+    }
     
     class Meta:
         model = Invitation
         fields = ['id', 'event', 'invitee', 'invitee_email', 'status', 'invited_at', 'responded_at']
         read_only_fields = ('invited_at', 'responded_at', 'invitee')
 
+public_event_projection = Projection(PublicEventSerializer)
+invitation_projection = Projection(InvitationSerializer)
+
 class RSVPSerializer(serializers.ModelSerializer):
     class Meta:
         model = Invitation
         fields = ['status']
+
+class BulkInvitationSerializer(serializers.Serializer):
+    # Addresses are validated one by one in the view so that a single bad
+    # address is reported in the results instead of failing the whole batch
+    emails = serializers.ListField(
+        child=serializers.CharField(max_length=254),
+        allow_empty=False,
+        max_length=500,
+    )
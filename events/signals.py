@@ -0,0 +1,44 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from movie2gether.conditional import bump_version
+from .models import Event, EventMembership, Invitation, bump_memberships
+
+# Cached public event lists include this version in their keys
+EVENTS_VERSION = 'events'
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def event_changed(sender, **kwargs):
+    transaction.on_commit(lambda: bump_version(EVENTS_VERSION))
+
+# Keep EventMembership in step with Event.host and Invitation.invitee.
+# Invitations created with bulk_create skip these and must call
+# EventMembership.objects.add_invitees() themselves.
+
+@receiver(post_save, sender=Event)
+def event_post_save(sender, instance, created, update_fields=None, **kwargs):
+    if not created:
+        if update_fields is not None and 'host' not in update_fields:
+            return
+        # The host may have changed
+        previous = EventMembership.objects.filter(
+            event=instance, role=EventMembership.HOST
+        ).exclude(user_id=instance.host_id)
+        bump_memberships(previous.values_list('user_id', flat=True))
+        previous.delete()
+    EventMembership.objects.add_hosts([instance])
+
+@receiver(post_save, sender=Invitation)
+def invitation_post_save(sender, instance, **kwargs):
+    # Also covers an invitee linked when they accept
+    if instance.invitee_id:
+        EventMembership.objects.add_invitees([instance])
+
+@receiver(post_delete, sender=Invitation)
+def invitation_post_delete(sender, instance, **kwargs):
+    if instance.invitee_id:
+        bump_memberships([instance.invitee_id])
+        EventMembership.objects.filter(
+            event_id=instance.event_id, user_id=instance.invitee_id, role=EventMembership.INVITEE
+        ).delete()
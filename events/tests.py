@@ -0,0 +1,399 @@
+import os
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import update_last_login
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from movie2gether.testing import analyze, eager_tasks, max_queries, no_sequential_scans
+from movies.models import Movie
+from .models import Event, EventMembership, Invitation
+from .serializers import POSTER_PLACEHOLDER, InvitationSerializer
+
+User = get_user_model()
+
+
+class EventTestCase(TestCase):
+    """Tests around one upcoming event, its host and a guest"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.host = User.objects.create_user(email='host@example.com', username='host', password='pw')
+        cls.guest = User.objects.create_user(email='guest@example.com', username='guest', password='pw')
+        cls.movie = Movie.objects.create(
+            title='Movie', description='', release_date=date(2000, 1, 1),
+            poster_url='https://example.com/poster.jpg', imdb_id='tt0000001',
+        )
+        cls.event = Event.objects.create(
+            movie=cls.movie, title='Event', date=timezone.now() + timedelta(days=1), location='Somewhere', host=cls.host,
+        )
+
+
+class ListQueryBudgetTests(TestCase):
+    """Event and invitation lists must not issue a query per row"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='guest@example.com', username='guest', password='pw')
+        for i in range(10):
+            host = User.objects.create_user(email=f'host{i}@example.com', username=f'host{i}', password='pw')
+            movie = Movie.objects.create(
+                title=f'Movie {i}', description='', release_date=date(2000, 1, 1),
+                poster_url='https://example.com/poster.jpg', imdb_id=f'tt{i:07d}',
+            )
+            event = Event.objects.create(
+                movie=movie, title=f'Event {i}', date=timezone.now() + timedelta(days=1),
+                location='Somewhere', host=host,
+            )
+            Invitation.objects.create(event=event, invitee=cls.user, invitee_email=cls.user.email)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_public_event_list(self):
+        with max_queries(1):
+            response = self.client.get('/api/events/public/')
+        self.assertEqual(len(response.data['results']), 10)
+
+    def test_my_event_list(self):
+        # The ETag query, then the page
+        with max_queries(2):
+            response = self.client.get('/api/events/')
+        self.assertEqual(len(response.data['results']), 10)
+
+    def test_invitation_list(self):
+        with max_queries(2):
+            response = self.client.get('/api/events/invitations/')
+        self.assertEqual(len(response.data), 10)
+
+
+class BulkInvitationTests(EventTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Invitation.objects.create(event=cls.event, invitee=cls.guest, invitee_email=cls.guest.email)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.host)
+        self.url = f'/api/events/{self.event.id}/invite/bulk/'
+
+    def test_bulk_invite(self):
+        emails = [self.guest.email, 'not-an-email'] + [f'friend{i}@example.com' for i in range(50)]
+        with max_queries(8):
+            response = self.client.post(self.url, {'emails': emails}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['invited'], 50)
+        statuses = {result['email']: result['status'] for result in response.data['results']}
+        self.assertEqual(statuses[self.guest.email], 'already_invited')
+        self.assertEqual(statuses['not-an-email'], 'invalid')
+        self.assertEqual(Invitation.objects.filter(event=self.event).count(), 51)
+
+    def test_bulk_invite_registered_users(self):
+        # Signed-up invitees get a pushed invitation, still at a fixed cost
+        emails = [
+            User.objects.create_user(email=f'user{i}@example.com', username=f'user{i}', password='pw').email
+            for i in range(20)
+        ]
+        with max_queries(9):
+            response = self.client.post(self.url, {'emails': emails}, format='json')
+        self.assertEqual(response.data['invited'], 20)
+        self.assertEqual(Invitation.objects.filter(event=self.event, invitee__isnull=False).count(), 21)
+
+    def test_concurrent_invite_of_the_same_address(self):
+        bulk_create = Invitation.objects.bulk_create
+
+        def invited_meanwhile(*args, **kwargs):
+            # Another request commits one of the addresses first
+            Invitation.objects.create(event=self.event, invitee_email='friend0@example.com')
+            return bulk_create(*args, **kwargs)
+
+        emails = ['friend0@example.com', 'friend1@example.com']
+        with mock.patch.object(Invitation.objects, 'bulk_create', invited_meanwhile):
+            response = self.client.post(self.url, {'emails': emails}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([result['status'] for result in response.data['results']], ['invited', 'invited'])
+        self.assertEqual(Invitation.objects.filter(event=self.event, invitee_email__in=emails).count(), 2)
+
+    def test_only_host_can_invite(self):
+        self.client.force_authenticate(self.guest)
+        response = self.client.post(self.url, {'emails': ['friend@example.com']}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+
+class MembershipTests(EventTestCase):
+    """Feeds and detail permissions follow the membership table"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.stranger = User.objects.create_user(email='stranger@example.com', username='stranger', password='pw')
+        # Inviting yourself must not turn the host into an invitee
+        Invitation.objects.create(event=cls.event, invitee=cls.host, invitee_email=cls.host.email)
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def feed(self, user):
+        self.client.force_authenticate(user)
+        return [event['id'] for event in self.client.get('/api/events/').data['results']]
+
+    def test_feed_and_detail(self):
+        self.client.force_authenticate(self.host)
+        self.client.post(f'/api/events/{self.event.id}/invite/bulk/', {'emails': [self.guest.email]}, format='json')
+
+        self.assertEqual(self.feed(self.host), [self.event.id])
+        self.assertEqual(self.feed(self.guest), [self.event.id])
+        self.assertEqual(self.feed(self.stranger), [])
+        self.assertEqual(EventMembership.objects.get(user=self.host).role, EventMembership.HOST)
+
+        self.client.force_authenticate(self.stranger)
+        self.assertEqual(self.client.get(f'/api/events/{self.event.id}/').status_code, 404)
+
+        Invitation.objects.get(invitee=self.guest).delete()
+        self.assertEqual(self.feed(self.guest), [])
+
+    def test_backfill(self):
+        Invitation.objects.create(event=self.event, invitee=self.guest, invitee_email=self.guest.email)
+        EventMembership.objects.all().delete()
+        call_command('backfill_memberships', batch_size=1, stdout=open(os.devnull, 'w'))
+        self.assertEqual(
+            set(EventMembership.objects.values_list('user__username', 'role')),
+            {('host', EventMembership.HOST), ('guest', EventMembership.INVITEE)},
+        )
+
+
+class QueryPlanTests(TestCase):
+    """The main query of each event endpoint is an index lookup at production-like volumes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        users = User.objects.bulk_create([
+            User(email=f'user{i}@example.com', username=f'user{i}', password='!') for i in range(200)
+        ])
+        movies = Movie.objects.bulk_create([
+            Movie(title=f'Movie {i}', description='', release_date=date(2000, 1, 1),
+                  poster_url='https://example.com/poster.jpg', imdb_id=f'tt{i:07d}')
+            for i in range(5000)
+        ])
+        now = timezone.now()
+        # Mostly past events, as in a long-running deployment
+        events = Event.objects.bulk_create([
+            Event(movie=movies[i * 2], title=f'Event {i}', location='Somewhere', host=users[i % 200],
+                  date=now + timedelta(days=1 if i % 20 == 0 else -i))
+            for i in range(2000)
+        ])
+        invitations = Invitation.objects.bulk_create([
+            Invitation(event=event, invitee=users[(i * 7 + j) % 200], invitee_email=users[(i * 7 + j) % 200].email)
+            for i, event in enumerate(events) for j in range(1, 11)
+        ])
+        EventMembership.objects.add_hosts(events)
+        EventMembership.objects.add_invitees(invitations)
+        analyze()
+        cls.user = users[0]
+        cls.event = events[0]
+        cls.invitation = Invitation.objects.filter(invitee=cls.user).first()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertRows(self, response):
+        # An error page runs fewer queries and would pass the plan check
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['results'])
+
+    def test_event_endpoints(self):
+        with no_sequential_scans():
+            public = self.client.get('/api/events/public/')
+            mine = self.client.get('/api/events/')
+            detail = self.client.get(f'/api/events/{self.event.id}/')
+        self.assertRows(public)
+        self.assertRows(mine)
+        self.assertEqual(detail.status_code, 200)
+        self.assertEqual(detail.json()['id'], self.event.id)
+
+    def test_invitation_endpoints(self):
+        with no_sequential_scans():
+            invitations = self.client.get('/api/events/invitations/')
+            rsvp = self.client.patch(f'/api/events/invitations/{self.invitation.id}/rsvp/', {'status': 'accepted'}, format='json')
+        self.assertEqual(invitations.status_code, 200)
+        self.assertTrue(invitations.json())  # Not paginated
+        self.assertEqual(rsvp.status_code, 200)
+
+
+class PublicEventCacheTests(EventTestCase):
+    """The public list is served from a versioned cache with ETags"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.url = '/api/events/public/'
+
+    def test_cached_until_an_event_changes(self):
+        response = self.client.get(self.url)
+        etag = response['ETag']
+        with max_queries(0):
+            self.assertEqual(self.client.get(self.url).data, response.data)
+            self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.event.title = 'Renamed'
+            self.event.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['title'], 'Renamed')
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_other_query_parameters_share_the_page(self):
+        Event.objects.create(
+            movie=self.event.movie, title='Second', date=timezone.now() + timedelta(days=2),
+            location='Somewhere', host=self.host,
+        )
+        response = self.client.get(self.url, {'page_size': 1, 'utm_source': 'mail'})
+        self.assertNotIn('utm_source', response.data['next'])
+        with max_queries(0):
+            self.assertEqual(self.client.get(self.url, {'page_size': '01', '_': '123'}).data, response.data)
+
+    def test_host_email_change_refreshes_the_list(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            update_last_login(None, self.host)
+        with max_queries(0):
+            self.client.get(self.url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.host.email = 'new-host@example.com'
+            self.host.save()
+        self.assertEqual(self.client.get(self.url).data['results'][0]['host_email'], 'new-host@example.com')
+
+    def test_is_host_is_per_viewer(self):
+        anonymous = self.client.get(self.url)
+        self.assertFalse(anonymous.data['results'][0]['is_host'])
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.host)}')
+        with max_queries(0):
+            response = self.client.get(self.url)
+        self.assertTrue(response.data['results'][0]['is_host'])
+        self.assertNotEqual(response['ETag'], anonymous['ETag'])
+
+        # A bad token only loses the is_host bits
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer expired')
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.data['results'][0]['is_host'])
+
+
+class ConditionalRequestTests(EventTestCase):
+    """Authenticated event and invitation endpoints answer conditional requests"""
+
+    def setUp(self):
+        cache.clear()
+        # Committing an invitation queues an outbox drain
+        tasks = eager_tasks()
+        tasks.__enter__()
+        self.addCleanup(tasks.__exit__, None, None, None)
+        self.client = APIClient()
+        self.client.force_authenticate(self.host)
+
+    def assertNotModified(self, url, etag):
+        with max_queries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_event_detail(self):
+        url = f'/api/events/{self.event.id}/'
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertIn('Last-Modified', response)
+        self.assertNotModified(url, etag)
+
+        response = self.client.patch(url, {'title': 'Renamed'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        # A write based on the stale copy is refused
+        response = self.client.patch(url, {'title': 'Lost update'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(Event.objects.get(pk=self.event.pk).title, 'Renamed')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_host_profile_change(self):
+        Invitation.objects.create(event=self.event, invitee=self.guest, invitee_email=self.guest.email)
+        self.client.force_authenticate(self.guest)
+        urls = [f'/api/events/{self.event.id}/', '/api/events/', '/api/events/invitations/']
+        etags = [self.client.get(url)['ETag'] for url in urls]
+
+        # The host's email is part of every response
+        self.host.email = 'new-host@example.com'
+        self.host.save()
+        for url, etag in zip(urls, etags):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200, url)
+
+    def test_event_feed(self):
+        other = Event.objects.create(
+            movie=self.movie, title='Other', date=timezone.now() + timedelta(days=2), location='Elsewhere', host=self.guest,
+        )
+        etag = self.client.get('/api/events/')['ETag']
+        self.assertNotModified('/api/events/', etag)
+
+        # Being invited to an existing event changes the feed
+        with self.captureOnCommitCallbacks(execute=True):
+            Invitation.objects.create(event=other, invitee=self.host, invitee_email=self.host.email)
+        response = self.client.get('/api/events/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_invitation_list(self):
+        self.client.force_authenticate(self.guest)
+        invitation = Invitation.objects.create(event=self.event, invitee=self.guest, invitee_email=self.guest.email)
+        etag = self.client.get('/api/events/invitations/')['ETag']
+        self.assertNotModified('/api/events/invitations/', etag)
+
+        self.client.patch(f'/api/events/invitations/{invitation.id}/rsvp/', {'status': 'accepted'}, format='json')
+        response = self.client.get('/api/events/invitations/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+class ProjectionTests(TestCase):
+    """The .values() fast path renders the same bytes as the serializers"""
+
+    def test_benchmark_output_matches(self):
+        # The command raises if the two paths disagree
+        out = StringIO()
+        call_command('benchmark_serializers', rows=30, repeat=1, stdout=out)
+        self.assertIn('Public events', out.getvalue())
+        self.assertIn('Invitations', out.getvalue())
+        self.assertFalse(Event.objects.exists())
+
+    def test_invitation_list(self):
+        host = User.objects.create_user(email='host@example.com', username='host', password='pw')
+        guest = User.objects.create_user(email='guest@example.com', username='guest', password='pw')
+        movie = Movie.objects.create(
+            title='Movie', description='', release_date=date(2000, 1, 1), poster_url='', imdb_id='tt0000001',
+        )
+        event = Event.objects.create(
+            movie=movie, title='Café', date=timezone.now() + timedelta(days=1), location='Somewhere', host=guest,
+        )
+        Invitation.objects.create(event=event, invitee_email=guest.email)
+        client = APIClient()
+        client.force_authenticate(guest)
+        response = client.get('/api/events/invitations/')
+
+        context = {'request': response.wsgi_request}
+        expected = InvitationSerializer(Invitation.objects.all(), many=True, context=context).data
+        self.assertEqual(response.content, JSONRenderer().render(expected))
+        self.assertIn('Café'.encode(), response.content)
+        self.assertEqual(response.json()[0]['event']['poster_url'], POSTER_PLACEHOLDER)
+        self.assertTrue(response.json()[0]['event']['is_host'])
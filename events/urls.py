@@ -12,6 +12,7 @@ urlpatterns = [
     path('', views.EventViewSet.as_view(), name='event-list'),
     path('<int:pk>/', views.EventDetailView.as_view(), name='event-detail'),
     path('<int:event_id>/invite/', views.InvitationCreateView.as_view(), name='create-invitation'),
+    path('<int:event_id>/invite/bulk/', views.InvitationBulkCreateView.as_view(), name='create-invitations-bulk'),
     path('invitations/', InvitationListView.as_view(), name='invitation-list'),
     path('invitations/<int:pk>/rsvp/', views.RSVPView.as_view(), name='rsvp'),
 ]
\ No newline at end of file
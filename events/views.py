@@ -1,14 +1,32 @@
+import hashlib
+
 from rest_framework import generics, permissions, status, exceptions, serializers, viewsets
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
 from django.shortcuts import get_object_or_404, render
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
 from django.utils import timezone
-from django.db import models
-from django.db.models import Q
-from .models import Event, Invitation
-from .serializers import EventSerializer, InvitationSerializer, RSVPSerializer
-from notifications.tasks import send_invitation_email
+from django.utils.cache import patch_vary_headers
+from django.utils.http import urlencode
+from django.db.models import Count, Max, Q
+from .models import Event, EventMembership, Invitation, memberships_version
+from .serializers import (
+    EventSerializer, InvitationSerializer, PublicEventSerializer, RSVPSerializer, BulkInvitationSerializer,
+    invitation_projection, public_event_projection,
+)
+from .signals import EVENTS_VERSION
+from movie2gether.conditional import ConditionalMixin, compute_etag, etag_matches, get_version, make_etag
+from movie2gether.pagination import KeysetPagination
+from movies.signals import MOVIES_VERSION
+from notifications.outbox import enqueue_invitation_emails
+from notifications.realtime import invitation_message, publish_many
 import logging
 
 logger = logging.getLogger(__name__)
@@ -18,17 +36,50 @@ User = get_user_model()
 def index(request):
     return render(request, 'index.html')  # This will render the main HTML file for React
 
+class PublicEventPagination(KeysetPagination):
+    """
+    KeysetPagination for pages that are cached and shared between requests.
+
+    A page is identified by the pagination parameters alone, so other
+    query parameters neither create cache entries nor end up in the next
+    links served to everyone else.
+    """
+
+    def get_page_url(self, request):
+        params = {}
+        if self.page_size_query_param in request.query_params:
+            # As applied, so that "20", "020" and "abc" share an entry
+            params[self.page_size_query_param] = self.get_page_size(request)
+        if request.query_params.get(self.cursor_query_param):
+            params[self.cursor_query_param] = request.query_params[self.cursor_query_param]
+        url = request.build_absolute_uri(request.path)
+        return f'{url}?{urlencode(params)}' if params else url
+
+    def get_base_url(self):
+        return self.get_page_url(self.request)
+
 class PublicEventListView(generics.ListAPIView):
-    """View for listing all events without authentication"""
-    serializer_class = EventSerializer
+    """
+    View for listing all events without authentication
+
+    Serialized pages are cached under the current events and movies
+    versions, which every Event or Movie write bumps, so a cached page is
+    served until the data behind it changes or one of its events starts.
+    The viewer's is_host bits are added on top, and the ETag lets repeat
+    visits be answered with a 304.
+    """
+    serializer_class = PublicEventSerializer
     permission_classes = []  # No authentication required
     authentication_classes = []  # No authentication required
+    pagination_class = PublicEventPagination
+    # Only reclaims memory; invalidation is done by the versions
+    cache_timeout = 24 * 60 * 60
 
     def get_queryset(self):
         # Return all future events, ordered by creation date
         return Event.objects.filter(
             date__gte=timezone.now()
-        ).order_by('-created_at')
+        ).select_related('movie', 'host').order_by('-created_at')
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
@@ -37,38 +88,115 @@ class PublicEventListView(generics.ListAPIView):
         return context
 
     def list(self, request, *args, **kwargs):
+        viewer_id = self.get_viewer_id(request)
         # Log authentication status for debugging
-        logger.info(f"User authenticated: {request.user.is_authenticated if request.user else False}")
-        if request.user.is_authenticated:
-            logger.info(f"User email: {request.user.email}")
-        response = super().list(request, *args, **kwargs)
+        logger.debug('Public event list, authenticated: %s', viewer_id is not None)
+
+        page = self.get_cached_page(request)
+        etag = page['etag'] if viewer_id is None else f'{page["etag"][:-1]}-{viewer_id}"'
+        if etag_matches(request, etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            data = dict(page['data'])
+            data['results'] = [
+                {**event, 'is_host': viewer_id is not None and str(event['host']) == viewer_id}
+                for event in data['results']
+            ]
+            response = Response(data)
+        response['ETag'] = etag
+        response['Cache-Control'] = 'no-cache'
+        patch_vary_headers(response, ['Authorization'])
         return response
 
-class EventViewSet(generics.ListCreateAPIView):
+    def get_cached_page(self, request):
+        url = hashlib.sha1(self.paginator.get_page_url(request).encode('utf-8')).hexdigest()
+        key = f'events:public:{get_version(EVENTS_VERSION)}:{get_version(MOVIES_VERSION)}:{url}'
+        page = cache.get(key)
+        if page is not None and (page['expires'] is None or timezone.now() < page['expires']):
+            return page
+
+        # Built from .values() rows rather than through the serializer
+        events = self.paginate_queryset(public_event_projection.values(self.filter_queryset(self.get_queryset())))
+        results = public_event_projection.serialize(events, self.get_serializer_context())
+        data = self.get_paginated_response(results).data
+        page = {
+            'data': data,
+            'etag': compute_etag(data),
+            # The first of these events to start drops out of the list
+            'expires': min((event['date'] for event in events), default=None),
+        }
+        cache.set(key, page, timeout=self.cache_timeout)
+        return page
+
+    def get_viewer_id(self, request):
+        """
+        The user id of a valid access token, if one was sent.
+
+        The list is public, so a missing or expired token is not an error;
+        the token is only decoded, without loading the user.
+        """
+        authentication = JWTAuthentication()
+        header = authentication.get_header(request)
+        if header is None:
+            return None
+        try:
+            raw_token = authentication.get_raw_token(header)
+            if raw_token is None:
+                return None
+            token = authentication.get_validated_token(raw_token)
+            return str(token[jwt_settings.USER_ID_CLAIM])
+        except (exceptions.AuthenticationFailed, InvalidToken, TokenError, KeyError):
+            return None
+
+class EventViewSet(ConditionalMixin, generics.ListCreateAPIView):
     """View for creating events and listing user-specific events"""
     serializer_class = EventSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
-        # Show events where user is host or invited, ordered by most recent first
+        # Show events where user is host or invited, ordered by most recent first.
+        # Memberships are unique per user and event, so no DISTINCT is needed.
         return Event.objects.filter(
-            models.Q(host=self.request.user) |
-            models.Q(invitations__invitee=self.request.user)
-        ).distinct().order_by('-created_at')  # Most recent first
+            memberships__user=self.request.user
+        ).select_related('movie', 'host').order_by('-created_at')  # Most recent first
+
+    def get_validators(self):
+        # Edits move MAX(updated_at), host profile changes (the email is
+        # rendered) MAX(host.date_modified), deleted events drop the count,
+        # and joining or leaving an event bumps the membership version
+        user = self.request.user
+        stats = Event.objects.filter(memberships__user=user).aggregate(
+            last_updated=Max('updated_at'), last_host_update=Max('host__date_modified'), count=Count('id'),
+        )
+        etag = make_etag(
+            'events', user.id, self.request.get_full_path(), *stats.values(),
+            get_version(memberships_version(user.id)), get_version(MOVIES_VERSION),
+        )
+        return etag, None
 
     def perform_create(self, serializer):
         serializer.save(host=self.request.user)
 
-class EventDetailView(generics.RetrieveUpdateDestroyAPIView):
+class EventDetailView(ConditionalMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = EventSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
         # Users can only view events they're hosting or invited to
         return Event.objects.filter(
-            models.Q(host=self.request.user) |
-            models.Q(invitations__invitee=self.request.user)
-        ).distinct()  # Add distinct to prevent duplicates
+            memberships__user=self.request.user
+        ).select_related('movie', 'host')
+
+    def get_validators(self):
+        # The host's email is rendered too, so their profile changes count
+        row = Event.objects.filter(
+            memberships__user=self.request.user, pk=self.kwargs['pk']
+        ).values_list('updated_at', 'host__date_modified').first()
+        if row is None:
+            return None, None  # Not found, or not visible to this user
+        etag = make_etag('event', self.kwargs['pk'], self.request.user.id, *row, get_version(MOVIES_VERSION))
+        return etag, max(row)
 
     def perform_update(self, serializer):
         event = self.get_object()
@@ -82,18 +210,17 @@ class InvitationCreateView(generics.CreateAPIView):
 
     def create(self, request, *args, **kwargs):
         event_id = self.kwargs.get('event_id')
-        logger.info(f"Creating invitation for event {event_id}")
-        logger.info(f"Request data: {request.data}")
-        logger.info(f"Request user: {request.user.email}")
+        # The user and request ids come from the logging context
+        logger.info('Creating invitation for event %s', event_id)
         
         try:
             # Get the event or return 404
             event = get_object_or_404(Event, pk=event_id)
-            logger.info(f"Found event: {event.title}")
+            logger.debug('Found event %s', event.id)
             
             # Check if user is the host
             if event.host != request.user:
-                logger.warning(f"Permission denied: {request.user.email} is not the host of event {event.id}")
+                logger.warning('Permission denied: %s is not the host of event %s', request.user.email, event.id)
                 raise exceptions.PermissionDenied("Only the host can send invitations")
             
             # Validate invitee email
@@ -104,7 +231,7 @@ class InvitationCreateView(generics.CreateAPIView):
                     "invitee_email": "Please provide an email address for the invitee."
                 })
 
-            logger.info(f"Checking for existing invitation for {invitee_email}")
+            logger.debug('Checking for existing invitation for %s', invitee_email)
             # Check if invitation already exists
             existing_invitation = Invitation.objects.filter(
                 event=event,
@@ -113,48 +240,146 @@ class InvitationCreateView(generics.CreateAPIView):
             ).first()
             
             if existing_invitation:
-                logger.warning(f"Found existing pending invitation for {invitee_email}")
+                logger.warning('Found existing pending invitation for %s', invitee_email)
                 raise serializers.ValidationError({
                     "invitee_email": "A pending invitation already exists for this email."
                 })
 
             # Try to find a user with this email
             invitee = User.objects.filter(email=invitee_email).first()
-            logger.info(f"Found existing user for email: {invitee is not None}")
+            logger.debug('Found existing user for email: %s', invitee is not None)
             
-            # Create the invitation
-            invitation = Invitation.objects.create(
-                event=event,
-                invitee=invitee,  # This might be None if user doesn't exist
-                invitee_email=invitee_email,
-                status='pending'
-            )
-            logger.info(f"Created invitation {invitation.id}")
-
-            # Send email notification (async)
-            send_invitation_email.delay(invitation.id)
-            logger.info(f"Queued invitation email for {invitation.id}")
+            # Create the invitation; its email is written to the outbox in
+            # the same transaction and sent once it commits
+            with transaction.atomic():
+                invitation = Invitation.objects.create(
+                    event=event,
+                    invitee=invitee,  # This might be None if user doesn't exist
+                    invitee_email=invitee_email,
+                    status='pending'
+                )
+            logger.info('Created invitation %s', invitation.id)
 
             # Return the serialized invitation
             serializer = self.get_serializer(invitation)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
             
         except serializers.ValidationError as e:
-            logger.warning(f"Validation error: {str(e)}")
+            logger.warning('Validation error: %s', e)
             raise
         except Exception as e:
-            logger.error(f"Error creating invitation: {str(e)}")
+            logger.error('Error creating invitation: %s', e)
             raise serializers.ValidationError({
                 "error": f"Failed to create invitation: {str(e)}"
             })
 
-class InvitationListView(generics.ListAPIView):
+class InvitationBulkCreateView(generics.GenericAPIView):
+    """Invite many guests at once with a fixed number of queries"""
+    serializer_class = BulkInvitationSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        event = get_object_or_404(Event, pk=self.kwargs.get('event_id'))
+        if event.host_id != request.user.id:
+            raise exceptions.PermissionDenied("Only the host can send invitations")
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        results = {}
+        candidates = []
+        for email in serializer.validated_data['emails']:
+            email = email.strip()
+            if email in results:
+                continue
+            try:
+                validate_email(email)
+            except ValidationError:
+                results[email] = {'email': email, 'status': 'invalid'}
+                continue
+            results[email] = None
+            candidates.append(email)
+
+        # One query for the invitations that already exist...
+        existing = dict(Invitation.objects.filter(
+            event=event, invitee_email__in=candidates
+        ).values_list('invitee_email', 'id'))
+        for email, invitation_id in existing.items():
+            results[email] = {'email': email, 'status': 'already_invited', 'invitation_id': invitation_id}
+
+        # ...one for the accounts behind the new addresses...
+        new_emails = [email for email in candidates if email not in existing]
+        users = dict(User.objects.filter(email__in=new_emails).values_list('email', 'id'))
+
+        # ...and one insert for all the new invitations
+        with transaction.atomic():
+            # A concurrent bulk invite may insert the same address first;
+            # skip it rather than fail on the unique constraint
+            Invitation.objects.bulk_create([
+                Invitation(event=event, invitee_id=users.get(email), invitee_email=email, status='pending')
+                for email in new_emails
+            ], ignore_conflicts=True)
+            # ignore_conflicts leaves the ids unset, so read the rows back,
+            # with what the pushed invitations nest
+            invitations = list(Invitation.objects.filter(
+                event=event, invitee_email__in=new_emails
+            ).select_related('invitee', 'event__movie', 'event__host'))
+            if invitations:
+                # bulk_create skips post_save, so record the emails and
+                # memberships, and push the invitations to signed-up
+                # invitees here. Emails and memberships are idempotent,
+                # should a concurrent request cover the same rows; a push
+                # may then arrive twice.
+                enqueue_invitation_emails([invitation.id for invitation in invitations])
+                EventMembership.objects.add_invitees(invitations)
+                messages = [
+                    (invitation.invitee_id, invitation_message(invitation))
+                    for invitation in invitations if invitation.invitee_id
+                ]
+                transaction.on_commit(lambda: publish_many(messages))
+
+        for invitation in invitations:
+            results[invitation.invitee_email] = {
+                'email': invitation.invitee_email,
+                'status': 'invited',
+                'invitation_id': invitation.id,
+            }
+
+        logger.info('Bulk invite for event %s: %s invited, %s already invited', event.id, len(invitations), len(existing))
+        return Response({
+            'invited': len(invitations),
+            'results': list(results.values()),
+        }, status=status.HTTP_201_CREATED if invitations else status.HTTP_200_OK)
+
+class InvitationListView(ConditionalMixin, generics.ListAPIView):
     serializer_class = InvitationSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
         # Return invitations where the user's email matches invitee_email
-        return Invitation.objects.filter(invitee_email=self.request.user.email)
+        return Invitation.objects.filter(
+            invitee_email=self.request.user.email
+        ).select_related('event__movie', 'event__host', 'invitee')
+
+    def get_validators(self):
+        # New invitations move MAX(invited_at), responses MAX(responded_at),
+        # event edits MAX(event.updated_at), host profile changes
+        # MAX(event.host.date_modified), and deletions the count
+        user = self.request.user
+        stats = Invitation.objects.filter(invitee_email=user.email).aggregate(
+            count=Count('id'),
+            last_invited=Max('invited_at'),
+            last_responded=Max('responded_at'),
+            last_event_update=Max('event__updated_at'),
+            last_host_update=Max('event__host__date_modified'),
+        )
+        etag = make_etag('invitations', user.id, self.request.get_full_path(), *stats.values(), get_version(MOVIES_VERSION))
+        return etag, None
+
+    def list(self, request, *args, **kwargs):
+        # Same output as InvitationSerializer, without a model instance per row
+        invitations = invitation_projection.values(self.filter_queryset(self.get_queryset()))
+        return Response(invitation_projection.serialize(invitations, self.get_serializer_context()))
 
 class RSVPView(generics.UpdateAPIView):
     serializer_class = RSVPSerializer
@@ -167,9 +392,10 @@ class RSVPView(generics.UpdateAPIView):
 
     def perform_update(self, serializer):
         invitation = self.get_object()
-        logger.info(f"Processing RSVP for invitation {invitation.id}")
-        logger.info(f"Current status: {invitation.status}")
-        logger.info(f"New status: {serializer.validated_data.get('status')}")
+        logger.debug(
+            'Processing RSVP for invitation %s: %s -> %s',
+            invitation.id, invitation.status, serializer.validated_data.get('status'),
+        )
         
         # Check if the status is provided in the validated data
         if 'status' not in serializer.validated_data:
@@ -184,11 +410,11 @@ class RSVPView(generics.UpdateAPIView):
         invitation.responded_at = timezone.now()
         
         # If accepting, ensure the user is linked
-        if new_status == 'accepted' and not invitation.invitee:
+        if new_status == 'accepted' and invitation.invitee_id is None:
             invitation.invitee = self.request.user
         
         invitation.save()
-        logger.info(f"Updated invitation {invitation.id} status to {new_status}")
+        logger.info('Updated invitation %s status to %s', invitation.id, new_status)
         
         # Return success response
         return Response({
@@ -27,7 +27,7 @@ const Home = () => {
         })
         .then(response => {
             // console.log('Events response:', response.data);
-            setEvents(response.data);
+            setEvents(response.data.results);
             setError(null);
         })
         .catch(error => {
@@ -37,7 +37,7 @@ const MovieSearch = () => {
                 'http://127.0.0.1:8000/api/movies/search/',
                 getAuthHeaders()
             );
-            setRecentMovies(response.data);
+            setRecentMovies(response.data.results);
         } catch (error) {
             console.error('Error fetching recent movies:', error);
             if (error.response?.status === 401) {
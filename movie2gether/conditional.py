@@ -0,0 +1,123 @@
+import hashlib
+import json
+import time
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_etags
+
+
+def version_key(name):
+    return f'version:{name}'
+
+
+def get_version(name):
+    """
+    Current version of a named data set, for building cache keys.
+
+    A missing counter (first use, or evicted) restarts from the clock
+    rather than from 1, so keys built from an earlier run of the counter
+    are never reused.
+    """
+    version = cache.get(version_key(name))
+    if version is None:
+        cache.add(version_key(name), time.time_ns(), timeout=None)
+        version = cache.get(version_key(name))
+    return version
+
+
+def bump_version(name):
+    """Invalidate everything cached under the current version"""
+    try:
+        cache.incr(version_key(name))
+    except ValueError:
+        # No counter yet, so nothing was cached under it
+        pass
+
+
+def compute_etag(data):
+    """Strong ETag for JSON-serializable response data"""
+    payload = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True, separators=(',', ':'))
+    return '"%s"' % hashlib.md5(payload.encode('utf-8'), usedforsecurity=False).hexdigest()
+
+
+def etag_matches(request, etag):
+    """Whether the request's If-None-Match already names this ETag"""
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    etags = parse_etags(header)
+    # If-None-Match uses the weak comparison
+    return '*' in etags or etag.removeprefix('W/') in [tag.removeprefix('W/') for tag in etags]
+
+
+def make_etag(*parts):
+    """Strong ETag from the values a representation depends on"""
+    payload = '|'.join(str(part) for part in parts)
+    return '"%s"' % hashlib.md5(payload.encode('utf-8'), usedforsecurity=False).hexdigest()
+
+
+class ConditionalResponse(Exception):
+    """Carries a 304 or 412 response out of APIView.initial()"""
+
+    def __init__(self, response):
+        self.response = response
+
+
+class ConditionalMixin:
+    """
+    Conditional requests for DRF views, decided before the view does any work.
+
+    Views implement get_validators(), returning an ETag (see make_etag) and
+    an optional last-modified datetime computed from cheap queries, such
+    as MAX(updated_at) and COUNT(*), rather than from the serialized body.
+    GET and HEAD then get a 304 when the client's copy is current, and
+    PUT, PATCH and DELETE get a 412 when If-Match no longer holds.
+
+    Writes ignore If-Unmodified-Since: HTTP dates have whole seconds, so two
+    edits within a second would both pass it. The ETag is built from the
+    microsecond updated_at and catches them.
+    """
+    write_methods = ('PUT', 'PATCH', 'DELETE')
+
+    def get_validators(self):
+        raise NotImplementedError('Conditional views must implement get_validators()')
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.etag = self.last_modified = None
+        reading = request.method in ('GET', 'HEAD')
+        if not reading and (request.method not in self.write_methods or 'HTTP_IF_MATCH' not in request.META):
+            return
+
+        self.etag, self.last_modified = self.get_validators()
+        # With If-Match present, Django skips If-Unmodified-Since
+        response = get_conditional_response(
+            request._request,
+            etag=self.etag,
+            last_modified=int(self.last_modified.timestamp()) if reading and self.last_modified else None,
+        )
+        if response is not None:
+            raise ConditionalResponse(response)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, ConditionalResponse):
+            return exc.response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if request.method in ('PUT', 'PATCH') and response.status_code == 200:
+            # Hand back the new validators so that the next write can use If-Match
+            self.etag, self.last_modified = self.get_validators()
+        if request.method in ('GET', 'HEAD', 'PUT', 'PATCH') and response.status_code in (200, 304):
+            etag = getattr(self, 'etag', None)
+            last_modified = getattr(self, 'last_modified', None)
+            if etag:
+                response['ETag'] = etag
+            if last_modified:
+                response['Last-Modified'] = http_date(last_modified.timestamp())
+            # Per-user data: browsers may keep it, but must revalidate
+            response['Cache-Control'] = 'private, no-cache'
+        return response
@@ -0,0 +1,124 @@
+"""
+NDJSON exports of whole tables, for ops and analytics.
+
+Rows are read with `.values().iterator()`, which on PostgreSQL runs over a
+server-side cursor, and written out one chunk of lines at a time. Only one
+chunk is ever held in memory, whatever the size of the export, both in the
+staff-only ExportView and in the export_ndjson command.
+"""
+
+import datetime
+
+import orjson
+from django.core.exceptions import ValidationError
+from django.db import models
+from django.http import Http404, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework import exceptions, permissions
+from rest_framework.views import APIView
+
+from events.models import Event, Invitation
+from movies.models import Movie
+from notifications.models import Notification
+
+CHUNK_SIZE = 2000
+
+class Export:
+    def __init__(self, model, fields, date_field):
+        self.model = model
+        self.fields = fields
+        # since/until filter on this field
+        self.date_field = date_field
+
+    def get_queryset(self, since=None, until=None):
+        # Ordering by key makes exports reproducible and replaces any Meta ordering
+        queryset = self.model.objects.order_by('pk')
+        if since is not None:
+            queryset = queryset.filter(**{f'{self.date_field}__gte': self.coerce(since)})
+        if until is not None:
+            queryset = queryset.filter(**{f'{self.date_field}__lt': self.coerce(until)})
+        return queryset.values(*self.fields)
+
+    def coerce(self, value):
+        """A bound for the date field from a date or datetime"""
+        if not isinstance(self.model._meta.get_field(self.date_field), models.DateTimeField):
+            return value.date() if isinstance(value, datetime.datetime) else value
+        if not isinstance(value, datetime.datetime):
+            value = datetime.datetime.combine(value, datetime.time())
+        if timezone.is_naive(value):
+            value = timezone.make_aware(value)
+        return value
+
+EXPORTS = {
+    'events': Export(
+        Event,
+        ['id', 'movie_id', 'title', 'description', 'date', 'location', 'host_id', 'created_at', 'updated_at'],
+        'created_at',
+    ),
+    'invitations': Export(
+        Invitation,
+        ['id', 'event_id', 'invitee_id', 'invitee_email', 'status', 'invited_at', 'responded_at'],
+        'invited_at',
+    ),
+    'movies': Export(
+        Movie,
+        ['id', 'imdb_id', 'title', 'description', 'release_date', 'poster_url'],
+        'release_date',
+    ),
+    'notifications': Export(
+        Notification,
+        ['id', 'user_id', 'sender_id', 'event_id', 'notification_type', 'message', 'is_read', 'created_at'],
+        'created_at',
+    ),
+}
+
+def parse_bound(value):
+    """A since/until value: an ISO 8601 date or datetime"""
+    if not value:
+        return None
+    try:
+        parsed = parse_datetime(value) or parse_date(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValidationError(f'{value!r} is not an ISO 8601 date or datetime')
+    return parsed
+
+def ndjson_chunks(queryset, chunk_size=CHUNK_SIZE):
+    """Yield the rows of a .values() queryset as NDJSON, chunk_size lines at a time"""
+    lines = []
+    for row in queryset.iterator(chunk_size=chunk_size):
+        lines.append(orjson.dumps(row, option=orjson.OPT_APPEND_NEWLINE))
+        if len(lines) >= chunk_size:
+            yield b''.join(lines)
+            lines = []
+    if lines:
+        yield b''.join(lines)
+
+class ExportView(APIView):
+    """
+    Stream a table as NDJSON, e.g. GET /api/exports/events/?since=2025-01-01
+
+    `since` (inclusive) and `until` (exclusive) take ISO 8601 dates or
+    datetimes and filter on the export's date field.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, name):
+        export = EXPORTS.get(name)
+        if export is None:
+            raise Http404(f'No export named {name}')
+        try:
+            since = parse_bound(request.query_params.get('since'))
+            until = parse_bound(request.query_params.get('until'))
+        except ValidationError as e:
+            raise exceptions.ValidationError(e.messages)
+
+        response = StreamingHttpResponse(
+            ndjson_chunks(export.get_queryset(since, until)), content_type='application/x-ndjson',
+        )
+        response['Content-Disposition'] = f'attachment; filename="{name}.ndjson"'
+        # Keep proxies such as nginx from buffering the whole export
+        response['X-Accel-Buffering'] = 'no'
+        return response
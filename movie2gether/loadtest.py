@@ -0,0 +1,301 @@
+"""
+Load-test harness for the REST API, driven by the loadtest command.
+
+A run seeds its own dataset (users, movies, events, invitations) tagged
+with a run id, drives each scenario with `concurrency` worker threads
+until it has made `requests` requests, then deletes the dataset again.
+Requests go either through Django's test client in this process, or over
+HTTP to a running server that shares this process's database and
+SECRET_KEY (access tokens are minted locally).
+
+Every random choice comes from a seeded generator, so two runs with the
+same options issue the same requests. The report is JSON: per scenario,
+the request and error counts, throughput and p50/p95/p99 latency.
+`compare()` checks a report against a stored baseline.
+"""
+
+import itertools
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import requests
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connections
+from django.test import Client
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from events.models import Event, EventMembership, Invitation
+from events.signals import EVENTS_VERSION
+from movies.models import Movie
+from movies.signals import MOVIES_VERSION
+from .conditional import bump_version
+
+User = get_user_model()
+
+PASSWORD = 'loadtest-password'
+# Titles sent to the OMDb search; a small pool, so the lookup cache gets hits too
+OMDB_TITLES = 50
+
+class InProcessClient:
+    """Requests through Django's test client; one per worker thread"""
+
+    def __init__(self):
+        self.client = Client(raise_request_exception=False)
+
+    def request(self, method, path, data=None, token=None):
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        response = self.client.generic(
+            method, path, data='' if data is None else json.dumps(data), content_type='application/json',
+            headers=headers,
+        )
+        return response.status_code
+
+    def close(self):
+        pass
+
+class HTTPClient:
+    """Requests over HTTP to `base_url`, with a keep-alive session per worker"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.session = requests.Session()
+
+    def request(self, method, path, data=None, token=None):
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        response = self.session.request(method, self.base_url + path, json=data, headers=headers, timeout=30)
+        return response.status_code
+
+    def close(self):
+        self.session.close()
+
+class Dataset:
+    """The rows a run works on, created by seed() and removed by delete()"""
+
+    def __init__(self, run_id, users=50, events=200, invitations_per_event=2):
+        self.run_id = run_id
+        self.size = {'users': users, 'events': events, 'invitations_per_event': invitations_per_event}
+
+    def seed(self):
+        users, events, per_event = self.size['users'], self.size['events'], self.size['invitations_per_event']
+        if users < per_event + 2:
+            raise ValueError(f'Need at least {per_event + 2} users for {per_event} invitations per event')
+        if events < users:
+            raise ValueError('Need at least as many events as users, so that every user hosts one')
+
+        # Hash once: a run only ever needs one password
+        password = make_password(PASSWORD)
+        self.users = User.objects.bulk_create([
+            User(email=f'loadtest-{self.run_id}-{i}@example.com', username=f'loadtest-{self.run_id}-{i}', password=password)
+            for i in range(users)
+        ])
+        movies = Movie.objects.bulk_create([
+            Movie(title=f'Loadtest {self.run_id} movie {i}', description='Seeded by the load test',
+                  release_date=date(2000, 1, 1), poster_url='https://example.com/poster.jpg',
+                  imdb_id=f'lt{self.run_id}{i}')
+            for i in range(max(events // 10, 1))
+        ])
+        start = timezone.now() + timedelta(days=1)
+        self.events = Event.objects.bulk_create([
+            Event(movie=movies[i % len(movies)], title=f'Loadtest event {i}', description='Seeded by the load test',
+                  date=start + timedelta(hours=i), location='Somewhere', host=self.users[i % users])
+            for i in range(events)
+        ])
+        # Each event invites the users right after its host
+        self.invitations = Invitation.objects.bulk_create([
+            Invitation(event=event, invitee=invitee, invitee_email=invitee.email)
+            for i, event in enumerate(self.events)
+            for invitee in (self.users[(i + k) % users] for k in range(1, per_event + 1))
+        ])
+        EventMembership.objects.add_hosts(self.events)
+        EventMembership.objects.add_invitees(self.invitations)
+        bump_version(EVENTS_VERSION)
+        bump_version(MOVIES_VERSION)
+
+        self.tokens = {user.id: str(AccessToken.for_user(user)) for user in self.users}
+        self.hosted = {user.id: [] for user in self.users}
+        self.visible = {user.id: [] for user in self.users}
+        self.received = {user.id: [] for user in self.users}
+        for event in self.events:
+            self.hosted[event.host_id].append(event.id)
+            self.visible[event.host_id].append(event.id)
+        for invitation in self.invitations:
+            self.visible[invitation.invitee_id].append(invitation.event_id)
+            self.received[invitation.invitee_id].append(invitation.id)
+        # Events a user may ask to join: neither hosted by nor inviting them
+        self.joinable = {}
+        for user in self.users:
+            visible = set(self.visible[user.id])
+            self.joinable[user.id] = [event.id for event in self.events[:100] if event.id not in visible]
+
+    def delete(self):
+        # Events, invitations, memberships and notifications go with the users
+        User.objects.filter(email__startswith=f'loadtest-{self.run_id}-').delete()
+        Movie.objects.filter(title__startswith=f'Loadtest {self.run_id} ').delete()
+        bump_version(EVENTS_VERSION)
+        bump_version(MOVIES_VERSION)
+
+class Worker:
+    """State of one thread: its client, its user and its random generator"""
+
+    def __init__(self, client, dataset, user, seed):
+        self.client = client
+        self.dataset = dataset
+        self.user = user
+        self.token = dataset.tokens[user.id]
+        self.random = random.Random(seed)
+
+    def request(self, method, path, data=None, token=True):
+        return self.client.request(method, path, data, self.token if token else None)
+
+# Scenario name -> (function(worker, sequence number), expected status)
+SCENARIOS = {}
+
+def scenario(name, expected):
+    def register(func):
+        SCENARIOS[name] = (func, expected)
+        return func
+    return register
+
+@scenario('token', 200)
+def obtain_token(worker, n):
+    return worker.request('POST', '/api/accounts/token/', {'email': worker.user.email, 'password': PASSWORD}, token=False)
+
+@scenario('public_events', 200)
+def public_events(worker, n):
+    return worker.request('GET', '/api/events/public/', token=False)
+
+@scenario('my_events', 200)
+def my_events(worker, n):
+    return worker.request('GET', '/api/events/')
+
+@scenario('event_detail', 200)
+def event_detail(worker, n):
+    event_id = worker.random.choice(worker.dataset.visible[worker.user.id])
+    return worker.request('GET', f'/api/events/{event_id}/')
+
+@scenario('invite', 201)
+def invite(worker, n):
+    event_id = worker.random.choice(worker.dataset.hosted[worker.user.id])
+    email = f'loadtest-{worker.dataset.run_id}-guest-{n}@example.com'
+    return worker.request('POST', f'/api/events/{event_id}/invite/', {'invitee_email': email})
+
+@scenario('rsvp', 200)
+def rsvp(worker, n):
+    invitation_id = worker.random.choice(worker.dataset.received[worker.user.id])
+    status = worker.random.choice(['accepted', 'declined'])
+    return worker.request('PATCH', f'/api/events/invitations/{invitation_id}/rsvp/', {'status': status})
+
+@scenario('join_request', 201)
+def join_request(worker, n):
+    event_id = worker.random.choice(worker.dataset.joinable[worker.user.id])
+    return worker.request('POST', '/api/notifications/join-request/', {'event_id': event_id})
+
+@scenario('omdb_search', 200)
+def omdb_search(worker, n):
+    title = f'Loadtest {worker.dataset.run_id} omdb {worker.random.randrange(OMDB_TITLES)}'
+    return worker.request('GET', f'/api/movies/omdb/?title={requests.utils.quote(title)}')
+
+def run_scenario(name, dataset, make_client, requests_count, concurrency, warmup=0, seed=0):
+    """Drive one scenario; returns its statistics"""
+    func, expected = SCENARIOS[name]
+    counter = itertools.count()
+    latencies = []
+    errors = []
+    # Start and end of each worker's measured requests, so warmup and
+    # client setup are left out of the throughput
+    windows = []
+    lock = threading.Lock()
+
+    def work(index):
+        client = make_client()
+        # Spread the workers over the users, hosts and guests alike
+        worker = Worker(client, dataset, dataset.users[index % len(dataset.users)], seed * 1000 + index)
+        try:
+            for _ in range(warmup):
+                func(worker, next(counter))
+            timings, failed = [], 0
+            window_start = time.perf_counter()
+            while True:
+                n = next(counter)
+                if n >= requests_count + warmup * concurrency:
+                    break
+                started = time.perf_counter()
+                status = func(worker, n)
+                timings.append(time.perf_counter() - started)
+                if status != expected:
+                    failed += 1
+            with lock:
+                latencies.extend(timings)
+                errors.append(failed)
+                if timings:
+                    windows.append((window_start, time.perf_counter()))
+        finally:
+            client.close()
+            if concurrency > 1:
+                connections.close_all()
+
+    if concurrency == 1:
+        work(0)
+    else:
+        with ThreadPoolExecutor(concurrency) as pool:
+            list(pool.map(work, range(concurrency)))
+    elapsed = max(end for start, end in windows) - min(start for start, end in windows) if windows else 0
+    return summarize(latencies, sum(errors), elapsed)
+
+def summarize(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        'mean_ms': round(1000 * sum(latencies) / len(latencies), 2) if latencies else 0.0,
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+        'p99_ms': percentile(latencies, 99),
+    }
+
+def percentile(ordered, p):
+    """Nearest-rank percentile of sorted seconds, in milliseconds"""
+    if not ordered:
+        return 0.0
+    return round(1000 * ordered[max(math.ceil(p / 100 * len(ordered)) - 1, 0)], 2)
+
+def compare(report, baseline, tolerance=0.1):
+    """
+    Changes from `baseline`, per scenario present in both reports.
+
+    A scenario regresses when its throughput drops, or its p95 latency
+    grows, by more than `tolerance` (a fraction), or when it has errors
+    that the baseline did not have.
+    """
+    comparison = {}
+    for name, current in report['scenarios'].items():
+        previous = baseline['scenarios'].get(name)
+        if previous is None:
+            continue
+        throughput = change(current['throughput_rps'], previous['throughput_rps'])
+        p95 = change(current['p95_ms'], previous['p95_ms'])
+        comparison[name] = {
+            'throughput_change': throughput,
+            'p95_change': p95,
+            'regressed': (
+                throughput < -tolerance or p95 > tolerance or current['errors'] > previous['errors']
+            ),
+        }
+    return comparison
+
+def change(current, previous):
+    if not previous:
+        return 0.0
+    return round((current - previous) / previous, 4)
+
+def new_run_id():
+    return uuid.uuid4().hex[:6]
@@ -0,0 +1,194 @@
+"""
+Logging that stays cheap on request hot paths.
+
+* RequestContextMiddleware binds a request id to the current context
+  (thread or task); RequestContextFilter stamps it, and the id of the
+  authenticated user, on every record logged while the request runs.
+* SamplingFilter keeps only a fraction of the records below a level, so
+  high-frequency debug events can stay in the code.
+* QueueHandler hands records to a background thread, which does the
+  formatting and the I/O; a full queue drops records instead of blocking.
+* JSONFormatter writes one JSON object per record, with the context.
+
+Hot paths log with %-style arguments (logger.debug('x %s', y)), so
+nothing is formatted for records that are filtered out.
+"""
+
+import atexit
+import copy
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import uuid
+from contextvars import ContextVar
+
+import orjson
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.utils.functional import SimpleLazyObject, empty
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+# Ids from upstream proxies are kept if they look like ids
+VALID_REQUEST_ID = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+current_request_id = ContextVar('request_id', default=None)
+current_request = ContextVar('request', default=None)
+
+def current_user_id():
+    """The id of the request's user, if it has been authenticated yet"""
+    request = current_request.get()
+    if request is None:
+        return None
+    # Never trigger authentication from a log call: only look at a user that
+    # DRF has set, or that the session middleware's lazy object already loaded
+    user = request.__dict__.get('user')
+    if isinstance(user, SimpleLazyObject):
+        user = None if user._wrapped is empty else user._wrapped
+    if user is None or not user.is_authenticated:
+        return None
+    return user.pk
+
+class RequestContextMiddleware:
+    """Give every request an id, for its log records and its response"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        tokens = self.bind(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            self.unbind(tokens)
+        response[REQUEST_ID_HEADER] = request.request_id
+        return response
+
+    async def __acall__(self, request):
+        tokens = self.bind(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            self.unbind(tokens)
+        response[REQUEST_ID_HEADER] = request.request_id
+        return response
+
+    def bind(self, request):
+        request_id = request.headers.get(REQUEST_ID_HEADER, '')
+        if not VALID_REQUEST_ID.match(request_id):
+            request_id = uuid.uuid4().hex
+        request.request_id = request_id
+        return current_request_id.set(request_id), current_request.set(request)
+
+    def unbind(self, tokens):
+        current_request_id.reset(tokens[0])
+        current_request.reset(tokens[1])
+
+class RequestContextFilter(logging.Filter):
+    """Add request_id and user_id attributes to records"""
+
+    def filter(self, record):
+        record.request_id = current_request_id.get() or '-'
+        record.user_id = current_user_id() or '-'
+        return True
+
+class SamplingFilter(logging.Filter):
+    """Keep `rate` of the records below `level`, and every record from `level` up"""
+
+    def __init__(self, rate=0.01, level='INFO'):
+        super().__init__()
+        self.rate = float(rate)
+        self.level = logging._checkLevel(level)
+
+    def filter(self, record):
+        return record.levelno >= self.level or random.random() < self.rate
+
+class QueueHandler(logging.handlers.QueueHandler):
+    """
+    Log through a background thread.
+
+    `handlers` are the handlers that do the real work; in dictConfig, refer
+    to them as 'cfg://handlers.<name>'. dictConfig builds handlers in name
+    order, so they must sort before this one. The thread starts with the
+    first record, and again in a forked child, which inherits the handler
+    but not the thread. Once stopped, which happens at exit, when no new
+    thread could start, the handler writes records in the calling thread.
+    """
+
+    def __init__(self, handlers=(), maxsize=10000):
+        super().__init__(queue.Queue(maxsize))
+        self.maxsize = maxsize
+        # Index rather than iterate: dictConfig resolves cfg:// items on access
+        self.handlers = [handlers[i] for i in range(len(handlers))]
+        self.listener = None
+        self.pid = None
+        self.dropped = 0
+
+    def start(self):
+        if self.pid not in (None, os.getpid()):
+            # Forked: the queue holds the parent's records, for its own thread
+            self.queue = queue.Queue(self.maxsize)
+        self.pid = os.getpid()
+        self.listener = logging.handlers.QueueListener(self.queue, *self.handlers, respect_handler_level=True)
+        self.listener.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """Write out the queued records and stop the thread"""
+        if self.listener is not None and self.pid == os.getpid():
+            self.listener.stop()
+        self.listener = None
+
+    def prepare(self, record):
+        # Merge the arguments now, since they may change once the caller
+        # moves on, but leave the formatting to the listener thread. The
+        # queue never leaves the process, so exc_info can travel as is.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def emit(self, record):
+        if self.pid != os.getpid():
+            self.acquire()
+            try:
+                if self.pid != os.getpid():
+                    self.start()
+            finally:
+                self.release()
+        if self.listener is None:
+            for handler in self.handlers:
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+            return
+        super().emit(record)
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per record"""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', '-'),
+            'user_id': getattr(record, 'user_id', '-'),
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return orjson.dumps(entry, default=str).decode()
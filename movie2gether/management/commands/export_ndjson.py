@@ -0,0 +1,40 @@
+import sys
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from movie2gether.exports import CHUNK_SIZE, EXPORTS, ndjson_chunks, parse_bound
+
+
+class Command(BaseCommand):
+    """
+    Write a table as NDJSON, the same rows as GET /api/exports/<name>/.
+
+    Rows are streamed over a server-side cursor, so memory use does not
+    grow with the size of the table.
+    """
+    help = 'Export events, invitations, movies or notifications as NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', choices=sorted(EXPORTS))
+        parser.add_argument('--since', help='ISO 8601 date or datetime, inclusive')
+        parser.add_argument('--until', help='ISO 8601 date or datetime, exclusive')
+        parser.add_argument('--output', help='File to write (default: standard output)')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            since = parse_bound(options['since'])
+            until = parse_bound(options['until'])
+        except ValidationError as e:
+            raise CommandError(e.messages[0])
+
+        queryset = EXPORTS[options['name']].get_queryset(since, until)
+        output = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        try:
+            for chunk in ndjson_chunks(queryset, options['chunk_size']):
+                output.write(chunk)
+        finally:
+            if options['output']:
+                output.close()
+            else:
+                output.flush()
@@ -0,0 +1,120 @@
+import json
+from contextlib import ExitStack
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from movie2gether.loadtest import SCENARIOS, Dataset, HTTPClient, InProcessClient, compare, new_run_id, run_scenario
+from movie2gether.testing import eager_tasks
+from movies.fake_omdb import FakeOMDbServer
+
+
+class Command(BaseCommand):
+    """
+    Benchmark the API: throughput and p50/p95/p99 latency per scenario.
+
+    By default requests go through Django's test client in this process,
+    with OMDb replaced by a local fake server, and Celery tasks run eagerly
+    with emails kept in memory, so neither a broker nor SMTP is needed.
+    With --url they go over HTTP to a running server instead; start that server with OMDB_BASE_URL
+    pointing at `python -m movies.fake_omdb`, and on the same database and
+    SECRET_KEY as this command. Use a development database: the run seeds
+    its own rows and deletes them afterwards.
+
+    The JSON report can be saved with --output and later passed back as
+    --baseline; the command then fails if a scenario regressed by more
+    than --tolerance.
+    """
+    help = 'Load-test the REST API and report latency percentiles as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='Base URL of a running server (default: in-process)')
+        parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                            help=f'Comma-separated scenarios (default: all of {", ".join(SCENARIOS)})')
+        parser.add_argument('--requests', type=int, default=200, help='Measured requests per scenario')
+        parser.add_argument('--concurrency', type=int, default=4, help='Worker threads')
+        parser.add_argument('--warmup', type=int, default=5, help='Unmeasured requests per worker and scenario')
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--events', type=int, default=200)
+        parser.add_argument('--invitations-per-event', type=int, default=2)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--omdb-latency', type=float, default=0.0,
+                            help='Seconds the in-process fake OMDb waits per reply')
+        parser.add_argument('--output', help='Write the JSON report here (default: standard output)')
+        parser.add_argument('--baseline', help='Earlier JSON report to compare with')
+        parser.add_argument('--tolerance', type=float, default=0.1,
+                            help='Allowed throughput drop or p95 growth, as a fraction (default 0.1)')
+        parser.add_argument('--keep', action='store_true', help='Leave the seeded rows in the database')
+
+    def handle(self, *args, **options):
+        names = [name.strip() for name in options['scenarios'].split(',') if name.strip()]
+        unknown = set(names) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f'Unknown scenarios: {", ".join(sorted(unknown))}')
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+
+        dataset = Dataset(new_run_id(), options['users'], options['events'], options['invitations_per_event'])
+        with ExitStack() as stack:
+            if options['url']:
+                def make_client():
+                    return HTTPClient(options['url'])
+            else:
+                omdb = stack.enter_context(FakeOMDbServer(latency=options['omdb_latency']))
+                stack.enter_context(override_settings(
+                    OMDB_BASE_URL=omdb.url, EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+                ))
+                stack.enter_context(eager_tasks())
+                make_client = InProcessClient
+
+            try:
+                dataset.seed()
+            except ValueError as e:
+                raise CommandError(str(e))
+            try:
+                results = {}
+                for name in names:
+                    results[name] = run_scenario(
+                        name, dataset, make_client, options['requests'], options['concurrency'],
+                        warmup=options['warmup'], seed=options['seed'],
+                    )
+                    self.stderr.write(self.describe(name, results[name]))
+            finally:
+                if not options['keep']:
+                    dataset.delete()
+
+        report = {
+            'meta': {
+                'mode': options['url'] or 'in-process',
+                'requests': options['requests'],
+                'concurrency': options['concurrency'],
+                'warmup': options['warmup'],
+                'seed': options['seed'],
+                'dataset': dataset.size,
+            },
+            'scenarios': results,
+        }
+        regressed = []
+        if baseline is not None:
+            report['comparison'] = compare(report, baseline, options['tolerance'])
+            regressed = [name for name, result in report['comparison'].items() if result['regressed']]
+
+        output = json.dumps(report, indent=2) + '\n'
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+        else:
+            self.stdout.write(output, ending='')
+
+        if regressed:
+            raise CommandError(f'Regressed against the baseline: {", ".join(regressed)}')
+
+    def describe(self, name, result):
+        line = (
+            f'{name}: {result["requests"]} requests, {result["throughput_rps"]} req/s, '
+            f'p50 {result["p50_ms"]}ms, p95 {result["p95_ms"]}ms, p99 {result["p99_ms"]}ms'
+        )
+        if result['errors']:
+            return self.style.ERROR(f'{line}, {result["errors"]} errors')
+        return line
@@ -0,0 +1,244 @@
+import csv
+import io
+import random
+import time
+from array import array
+from contextlib import contextmanager
+from datetime import datetime, time as clock, timedelta, timezone as dt_timezone
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, models, transaction
+from django.db.models import Max
+from events.models import Event, EventMembership, Invitation
+from events.signals import EVENTS_VERSION
+from movie2gether.conditional import bump_version
+from movies.models import Movie
+from movies.signals import MOVIES_VERSION
+from notifications.models import Notification
+
+User = get_user_model()
+
+# Marks NULL in the COPY stream, so that empty strings stay empty strings
+COPY_NULL = '\\N'
+
+STATUSES = ['pending', 'accepted', 'declined']
+STATUS_WEIGHTS = [50, 35, 15]
+# Share of invitees who already have an account
+SIGNED_UP = 0.7
+
+class Command(BaseCommand):
+    """
+    Generate a large synthetic dataset for capacity planning.
+
+    Rows are drawn from a seeded generator, so the same options always give
+    the same data (timestamps are relative to --now, today by default).
+    The distributions are skewed the way real usage is: a few hosts run
+    most events, a few movies get most screenings, and invitation counts
+    per event are log-normal.
+
+    Rows are generated and written in chunks, so memory stays flat. On
+    PostgreSQL each chunk is streamed with COPY; other databases get
+    bulk_create. Keys are assigned here, after the current maximum of each
+    table, and the sequences are reset at the end. Every row references
+    rows of the same run only, so the command can be run against a
+    non-empty database, and run again to add more.
+
+        manage.py seed_scale --users 1000000 --movies 200000 --events 2000000
+    """
+    help = 'Bulk-generate users, movies, events, invitations and notifications'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--movies', type=int, default=5000)
+        parser.add_argument('--events', type=int, default=20000)
+        parser.add_argument('--notifications', type=int, default=50000)
+        parser.add_argument('--max-invitations', type=int, default=50, help='Upper bound of invitations per event')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--now', help='ISO date the timestamps are relative to (default: today)')
+        parser.add_argument('--password', default='password', help='Password of every generated user')
+        parser.add_argument('--chunk-size', type=int, default=20000, help='Rows per COPY or bulk_create')
+
+    def handle(self, *args, **options):
+        if options['users'] < 2 or options['movies'] < 1:
+            raise CommandError('Need at least 2 users and 1 movie')
+        self.random = random.Random(options['seed'])
+        self.chunk_size = options['chunk_size']
+        self.copy = connection.vendor == 'postgresql'
+        today = datetime.fromisoformat(options['now']).date() if options['now'] else datetime.now(dt_timezone.utc).date()
+        self.now = datetime.combine(today, clock(), tzinfo=dt_timezone.utc)
+        self.loaded = {}
+        self.started = time.monotonic()
+
+        self.first_user = self.next_id(User)
+        self.first_movie = self.next_id(Movie)
+        self.users = options['users']
+        self.movies = options['movies']
+
+        self.load(User, self.user_fields(), self.generate_users(options['users'], make_password(options['password'])))
+        self.load(Movie, ['id', 'title', 'description', 'release_date', 'poster_url', 'imdb_id'],
+                  self.generate_movies(options['movies']))
+        hosts = self.load_events(options['events'], options['max_invitations'])
+        self.load(Notification, ['user_id', 'sender_id', 'event_id', 'notification_type', 'message', 'is_read', 'created_at'],
+                  self.generate_notifications(options['notifications'], hosts))
+
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [User, Movie, Event, Invitation, Notification]):
+                cursor.execute(sql)
+        bump_version(EVENTS_VERSION)
+        bump_version(MOVIES_VERSION)
+
+        elapsed = time.monotonic() - self.started
+        total = sum(self.loaded.values())
+        summary = ', '.join(f'{count} {name}' for name, count in self.loaded.items())
+        self.stdout.write(self.style.SUCCESS(f'Loaded {summary} in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s)'))
+
+    def next_id(self, model):
+        return (model.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+
+    # Skewed picks: index 0 is the most popular
+    def pick_host(self):
+        return self.first_user + int(self.users * self.random.random() ** 3)
+
+    def pick_movie(self):
+        return self.first_movie + int(self.movies * self.random.random() ** 2.5)
+
+    def past(self, days):
+        return self.now - timedelta(seconds=self.random.randrange(days * 86400))
+
+    def user_fields(self):
+        return ['id', 'password', 'is_superuser', 'username', 'first_name', 'last_name', 'email', 'is_staff',
+                'is_active', 'date_joined', 'bio', 'date_modified']
+
+    def generate_users(self, count, password):
+        for user_id in range(self.first_user, self.first_user + count):
+            joined = self.past(730)
+            yield (user_id, password, False, f'user{user_id}', '', '', f'user{user_id}@example.com', False,
+                   True, joined, '', joined)
+
+    def generate_movies(self, count):
+        for movie_id in range(self.first_movie, self.first_movie + count):
+            yield (movie_id, f'Synthetic movie {movie_id}', f'A synthetic plot for movie {movie_id}.',
+                   self.now.date() - timedelta(days=self.random.randrange(365 * 80)),
+                   f'https://example.com/posters/{movie_id}.jpg', f'ts{movie_id:08d}')
+
+    def load_events(self, count, max_invitations):
+        """Load events with their invitations and memberships; returns the host of each event"""
+        self.first_event = first_event = self.next_id(Event)
+        next_invitation = self.next_id(Invitation)
+        hosts = array('q')
+        events, invitations, memberships = [], [], []
+
+        for event_id in range(first_event, first_event + count):
+            host = self.pick_host()
+            hosts.append(host)
+            created = self.past(365)
+            # Most events are in the past, about a sixth are still to come
+            date = created + timedelta(hours=self.random.randrange(24 * 90))
+            events.append((event_id, self.pick_movie(), f'Movie night {event_id}', '', date, 'Somewhere',
+                           host, created, created))
+            memberships.append((event_id, host, EventMembership.HOST))
+
+            size = min(int(self.random.lognormvariate(1.0, 1.0)), max_invitations, self.users - 1)
+            for invitee in self.random.sample(range(self.users), size + 1):
+                invitee += self.first_user
+                if invitee == host or size == 0:
+                    continue
+                size -= 1
+                status = self.random.choices(STATUSES, STATUS_WEIGHTS)[0]
+                invited = created + timedelta(seconds=self.random.randrange(86400))
+                responded = None if status == 'pending' else invited + timedelta(seconds=self.random.randrange(3 * 86400))
+                if self.random.random() < SIGNED_UP:
+                    email = f'user{invitee}@example.com'
+                    memberships.append((event_id, invitee, EventMembership.INVITEE))
+                else:
+                    email, invitee = f'guest{next_invitation}@example.org', None
+                invitations.append((next_invitation, event_id, invitee, email, status, invited, responded))
+                next_invitation += 1
+
+            if len(events) >= self.chunk_size:
+                self.flush_events(events, invitations, memberships)
+        self.flush_events(events, invitations, memberships)
+        return hosts
+
+    def flush_events(self, events, invitations, memberships):
+        self.load(Event, ['id', 'movie_id', 'title', 'description', 'date', 'location', 'host_id', 'created_at',
+                          'updated_at'], events)
+        self.load(Invitation, ['id', 'event_id', 'invitee_id', 'invitee_email', 'status', 'invited_at',
+                               'responded_at'], invitations)
+        self.load(EventMembership, ['event_id', 'user_id', 'role'], memberships)
+        events.clear()
+        invitations.clear()
+        memberships.clear()
+
+    def generate_notifications(self, count, hosts):
+        if not hosts:
+            return
+        for _ in range(count):
+            index = int(len(hosts) * self.random.random() ** 2)  # Busy events get more
+            event_id = self.first_event + index
+            sender = self.first_user + self.random.randrange(self.users)
+            created = self.past(365)
+            if self.random.random() < 0.5:
+                yield (hosts[index], sender, event_id, 'join_request', f'user{sender}@example.com wants to join your event',
+                       self.random.random() < 0.7, created)
+            else:
+                yield (sender, hosts[index], event_id, 'invitation', f'You are invited to movie night {event_id}',
+                       self.random.random() < 0.7, created)
+
+    def load(self, model, fields, rows):
+        """Write rows (tuples in `fields` order) in chunks of chunk_size"""
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= self.chunk_size:
+                self.write(model, fields, chunk)
+                chunk = []
+        if chunk:
+            self.write(model, fields, chunk)
+
+    def write(self, model, fields, rows):
+        with transaction.atomic():
+            if self.copy:
+                self.copy_rows(model, fields, rows)
+            else:
+                with explicit_timestamps(model):
+                    model.objects.bulk_create([model(**dict(zip(fields, row))) for row in rows], batch_size=2000)
+        name = model._meta.verbose_name_plural
+        self.loaded[name] = self.loaded.get(name, 0) + len(rows)
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(f'{self.loaded[name]} {name} ({sum(self.loaded.values()) / elapsed:,.0f} rows/s)')
+
+    def copy_rows(self, model, fields, rows):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([COPY_NULL if value is None else value for value in row])
+        buffer.seek(0)
+        columns = ', '.join(connection.ops.quote_name(model._meta.get_field(name).column) for name in fields)
+        sql = f"COPY {connection.ops.quote_name(model._meta.db_table)} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '{COPY_NULL}')"
+        with connection.cursor() as cursor:
+            raw = cursor.cursor
+            if hasattr(raw, 'copy_expert'):  # psycopg2
+                raw.copy_expert(sql, buffer)
+            else:  # psycopg 3
+                with raw.copy(sql) as copy:
+                    copy.write(buffer.getvalue())
+
+@contextmanager
+def explicit_timestamps(model):
+    """Let bulk_create keep the generated auto_now/auto_now_add values"""
+    fields = [
+        field for field in model._meta.concrete_fields
+        if isinstance(field, models.DateField) and (field.auto_now or field.auto_now_add)
+    ]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
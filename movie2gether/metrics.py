@@ -0,0 +1,241 @@
+"""
+Per-request performance metrics.
+
+MetricsMiddleware times every request and, while it runs, counts:
+
+* database queries and their time, through `connection.execute_wrapper`;
+* cache hits and misses, through InstrumentedRedisCache;
+* time spent waiting on upstream services such as OMDb, through `timed()`.
+
+The numbers go out with the response as a Server-Timing header (shown in
+the browser's network panel) and are added to per-route totals and
+latency histograms, served by metrics_view in the Prometheus text format.
+
+The totals live in the memory of each process, so every worker process
+must be scraped on its own (or run one process per container). Recording
+costs a few perf_counter() calls and one lock per request.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache.backends.redis import RedisCache
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+current_metrics = ContextVar('request_metrics', default=None)
+
+# Seconds; the usual Prometheus defaults
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class RequestMetrics:
+    """What one request spent its time on"""
+    __slots__ = ('started', 'db_queries', 'db_time', 'cache_hits', 'cache_misses', 'upstream')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.upstream = defaultdict(float)
+
+    def record_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_queries += 1
+            self.db_time += time.perf_counter() - started
+
+    def server_timing(self, total):
+        timings = [
+            f'total;dur={total * 1000:.1f}',
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.db_queries} queries"',
+        ]
+        if self.cache_hits or self.cache_misses:
+            timings.append(f'cache;desc="{self.cache_hits} hits, {self.cache_misses} misses"')
+        timings.extend(f'{name};dur={seconds * 1000:.1f}' for name, seconds in self.upstream.items())
+        return ', '.join(timings)
+
+@contextmanager
+def timed(name):
+    """Count the wrapped block as time spent on the `name` upstream"""
+    metrics = current_metrics.get()
+    if metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.upstream[name] += time.perf_counter() - started
+
+def record_cache(hits, misses):
+    metrics = current_metrics.get()
+    if metrics is not None:
+        metrics.cache_hits += hits
+        metrics.cache_misses += misses
+
+class InstrumentedRedisCache(RedisCache):
+    """RedisCache that counts the hits and misses of the current request"""
+    _missing = object()
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, self._missing, version)
+        if value is self._missing:
+            record_cache(0, 1)
+            return default
+        record_cache(1, 0)
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        values = super().get_many(keys, version)
+        record_cache(len(values), len(keys) - len(values))
+        return values
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+class Registry:
+    """Per-route totals for this process"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.latency = defaultdict(lambda: Histogram(LATENCY_BUCKETS))
+        self.counters = defaultdict(int)
+
+    def observe(self, method, route, status, total, metrics):
+        with self.lock:
+            self.latency[(method, route, str(status))].observe(total)
+            counters = self.counters
+            counters[('http_requests_db_queries_total', route, '')] += metrics.db_queries
+            counters[('http_requests_db_seconds_total', route, '')] += metrics.db_time
+            counters[('http_requests_cache_total', route, 'hit')] += metrics.cache_hits
+            counters[('http_requests_cache_total', route, 'miss')] += metrics.cache_misses
+            for name, seconds in metrics.upstream.items():
+                counters[('http_requests_upstream_seconds_total', route, name)] += seconds
+
+    def render(self):
+        """Everything recorded, in the Prometheus text exposition format"""
+        with self.lock:
+            latency = {labels: (list(h.counts), h.sum) for labels, h in self.latency.items()}
+            counters = dict(self.counters)
+
+        lines = [
+            '# HELP http_request_duration_seconds Time to build the response, by route',
+            '# TYPE http_request_duration_seconds histogram',
+        ]
+        for (method, route, status), (counts, total) in sorted(latency.items()):
+            labels = f'method="{method}",route="{escape(route)}",status="{status}"'
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), counts):
+                cumulative += count
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'http_request_duration_seconds_sum{{{labels}}} {total}')
+            lines.append(f'http_request_duration_seconds_count{{{labels}}} {cumulative}')
+
+        for name, help_text, extra in COUNTERS:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} counter')
+            for (counter, route, value_label), value in sorted(counters.items()):
+                if counter != name:
+                    continue
+                labels = f'route="{escape(route)}"'
+                if extra:
+                    labels += f',{extra}="{value_label}"'
+                lines.append(f'{name}{{{labels}}} {value}')
+        return '\n'.join(lines) + '\n'
+
+# name, help, extra label
+COUNTERS = (
+    ('http_requests_db_queries_total', 'Database queries run by requests', None),
+    ('http_requests_db_seconds_total', 'Time requests spent in database queries', None),
+    ('http_requests_cache_total', 'Cache reads by requests', 'result'),
+    ('http_requests_upstream_seconds_total', 'Time requests spent waiting on upstream services', 'upstream'),
+)
+
+def escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+registry = Registry()
+
+class MetricsMiddleware:
+    """Measure every request; see the module docstring"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        try:
+            with self.instrument_queries(metrics):
+                response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        try:
+            with self.instrument_queries(metrics):
+                response = await self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.finish(request, response, metrics)
+
+    def instrument_queries(self, metrics):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(metrics.record_query))
+        return stack
+
+    def finish(self, request, response, metrics):
+        total = time.perf_counter() - metrics.started
+        response['Server-Timing'] = metrics.server_timing(total)
+        match = getattr(request, 'resolver_match', None)
+        # The route pattern, not the path, so that ids do not become labels
+        route = match.route if match is not None else 'unmatched'
+        registry.observe(request.method, route, response.status_code, total, metrics)
+        return response
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint, for requests bearing METRICS_TOKEN.
+
+    Without a configured token it is closed, except under DEBUG.
+    """
+    token = settings.METRICS_TOKEN
+    if not token:
+        if not settings.DEBUG:
+            return HttpResponseForbidden()
+    elif not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,134 @@
+"""
+Read-only serializer output built from `.values()` rows.
+
+A ModelSerializer pays for a model instance per row, then for walking
+its fields and resolving every source attribute one by one. For read-heavy
+lists that cost dominates the request. A Projection compiles a serializer
+class once into a flat plan: the database columns it reads (joined columns
+included, e.g. `movie__title` for a nested MovieSerializer) and a converter
+per field. Rows then come straight from `queryset.values()` and are turned
+into the same dicts the serializer would produce, key order included.
+
+SerializerMethodFields cannot be compiled, so a serializer that uses them
+declares a `projected_methods` mapping of field name to Method.
+"""
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+from rest_framework import ISO_8601, fields, relations, serializers
+from rest_framework.settings import api_settings
+
+VALUE, NESTED, METHOD = range(3)
+
+# Fields whose representation of a database value is the value itself
+IDENTITY_FIELDS = (
+    fields.BooleanField, fields.CharField, fields.EmailField, fields.IntegerField,
+    fields.SlugField, fields.URLField,
+)
+
+class Method:
+    """
+    Stands in for a SerializerMethodField in a Projection.
+
+    `func` is called with the values of `columns`, relative to the
+    serializer's model, followed by the serializer context.
+    """
+
+    def __init__(self, columns, func):
+        self.columns = tuple(columns)
+        self.func = func
+
+class Projection:
+    """Produces a serializer's output for `.values()` rows"""
+
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+        # Datetimes are rendered in the current time zone, so plans are per zone
+        self.plans = {}
+
+    def values(self, queryset):
+        """The queryset narrowed to the columns the serializer reads"""
+        return queryset.values(*self.get_plan()[1])
+
+    def serialize(self, rows, context):
+        plan = self.get_plan()[0]
+        return [build(plan, row, context) for row in rows]
+
+    def get_plan(self):
+        tz = timezone.get_current_timezone() if settings.USE_TZ else None
+        plan = self.plans.get(tz)
+        if plan is None:
+            columns = []
+            plan = self.plans[tz] = (compile_serializer(self.serializer_class(), '', columns, tz), columns)
+        return plan
+
+def build(plan, row, context):
+    data = {}
+    for key, kind, column, convert in plan:
+        if kind == VALUE:
+            value = row[column]
+            if value is not None and convert is not None:
+                value = convert(value)
+        elif kind == NESTED:
+            value = None if row[column] is None else build(convert, row, context)
+        else:
+            value = convert.func(*[row[name] for name in column], context)
+        data[key] = value
+    return data
+
+def compile_serializer(serializer, prefix, columns, tz):
+    methods = getattr(serializer, 'projected_methods', {})
+    plan = []
+
+    def read(column):
+        if column not in columns:
+            columns.append(column)
+        return column
+
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        column = prefix + field.source.replace('.', '__')
+        if name in methods:
+            method = methods[name]
+            plan.append((name, METHOD, tuple(read(prefix + relative) for relative in method.columns), method))
+        elif isinstance(field, serializers.BaseSerializer):
+            if isinstance(field, serializers.ListSerializer):
+                raise ImproperlyConfigured(f'{type(serializer).__name__}.{name}: many=True cannot be projected')
+            # A null foreign key gives a null object, as in the serializer
+            plan.append((name, NESTED, read(column), compile_serializer(field, f'{column}__', columns, tz)))
+        elif isinstance(field, (fields.SerializerMethodField, fields.HiddenField)) or field.source == '*':
+            raise ImproperlyConfigured(
+                f'{type(serializer).__name__}.{name} needs an entry in projected_methods to be projected'
+            )
+        else:
+            plan.append((name, VALUE, read(column), get_converter(field, tz)))
+    return plan
+
+def get_converter(field, tz):
+    """A function from a non-null column value to the field's representation"""
+    if type(field) in IDENTITY_FIELDS:
+        return None
+    if type(field) is relations.PrimaryKeyRelatedField:
+        # values() already yields the key
+        if field.pk_field is None:
+            return None
+        return field.pk_field.to_representation
+    if type(field) is fields.DateTimeField:
+        output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+        field_timezone = getattr(field, 'timezone', tz)
+        if output_format is not None and output_format.lower() == ISO_8601 and field_timezone is not None:
+            def convert_datetime(value):
+                if timezone.is_naive(value):
+                    return field.to_representation(value)
+                value = value.astimezone(field_timezone).isoformat()
+                if value.endswith('+00:00'):
+                    value = value[:-6] + 'Z'
+                return value
+            return convert_datetime
+    if type(field) is fields.DateField:
+        output_format = getattr(field, 'format', api_settings.DATE_FORMAT)
+        if output_format is not None and output_format.lower() == ISO_8601:
+            return lambda value: value.isoformat()
+    return field.to_representation
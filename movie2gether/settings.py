@@ -41,6 +41,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     
     # Third party apps
     'rest_framework',
@@ -49,6 +50,7 @@ INSTALLED_APPS = [
     'rest_framework_simplejwt.token_blacklist',
     
     # Local apps
+    'movie2gether',  # Project-wide management commands
     'accounts',
     'movies',  
     'events',  # New events app
@@ -56,6 +58,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'movie2gether.log.RequestContextMiddleware',  # First, so every log record gets the request id
+    'movie2gether.metrics.MetricsMiddleware',  # Server-Timing and /metrics
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',  
@@ -68,6 +72,42 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'movie2gether.urls'
 
+# Bearer token required by the Prometheus /metrics endpoint; without one
+# the endpoint is only served when DEBUG is on
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Logging: records are stamped with the request and user ids, debug records
+# are sampled, and the formatting and writing happen on a background thread
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text')  # or 'json'
+LOG_DEBUG_SAMPLE_RATE = float(os.environ.get('LOG_DEBUG_SAMPLE_RATE', 0.01))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {
+        'request_context': {'()': 'movie2gether.log.RequestContextFilter'},
+        'sample_debug': {'()': 'movie2gether.log.SamplingFilter', 'rate': LOG_DEBUG_SAMPLE_RATE, 'level': 'INFO'},
+    },
+    'formatters': {
+        'text': {'format': '%(asctime)s %(levelname)s %(name)s [%(request_id)s user=%(user_id)s] %(message)s'},
+        'json': {'()': 'movie2gether.log.JSONFormatter'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': LOG_FORMAT},
+        'queue': {
+            '()': 'movie2gether.log.QueueHandler',
+            'handlers': ['cfg://handlers.console'],
+            # Filters run in the logging thread, before the record is queued
+            'filters': ['sample_debug', 'request_context'],
+        },
+    },
+    'root': {'handlers': ['queue'], 'level': LOG_LEVEL},
+    'loggers': {
+        'django': {'handlers': ['queue'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -133,15 +173,17 @@ LOGOUT_REDIRECT_URL = '/api/auth/token/'
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.CachedJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # The browsable API renders a full HTML page per request, so it is only
+    # offered while developing
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
-        'rest_framework.renderers.BrowsableAPIRenderer',
+        'movie2gether.renderers.ORJSONRenderer',
+        *(['rest_framework.renderers.BrowsableAPIRenderer'] if DEBUG else []),
     ],
 }
 
@@ -160,7 +202,15 @@ SIMPLE_JWT = {
     'SLIDING_TOKEN_REFRESH_EXP_CLAIM': 'refresh_exp',
     'SLIDING_TOKEN_LIFETIME': timedelta(minutes=5),
     'SLIDING_TOKEN_REFRESH_LIFETIME': timedelta(days=1),
+    # Checks the blacklist in the cache before the database
+    'TOKEN_REFRESH_SERIALIZER': 'accounts.auth.CachedBlacklistTokenRefreshSerializer',
 }
+# CachedJWTAuthentication keeps users this many seconds in the shared
+# cache, and this many seconds (up to AUTH_USER_LOCAL_SIZE of them) in
+# each process; the local TTL bounds how late a deactivation takes effect
+AUTH_USER_CACHE_TIMEOUT = 300
+AUTH_USER_LOCAL_TTL = 5
+AUTH_USER_LOCAL_SIZE = 1000
 
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = True  # Only for development
@@ -207,6 +257,16 @@ STATICFILES_DIRS = [
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 OMDB_API_KEY = 'd525f2b3'
+OMDB_BASE_URL = os.environ.get('OMDB_BASE_URL', 'http://www.omdbapi.com/')
+# Seconds; the connect timeout is just above a TCP retransmission window
+OMDB_CONNECT_TIMEOUT = float(os.environ.get('OMDB_CONNECT_TIMEOUT', 3.05))
+OMDB_READ_TIMEOUT = float(os.environ.get('OMDB_READ_TIMEOUT', 5))
+OMDB_MAX_RETRIES = 2
+# Connection pool size per event loop for the async OMDb endpoint
+OMDB_ASYNC_MAX_CONNECTIONS = 100
+# Stop calling OMDb after this many consecutive failures, for this many seconds
+OMDB_CIRCUIT_FAILURE_THRESHOLD = 5
+OMDB_CIRCUIT_RESET_TIMEOUT = 30
 
 # Email settings
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
@@ -216,6 +276,29 @@ EMAIL_USE_TLS = True
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
+# Celery workers send their emails over one long-lived SMTP connection;
+# reopen the connection before the SMTP server drops it as idle
+EMAIL_CONNECTION_MAX_IDLE = 30
+# Transactional outbox (notifications.outbox): rows published per
+# transaction, attempts before a message is left for inspection, and the
+# domain of the stable Message-ID given to each email
+OUTBOX_BATCH_SIZE = 100
+OUTBOX_MAX_ATTEMPTS = 10
+OUTBOX_MESSAGE_ID_DOMAIN = os.getenv('OUTBOX_MESSAGE_ID_DOMAIN', 'movie2gether')
+# purge_outbox deletes published rows after this many days, in batches
+OUTBOX_RETENTION_DAYS = 7
+OUTBOX_PURGE_BATCH_SIZE = 1000
+
+# Live notification streams (notifications.realtime): 'redis' fans messages
+# out across processes, 'memory' only within one process
+NOTIFICATIONS_BROKER = os.getenv('NOTIFICATIONS_BROKER', 'redis')
+NOTIFICATIONS_REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+# Seconds between keepalive comments on an idle stream
+NOTIFICATIONS_KEEPALIVE = 15
+# Seconds a stream ticket (notifications.tickets) stays valid
+NOTIFICATIONS_STREAM_TICKET_TIMEOUT = 30
+# reconcile_unread_counts recounts users notified within this many seconds
+NOTIFICATIONS_RECONCILE_WINDOW = 900
 
 # Celery Configuration
 CELERY_BROKER_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
@@ -224,11 +307,33 @@ CELERY_ACCEPT_CONTENT = ['application/json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+CELERY_BEAT_SCHEDULE = {
+    # Backstop for outbox messages whose drain job was never queued
+    'drain-outbox': {
+        'task': 'notifications.tasks.drain_outbox',
+        'schedule': 60.0,
+    },
+    'purge-outbox': {
+        'task': 'notifications.tasks.purge_outbox',
+        'schedule': 24 * 3600.0,
+    },
+    'reconcile-unread-counts': {
+        'task': 'notifications.tasks.reconcile_unread_counts',
+        'schedule': 300.0,
+    },
+    'flush-expired-tokens': {
+        'task': 'accounts.tasks.flush_expired_tokens',
+        'schedule': 3600.0,
+    },
+}
+# flush_expired_tokens deletes this many tokens per transaction
+TOKEN_CLEANUP_BATCH_SIZE = 1000
 
 # Redis Configuration
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        # RedisCache that counts hits and misses for the request metrics
+        'BACKEND': 'movie2gether.metrics.InstrumentedRedisCache',
         'LOCATION': os.environ.get('REDIS_URL', 'redis://localhost:6379/0'),
     }
 }
\ No newline at end of file
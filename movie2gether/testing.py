@@ -0,0 +1,120 @@
+import re
+from contextlib import ContextDecorator
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+
+class max_queries(ContextDecorator):
+    """
+    Fail when the wrapped block runs more than `num` database queries.
+
+    Works as a decorator or as a context manager, so list endpoints can be
+    pinned to a fixed query budget and a per-row query cannot creep back in:
+
+        @max_queries(2)
+        def test_list(self):
+            self.client.get(url)
+    """
+
+    def __init__(self, num, using=DEFAULT_DB_ALIAS):
+        self.num = num
+        self.using = using
+
+    def __enter__(self):
+        self.context = CaptureQueriesContext(connections[self.using])
+        return self.context.__enter__()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.context.__exit__(exc_type, exc_value, traceback)
+        if exc_type is not None:
+            return False
+        executed = len(self.context)
+        if executed > self.num:
+            queries = '\n'.join(
+                f'{i}. {query["sql"]}' for i, query in enumerate(self.context.captured_queries, start=1)
+            )
+            raise AssertionError(
+                f'{executed} queries executed, at most {self.num} expected\n'
+                f'Captured queries were:\n{queries}'
+            )
+        return False
+
+
+def analyze(using=DEFAULT_DB_ALIAS):
+    """Refresh planner statistics after seeding test data"""
+    with connections[using].cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+def sequential_scans(sql, using=DEFAULT_DB_ALIAS):
+    """Return (tables read by a full scan, plan text) for one SELECT"""
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(f'EXPLAIN {sql}')
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+            return re.findall(r'Seq Scan on (\w+)', plan), plan
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            details = [row[-1] for row in cursor.fetchall()]
+            # "SCAN t USING INDEX i" walks an index in order; plain "SCAN t" reads the table
+            scans = [match.group(1) for match in map(re.compile(r'SCAN (\w+)$').match, details) if match]
+            return scans, '\n'.join(details)
+    return [], ''
+
+
+class no_sequential_scans(ContextDecorator):
+    """
+    Fail when a query run in the wrapped block is planned as a table scan.
+
+    Every SELECT captured in the block is EXPLAINed (PostgreSQL and SQLite
+    only). Seed realistic volumes and call `analyze()` first; on a handful
+    of rows a sequential scan is the right plan. Tables that are meant to
+    be scanned can be listed in `allow`.
+    """
+
+    def __init__(self, allow=(), using=DEFAULT_DB_ALIAS):
+        self.allow = set(allow)
+        self.using = using
+
+    def __enter__(self):
+        self.context = CaptureQueriesContext(connections[self.using])
+        return self.context.__enter__()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.context.__exit__(exc_type, exc_value, traceback)
+        if exc_type is not None:
+            return False
+        failures = []
+        for query in self.context.captured_queries:
+            if not query['sql'].lstrip().upper().startswith('SELECT'):
+                continue
+            tables, plan = sequential_scans(query['sql'], self.using)
+            if set(tables) - self.allow:
+                failures.append(f'{query["sql"]}\n{plan}')
+        if failures:
+            raise AssertionError('Sequential scans planned for:\n\n' + '\n\n'.join(failures))
+        return False
+
+
+class eager_tasks(ContextDecorator):
+    """
+    Run Celery tasks in the calling thread while the block runs.
+
+    `.delay()` then executes the task at once instead of sending it to the
+    broker, so code that queues tasks can run without Redis. Errors raised
+    by a task are kept in its result, as a worker would.
+    """
+
+    def __enter__(self):
+        from movie2gether import celery_app
+
+        self.conf = celery_app.conf
+        self.previous = self.conf.task_always_eager
+        self.conf.task_always_eager = True
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.conf.task_always_eager = self.previous
+        return False
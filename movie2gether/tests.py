@@ -0,0 +1,241 @@
+import json
+import logging
+import os
+import tempfile
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
+from rest_framework.test import APIClient
+
+from events.models import Event, EventMembership, Invitation
+from movies.models import Movie
+from notifications.models import Notification
+from .loadtest import SCENARIOS, compare
+from .metrics import registry
+from .log import QueueHandler, SamplingFilter, current_request, current_user_id
+
+User = get_user_model()
+
+
+class ExportTests(TestCase):
+    """Staff can stream tables as NDJSON"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(email='staff@example.com', username='staff', password='pw', is_staff=True)
+        cls.user = User.objects.create_user(email='user@example.com', username='user', password='pw')
+        cls.old = Movie.objects.create(
+            title='Old', description='', release_date=date(1950, 1, 1), poster_url='', imdb_id='tt0000001',
+        )
+        cls.new = Movie.objects.create(
+            title='New', description='', release_date=date(2020, 1, 1), poster_url='', imdb_id='tt0000002',
+        )
+        Event.objects.create(
+            movie=cls.new, title='Event', date=timezone.now() + timedelta(days=1), location='Somewhere', host=cls.user,
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def export(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        return [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+    def test_staff_only(self):
+        self.assertEqual(self.client.get('/api/exports/events/').status_code, 401)
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get('/api/exports/events/').status_code, 403)
+
+    def test_export(self):
+        self.client.force_authenticate(self.staff)
+        rows = self.export('/api/exports/events/')
+        self.assertEqual([row['title'] for row in rows], ['Event'])
+        self.assertEqual(rows[0]['host_id'], self.user.id)
+
+        rows = self.export('/api/exports/movies/?since=2000-01-01')
+        self.assertEqual([row['imdb_id'] for row in rows], ['tt0000002'])
+        rows = self.export('/api/exports/movies/?until=2000-01-01T00:00:00Z')
+        self.assertEqual([row['imdb_id'] for row in rows], ['tt0000001'])
+
+        self.assertEqual(self.client.get('/api/exports/movies/?since=yesterday').status_code, 400)
+        self.assertEqual(self.client.get('/api/exports/users/').status_code, 404)
+
+    def test_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'movies.ndjson')
+            call_command('export_ndjson', 'movies', output=path, chunk_size=1)
+            with open(path, 'rb') as f:
+                rows = [json.loads(line) for line in f]
+        self.assertEqual([row['title'] for row in rows], ['Old', 'New'])
+
+
+class LoggingTests(TestCase):
+    """Log records carry the request context and stay off the request thread"""
+
+    def record(self, level, msg, *args):
+        return logging.LogRecord('test', level, __file__, 1, msg, args, None)
+
+    def test_request_id(self):
+        self.assertRegex(self.client.get('/api/events/public/')['X-Request-ID'], r'^[0-9a-f]{32}$')
+        response = self.client.get('/api/events/public/', HTTP_X_REQUEST_ID='upstream-1')
+        self.assertEqual(response['X-Request-ID'], 'upstream-1')
+        response = self.client.get('/api/events/public/', HTTP_X_REQUEST_ID='not an id')
+        self.assertNotEqual(response['X-Request-ID'], 'not an id')
+
+    def test_user_id(self):
+        user = User.objects.create_user(email='user@example.com', username='user', password='pw')
+        request = RequestFactory().get('/')
+        token = current_request.set(request)
+        try:
+            # A session user that nobody has loaded yet is not loaded for a log line
+            request.user = SimpleLazyObject(lambda: self.fail('user loaded'))
+            self.assertIsNone(current_user_id())
+            request.user = user
+            self.assertEqual(current_user_id(), user.id)
+        finally:
+            current_request.reset(token)
+
+    def test_sampling(self):
+        sample = SamplingFilter(rate=0)
+        self.assertFalse(sample.filter(self.record(logging.DEBUG, 'debug')))
+        self.assertTrue(sample.filter(self.record(logging.INFO, 'info')))
+
+    def test_queue_handler(self):
+        records = []
+        target = logging.Handler()
+        target.emit = records.append
+        handler = QueueHandler(handlers=[target])
+        values = ['before']
+        handler.handle(self.record(logging.INFO, 'value %s', values))
+        values[0] = 'after'
+        handler.stop()
+        self.assertEqual([record.getMessage() for record in records], ["value ['before']"])
+
+        # Records logged after stop(), e.g. during interpreter shutdown, are written at once
+        handler.handle(self.record(logging.INFO, 'late'))
+        self.assertEqual(records[-1].getMessage(), 'late')
+        self.assertIsNone(handler.listener)
+
+    def test_queue_handler_after_fork(self):
+        records = []
+        target = logging.Handler()
+        target.emit = records.append
+        handler = QueueHandler(handlers=[target])
+        handler.handle(self.record(logging.INFO, 'parent'))
+        parent = handler.listener
+        # A child process inherits the handler, but not the listener thread
+        with mock.patch('movie2gether.log.os.getpid', return_value=-1):
+            handler.handle(self.record(logging.INFO, 'child'))
+            self.assertIsNot(handler.listener, parent)
+            handler.stop()
+        parent.stop()
+        self.assertEqual(sorted(record.getMessage() for record in records), ['child', 'parent'])
+
+
+class MetricsTests(TestCase):
+    """Requests report their timings and feed the Prometheus endpoint"""
+
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+
+    def test_server_timing(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/events/public/')
+        self.assertRegex(response['Server-Timing'], r'^total;dur=[\d.]+, db;dur=[\d.]+;desc="1 queries"')
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics(self):
+        self.client.get('/api/events/public/')
+        self.client.get('/api/events/public/')
+        body = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret').content.decode()
+        labels = 'method="GET",route="api/events/public/",status="200"'
+        self.assertIn(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 2', body)
+        self.assertIn(f'http_request_duration_seconds_count{{{labels}}} 2', body)
+        # The second request was served from the cache
+        self.assertIn('http_requests_db_queries_total{route="api/events/public/"} 1', body)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret').status_code, 200)
+
+    def test_closed_without_a_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        with self.settings(DEBUG=True):
+            self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+
+class LoadTestTests(TestCase):
+    """The load-test harness drives every scenario and compares runs"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_in_process_run(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'baseline.json')
+            call_command(
+                'loadtest', requests=3, concurrency=1, warmup=0, users=4, events=8, output=path, stderr=StringIO(),
+            )
+            with open(path) as f:
+                report = json.load(f)
+            self.assertEqual(set(report['scenarios']), set(SCENARIOS))
+            for name, result in report['scenarios'].items():
+                self.assertEqual((name, result['requests'], result['errors']), (name, 3, 0))
+            self.assertFalse(User.objects.filter(email__startswith='loadtest-').exists())
+
+            # Timings this small are noise, so compare with a generous tolerance
+            call_command(
+                'loadtest', scenarios='public_events', requests=3, concurrency=1, users=4, events=8,
+                baseline=path, tolerance=100, stdout=StringIO(), stderr=StringIO(),
+            )
+
+    def test_compare(self):
+        def report(throughput, p95, errors=0):
+            return {'scenarios': {'public_events': {'throughput_rps': throughput, 'p95_ms': p95, 'errors': errors}}}
+
+        baseline = report(100, 10)
+        self.assertFalse(compare(report(95, 10.5), baseline)['public_events']['regressed'])
+        self.assertTrue(compare(report(80, 10), baseline)['public_events']['regressed'])
+        self.assertTrue(compare(report(100, 12), baseline)['public_events']['regressed'])
+        self.assertTrue(compare(report(100, 10, errors=1), baseline)['public_events']['regressed'])
+
+class SeedScaleTests(TestCase):
+    """seed_scale loads a consistent dataset, the same one for the same seed"""
+
+    def seed(self):
+        call_command('seed_scale', users=20, movies=5, events=30, notifications=40, seed=7, now='2025-01-01',
+                     chunk_size=16, stdout=StringIO())
+        return (
+            list(Event.objects.order_by('id').values_list('host_id', 'movie_id', 'date')),
+            list(Invitation.objects.order_by('id').values_list('event_id', 'invitee_id', 'status', 'invited_at')),
+        )
+
+    def test_seed(self):
+        events, invitations = self.seed()
+        self.assertEqual((User.objects.count(), Movie.objects.count(), len(events)), (20, 5, 30))
+        self.assertEqual(Notification.objects.count(), 40)
+        self.assertEqual(EventMembership.objects.filter(role=EventMembership.HOST).count(), 30)
+        self.assertEqual(
+            EventMembership.objects.filter(role=EventMembership.INVITEE).count(),
+            Invitation.objects.filter(invitee__isnull=False).count(),
+        )
+        self.assertFalse(Event.objects.filter(created_at__gte=datetime(2025, 1, 1, tzinfo=dt_timezone.utc)).exists())
+        # The sequences continue after the generated ids
+        self.assertEqual(User.objects.create_user(email='new@example.com', username='new').id, 21)
+
+        User.objects.all().delete()
+        Movie.objects.all().delete()
+        again_events, again_invitations = self.seed()
+        self.assertEqual([row[2] for row in again_events], [row[2] for row in events])
+        self.assertEqual([row[2:] for row in again_invitations], [row[2:] for row in invitations])
@@ -19,6 +19,8 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from events.views import index
+from movie2gether.exports import ExportView
+from movie2gether.metrics import metrics_view
 from django.views.generic import TemplateView
 
 urlpatterns = [
@@ -28,6 +30,8 @@ urlpatterns = [
     path('api/movies/', include('movies.urls')),  # Include movies app URLs
     path('api/events/', include('events.urls')),  # New events app URLs
     path('api/notifications/', include('notifications.urls')),  # New notifications app URLs
+    path('api/exports/<str:name>/', ExportView.as_view(), name='export'),  # Staff-only NDJSON exports
+    path('metrics', metrics_view, name='metrics'),  # Prometheus scrape endpoint
     path('api-auth/', include('rest_framework.urls')),  # This adds the login/logout views
     # Catch-all route for React Router
     path('<path:resource>', TemplateView.as_view(template_name='index.html')),  # Serve index.html for all unmatched routes
@@ -0,0 +1,127 @@
+# movies/fake_omdb.py
+"""
+A local stand-in for the OMDb API, for tests and benchmarks.
+
+Every title resolves to a deterministic synthetic movie except those
+listed in `missing`, which get OMDb's "Movie not found!" reply. Latency
+and failures can be injected to exercise timeouts, retries and the
+circuit breaker. Run it standalone with:
+
+    python -m movies.fake_omdb --port 8765 --latency 0.05
+"""
+
+import argparse
+import json
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+def fake_movie(title):
+    imdb_number = zlib.crc32(title.lower().encode('utf-8')) % 10_000_000
+    return {
+        'Title': title,
+        'Year': '2000',
+        'Released': '01 Jan 2000',
+        'Plot': f'A synthetic plot for {title}.',
+        'Poster': f'https://example.com/posters/{imdb_number}.jpg',
+        'imdbID': f'tt{imdb_number:07d}',
+        'Response': 'True',
+    }
+
+class FakeOMDbServer:
+    """
+    Threaded fake OMDb server; use as a context manager:
+
+        with FakeOMDbServer(latency=0.01) as server:
+            client = OMDbClient(api_key='test', base_url=server.url)
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, missing=()):
+        self.latency = latency
+        self.missing = {title.lower() for title in missing}
+        self.fail_next = 0  # Number of upcoming requests answered with a 503
+        self.request_count = 0
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self.handler_class(), bind_and_activate=False)
+        self.httpd.daemon_threads = True
+        # The default backlog of 5 refuses connections under benchmark load
+        self.httpd.request_queue_size = 1024
+        self.httpd.server_bind()
+        self.httpd.server_activate()
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}/'
+
+    def handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # Keep-alive, like the real API
+            # Headers and body are written separately; without this every
+            # reply on a kept-alive connection waits out a delayed ACK
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                status, payload = server.respond(parse_qs(urlparse(self.path).query))
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def respond(self, query):
+        with self.lock:
+            self.request_count += 1
+            failing = self.fail_next > 0
+            if failing:
+                self.fail_next -= 1
+        if self.latency:
+            time.sleep(self.latency)
+        if failing:
+            return 503, {'Response': 'False', 'Error': 'Service unavailable'}
+
+        title = query.get('t', [''])[0]
+        if not title or title.lower() in self.missing:
+            return 200, {'Response': 'False', 'Error': 'Movie not found!'}
+        return 200, fake_movie(title)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run a fake OMDb API server.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds to wait before each reply')
+    parser.add_argument('--missing', nargs='*', default=[], help='Titles that are reported as not found')
+    args = parser.parse_args()
+
+    server = FakeOMDbServer(args.host, args.port, latency=args.latency, missing=args.missing)
+    print(f'Fake OMDb listening on {server.url}')
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,191 @@
+import csv
+import gzip
+import json
+import os
+import sys
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from movie2gether.conditional import bump_version
+from movies.models import Movie
+from movies.omdb import DEFAULT_RELEASE_DATE, movie_defaults
+from movies.signals import MOVIES_VERSION
+
+# IMDb titles can outgrow Movie.title
+TITLE_MAX_LENGTH = Movie._meta.get_field('title').max_length
+
+class Command(BaseCommand):
+    """
+    Stream a movie catalog dump into the Movie table.
+
+    Two shapes are understood:
+
+    * imdb: the IMDb `title.basics.tsv` dataset (optionally gzipped). It has
+      no plot or poster, so existing descriptions and posters are kept.
+    * omdb: one OMDb API payload per line (JSON lines, optionally gzipped).
+
+    Malformed lines are reported and skipped. Rows are upserted on imdb_id
+    in large batches, each in its own transaction. After every batch the number of consumed records is saved
+    to a checkpoint file, so an interrupted import picks up where it left
+    off when run again with --resume.
+    """
+    help = 'Bulk import movies from an IMDb TSV or OMDb JSON lines dump'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Dump file, optionally gzipped')
+        parser.add_argument('--format', choices=['imdb', 'omdb'],
+                            help='Dump shape; guessed from the file name by default')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--title-types', default='movie,tvMovie',
+                            help='Comma-separated IMDb titleType values to import')
+        parser.add_argument('--checkpoint', help='Checkpoint file (default: <path>.checkpoint)')
+        parser.add_argument('--resume', action='store_true', help='Skip records consumed by a previous run')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f'No such file: {path}')
+        dump_format = options['format'] or self.guess_format(path)
+        batch_size = options['batch_size']
+        checkpoint = options['checkpoint'] or f'{path}.checkpoint'
+
+        if dump_format == 'imdb':
+            title_types = set(options['title_types'].split(','))
+            records = self.read_imdb(path, title_types)
+            update_fields = ['title', 'release_date']
+        else:
+            records = self.read_omdb(path)
+            update_fields = ['title', 'description', 'release_date', 'poster_url']
+
+        skip = self.read_checkpoint(checkpoint) if options['resume'] else 0
+        if skip:
+            self.stdout.write(f'Resuming after {skip} records')
+
+        self.malformed = 0
+        consumed = 0
+        imported = 0
+        batch = {}
+        started = time.monotonic()
+        for consumed, movie in enumerate(records, start=1):
+            if consumed <= skip:
+                continue
+            if movie is not None:
+                # Postgres rejects an upsert that touches the same row twice
+                batch[movie.imdb_id] = movie
+            if len(batch) >= batch_size:
+                imported += self.flush(batch, update_fields, checkpoint, consumed)
+                self.report(imported, consumed, started)
+
+        imported += self.flush(batch, update_fields, checkpoint, consumed)
+        self.report(imported, consumed, started)
+        if self.malformed:
+            self.stderr.write(f'Skipped {self.malformed} malformed lines')
+        self.stdout.write(self.style.SUCCESS(f'Imported {imported} movies'))
+
+    def flush(self, batch, update_fields, checkpoint, consumed):
+        with transaction.atomic():
+            Movie.objects.bulk_create(
+                batch.values(),
+                update_conflicts=True,
+                unique_fields=['imdb_id'],
+                update_fields=update_fields,
+            )
+        # bulk_create sends no signals, so invalidate cached movie data here
+        bump_version(MOVIES_VERSION)
+        count = len(batch)
+        batch.clear()
+        self.write_checkpoint(checkpoint, consumed)
+        return count
+
+    def report(self, imported, consumed, started):
+        elapsed = time.monotonic() - started
+        rate = imported / elapsed if elapsed else 0
+        self.stdout.write(f'{consumed} records read, {imported} movies upserted ({rate:,.0f}/s)')
+
+    def guess_format(self, path):
+        name = path[:-3] if path.endswith('.gz') else path
+        if name.endswith('.tsv'):
+            return 'imdb'
+        if name.endswith(('.json', '.jsonl', '.ndjson')):
+            return 'omdb'
+        raise CommandError('Cannot tell the dump format from the file name; pass --format')
+
+    def open(self, path):
+        if path.endswith('.gz'):
+            return gzip.open(path, 'rt', encoding='utf-8', newline='')
+        return open(path, encoding='utf-8', newline='')
+
+    def skip_malformed(self, line_number, reason):
+        self.malformed += 1
+        self.stderr.write(f'Line {line_number}: {reason}, skipped')
+
+    def read_imdb(self, path, title_types):
+        """Yield one Movie (or None for a skipped row) per data row"""
+        csv.field_size_limit(sys.maxsize)
+        with self.open(path) as dump:
+            reader = csv.reader(dump, delimiter='\t', quoting=csv.QUOTE_NONE)
+            header = next(reader)
+            columns = {name: index for index, name in enumerate(header)}
+            for row in reader:
+                if len(row) != len(header):
+                    self.skip_malformed(reader.line_num, f'expected {len(header)} columns, got {len(row)}')
+                    yield None
+                    continue
+                if row[columns['titleType']] not in title_types:
+                    yield None
+                    continue
+                year = row[columns['startYear']]
+                yield Movie(
+                    imdb_id=row[columns['tconst']],
+                    title=row[columns['primaryTitle']][:TITLE_MAX_LENGTH],
+                    description='',
+                    release_date=date(int(year), 1, 1) if year.isdigit() else DEFAULT_RELEASE_DATE,
+                    poster_url='',
+                )
+
+    def read_omdb(self, path):
+        """Yield one Movie (or None for a skipped line) per line"""
+        with self.open(path) as dump:
+            for line_number, line in enumerate(dump, start=1):
+                line = line.strip()
+                if not line:
+                    yield None
+                    continue
+                if line.startswith('['):
+                    raise CommandError('JSON arrays are not supported; convert the dump to JSON lines')
+                try:
+                    data = json.loads(line)
+                except ValueError as e:
+                    self.skip_malformed(line_number, f'invalid JSON ({e})')
+                    yield None
+                    continue
+                if not isinstance(data, dict):
+                    self.skip_malformed(line_number, 'not a JSON object')
+                    yield None
+                    continue
+                if data.get('Response', 'True') != 'True' or not data.get('imdbID'):
+                    yield None
+                    continue
+                if not data.get('Title'):
+                    self.skip_malformed(line_number, 'no Title')
+                    yield None
+                    continue
+                defaults = movie_defaults(data)
+                defaults['title'] = defaults['title'][:TITLE_MAX_LENGTH]
+                yield Movie(imdb_id=data['imdbID'], **defaults)
+
+    def read_checkpoint(self, checkpoint):
+        try:
+            with open(checkpoint) as f:
+                return int(f.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def write_checkpoint(self, checkpoint, consumed):
+        # Write then rename, so a crash never leaves a truncated checkpoint
+        temporary = f'{checkpoint}.tmp'
+        with open(temporary, 'w') as f:
+            f.write(str(consumed))
+        os.replace(temporary, checkpoint)
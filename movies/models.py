@@ -1,7 +1,18 @@
 # movies/models.py
 
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
 from django.db import models
 
+SEARCH_CONFIG = 'english'
+
+def movie_search_vector():
+    """Full-text document for a movie, shared by the GIN index and the search query"""
+    return (
+        SearchVector('title', weight='A', config=SEARCH_CONFIG) +
+        SearchVector('description', weight='B', config=SEARCH_CONFIG)
+    )
+
 class Movie(models.Model):
     title = models.CharField(max_length=255)
     description = models.TextField()
@@ -9,6 +20,14 @@ class Movie(models.Model):
     poster_url = models.URLField()
     imdb_id = models.CharField(max_length=20, unique=True)
 
+    class Meta:
+        indexes = [
+            # Expression indexes are maintained by Postgres itself, so OMDb
+            # upserts and bulk imports are searchable as soon as they commit
+            GinIndex(movie_search_vector(), name='movie_search_vector_idx'),
+            GinIndex(fields=['title'], opclasses=['gin_trgm_ops'], name='movie_title_trgm_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -0,0 +1,230 @@
+# movies/omdb.py
+
+import random
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime
+
+import requests
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from requests.adapters import HTTPAdapter
+from movie2gether.metrics import timed
+import logging
+
+logger = logging.getLogger(__name__)
+
+# OMDb has no release date for some titles; keep the historical placeholder
+DEFAULT_RELEASE_DATE = date(1900, 1, 1)
+
+class OMDbError(Exception):
+    """OMDb could not be reached or returned an unusable response"""
+
+class OMDbUnavailable(OMDbError):
+    """The circuit breaker is open, so OMDb was not called at all"""
+
+class CircuitBreaker:
+    """
+    Fail fast while an upstream is unhealthy.
+
+    After `failure_threshold` consecutive failures the breaker opens and
+    rejects calls for `reset_timeout` seconds. It then lets a single trial
+    call through (half-open); success closes it again, failure re-opens it.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return self.CLOSED
+        if self.clock() - self.opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self):
+        with self.lock:
+            state = self.state
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = self.clock()
+
+    def release(self):
+        """End a call that says nothing about the upstream, freeing a half-open trial"""
+        with self.lock:
+            self.trial_in_flight = False
+
+class RequestsTransport:
+    """Keep-alive HTTP transport backed by a pooled requests.Session"""
+
+    def __init__(self, pool_size=10):
+        self.session = requests.Session()
+        # Retries are handled by the client so they can be jittered and counted
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def get(self, url, params, timeout):
+        response = self.session.get(url, params=params, timeout=timeout)
+        response.raise_for_status()
+        return response.json()
+
+class OMDbClient:
+    """
+    OMDb API client with timeouts, jittered retries and a circuit breaker.
+
+    `transport` is anything with a `get(url, params, timeout)` method that
+    returns the decoded JSON body and raises one of `transport_errors`
+    on failure, so tests and benchmarks can swap in a fake.
+    """
+    transport_class = RequestsTransport
+    transport_errors = (requests.RequestException,)
+
+    def __init__(self, api_key, base_url, transport=None, connect_timeout=3.05, read_timeout=5.0,
+                 max_retries=2, backoff=0.2, breaker=None):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.transport = transport or self.transport_class()
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.breaker = breaker or CircuitBreaker()
+
+    def get_by_title(self, title):
+        """Exact title lookup; returns the OMDb payload, or None if there is no such movie"""
+        data = self.request({'t': title})
+        if data.get('Response') == 'True':
+            return data
+        return None
+
+    def request(self, params):
+        params = {'apikey': self.api_key, **params}
+        with self.call():
+            attempt = 0
+            while True:
+                try:
+                    with timed('omdb'):
+                        return self.transport.get(self.base_url, params=params, timeout=self.timeout)
+                except self.transport_errors as e:
+                    attempt += 1
+                    time.sleep(self.retry_delay(e, attempt))
+
+    @contextmanager
+    def call(self):
+        """
+        Run one OMDb call, retries included, under the circuit breaker.
+
+        Any error counts as a failure. Cancellation, a worker shutting down
+        or Ctrl-C says nothing about OMDb's health, so it only gives up a
+        half-open trial slot.
+        """
+        if not self.breaker.allow():
+            raise OMDbUnavailable('OMDb circuit breaker is open')
+        try:
+            yield
+        except ValueError as e:
+            self.breaker.record_failure()
+            raise OMDbError('OMDb returned a malformed response') from e
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            self.breaker.release()
+            raise
+        self.breaker.record_success()
+
+    def retry_delay(self, error, attempt):
+        """Seconds to wait before retry `attempt` (from 1); raises OMDbError when giving up"""
+        if attempt > self.max_retries or not self.is_retryable(error):
+            raise OMDbError(f'OMDb request failed: {self.describe(error)}') from error
+        delay = random.uniform(0, self.backoff * 2 ** attempt)  # Full jitter
+        logger.warning('OMDb request failed (%s), retry %d in %.2fs', self.describe(error), attempt, delay)
+        return delay
+
+    @staticmethod
+    def describe(error):
+        # The request URL carries the API key, so never log the exception text
+        response = getattr(error, 'response', None)
+        if response is not None:
+            return f'HTTP {response.status_code}'
+        return type(error).__name__
+
+    @staticmethod
+    def is_retryable(error):
+        response = getattr(error, 'response', None)
+        if response is None:
+            return True  # Connection errors and timeouts
+        return response.status_code >= 500 or response.status_code == 429
+
+def parse_release_date(value):
+    try:
+        return datetime.strptime(value, '%d %b %Y').date()
+    except (TypeError, ValueError):
+        return DEFAULT_RELEASE_DATE
+
+def movie_defaults(data):
+    """Movie field values for an OMDb payload, keyed for update_or_create"""
+    poster = data.get('Poster', '')
+    return {
+        'title': data['Title'],
+        'description': data.get('Plot', ''),
+        'release_date': parse_release_date(data.get('Released')),
+        'poster_url': '' if poster == 'N/A' else poster,
+    }
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """Process-wide client, so every request shares one connection pool and breaker"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = OMDbClient(
+                    api_key=settings.OMDB_API_KEY,
+                    base_url=settings.OMDB_BASE_URL,
+                    connect_timeout=settings.OMDB_CONNECT_TIMEOUT,
+                    read_timeout=settings.OMDB_READ_TIMEOUT,
+                    max_retries=settings.OMDB_MAX_RETRIES,
+                    breaker=CircuitBreaker(
+                        failure_threshold=settings.OMDB_CIRCUIT_FAILURE_THRESHOLD,
+                        reset_timeout=settings.OMDB_CIRCUIT_RESET_TIMEOUT,
+                    ),
+                )
+    return _client
+
+@receiver(setting_changed)
+def reset_client(setting, **kwargs):
+    """Rebuild the client when tests override an OMDB_* setting"""
+    global _client
+    if setting.startswith('OMDB_'):
+        _client = None
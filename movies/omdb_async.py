@@ -0,0 +1,78 @@
+# movies/omdb_async.py
+
+import asyncio
+import weakref
+
+import httpx
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from movie2gether.metrics import timed
+from .omdb import OMDbClient, get_client
+import logging
+
+logger = logging.getLogger(__name__)
+
+class HTTPXTransport:
+    """Async keep-alive HTTP transport backed by a pooled httpx.AsyncClient"""
+
+    def __init__(self, max_connections=100, max_keepalive_connections=20):
+        self.client = httpx.AsyncClient(limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+        ))
+
+    async def get(self, url, params, timeout):
+        connect_timeout, read_timeout = timeout
+        response = await self.client.get(
+            url, params=params, timeout=httpx.Timeout(read_timeout, connect=connect_timeout)
+        )
+        response.raise_for_status()
+        return response.json()
+
+class AsyncOMDbClient(OMDbClient):
+    """OMDbClient for ASGI views; waits on OMDb without holding a thread"""
+    transport_class = HTTPXTransport
+    transport_errors = (httpx.HTTPError,)
+
+    async def get_by_title(self, title):
+        data = await self.request({'t': title})
+        if data.get('Response') == 'True':
+            return data
+        return None
+
+    async def request(self, params):
+        params = {'apikey': self.api_key, **params}
+        with self.call():
+            attempt = 0
+            while True:
+                try:
+                    with timed('omdb'):
+                        return await self.transport.get(self.base_url, params=params, timeout=self.timeout)
+                except self.transport_errors as e:
+                    attempt += 1
+                    await asyncio.sleep(self.retry_delay(e, attempt))
+
+# An httpx pool is bound to the event loop it was created on
+_clients = weakref.WeakKeyDictionary()
+
+def get_async_client():
+    """Client for the running event loop, sharing the sync client's circuit breaker"""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = _clients[loop] = AsyncOMDbClient(
+            api_key=settings.OMDB_API_KEY,
+            base_url=settings.OMDB_BASE_URL,
+            transport=HTTPXTransport(max_connections=settings.OMDB_ASYNC_MAX_CONNECTIONS),
+            connect_timeout=settings.OMDB_CONNECT_TIMEOUT,
+            read_timeout=settings.OMDB_READ_TIMEOUT,
+            max_retries=settings.OMDB_MAX_RETRIES,
+            breaker=get_client().breaker,
+        )
+    return client
+
+@receiver(setting_changed)
+def reset_clients(setting, **kwargs):
+    if setting.startswith('OMDB_'):
+        _clients.clear()
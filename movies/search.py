@@ -0,0 +1,83 @@
+# movies/search.py
+
+from difflib import SequenceMatcher
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
+from django.db import connection
+from django.db.models import Case, F, Q, When
+
+from .models import SEARCH_CONFIG, Movie, movie_search_vector
+
+# Minimum title similarity for a typo-tolerant fallback match. Postgres uses
+# pg_trgm.similarity_threshold (0.3) instead; SequenceMatcher ratios run
+# higher than trigram similarity for the same pair of strings.
+FALLBACK_SIMILARITY = 0.6
+# Upper bound on the candidates ranked by the pure-Python fallback
+FALLBACK_LIMIT = 500
+
+def search_movies(query, queryset=None):
+    """
+    Return movies matching `query` over title and description, best match first.
+
+    On PostgreSQL this is a full-text search ranked with ts_rank plus trigram
+    similarity on the title for typo tolerance, both served by the GIN
+    indexes on Movie. Other databases get a pure-Python scorer with the same
+    semantics, which is only meant for tests and small catalogs.
+    """
+    if queryset is None:
+        queryset = Movie.objects.all()
+    if connection.vendor == 'postgresql':
+        return _postgres_search(queryset, query)
+    return _python_search(queryset, query)
+
+def _postgres_search(queryset, query):
+    vector = movie_search_vector()
+    search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch')
+    return queryset.alias(
+        document=vector,
+    ).annotate(
+        rank=SearchRank(vector, search_query),
+        similarity=TrigramSimilarity('title', query),
+    ).filter(
+        Q(document=search_query) | Q(title__trigram_similar=query)
+    ).order_by((F('rank') + F('similarity')).desc(), '-id')
+
+def _python_search(queryset, query):
+    terms = _tokenize(query)
+    if not terms:
+        return queryset.none()
+
+    scored = []
+    rows = queryset.values_list('id', 'title', 'description').iterator(chunk_size=2000)
+    for movie_id, title, description in rows:
+        score = _score(query, terms, title, description)
+        if score > 0:
+            scored.append((score, movie_id))
+    scored.sort(key=lambda item: (-item[0], -item[1]))
+
+    ids = [movie_id for _, movie_id in scored[:FALLBACK_LIMIT]]
+    if not ids:
+        return queryset.none()
+    preserved_order = Case(*[When(pk=pk, then=position) for position, pk in enumerate(ids)])
+    return queryset.filter(pk__in=ids).order_by(preserved_order)
+
+def _tokenize(text):
+    return [word for word in ''.join(c if c.isalnum() else ' ' for c in text.lower()).split() if word]
+
+def _score(query, terms, title, description):
+    title_words = _tokenize(title)
+    description_words = set(_tokenize(description))
+
+    # Title hits weigh more than description hits, mirroring the A/B weights
+    rank = 0.0
+    for term in terms:
+        if term in title_words:
+            rank += 1.0
+        elif term in description_words:
+            rank += 0.4
+    rank /= len(terms)
+
+    similarity = SequenceMatcher(None, query.lower(), title.lower()).ratio()
+    if rank == 0 and similarity < FALLBACK_SIMILARITY:
+        return 0
+    return rank + similarity
@@ -0,0 +1,165 @@
+# movies/services.py
+
+import asyncio
+import hashlib
+import time
+import uuid
+
+from django.core.cache import cache
+
+from .models import Movie
+from .omdb import get_client, movie_defaults
+from .omdb_async import get_async_client
+
+CACHE_TIMEOUT = 3600  # Hits, for 1 hour
+NEGATIVE_CACHE_TIMEOUT = 300  # Misses, short so new releases show up quickly
+# Longest a lookup may hold the single-flight lock: connect + read timeouts
+# for every attempt, plus backoff. Waiters give up after the same time.
+LOCK_TIMEOUT = 30
+WAIT_INTERVAL = 0.05
+
+# Cached in place of a result when OMDb has no such movie
+NOT_FOUND = 'not_found'
+
+def normalize_title(title):
+    return ' '.join(title.casefold().split())
+
+def cache_key(title):
+    digest = hashlib.sha1(normalize_title(title).encode('utf-8')).hexdigest()
+    return f'omdb:title:{digest}'
+
+def serialize_movie(movie):
+    return {
+        'id': movie.id,
+        'title': movie.title,
+        'description': movie.description,
+        'release_date': movie.release_date,
+        'poster': movie.poster_url,
+        'imdb_id': movie.imdb_id,
+    }
+
+def lookup_movie(title):
+    """
+    Look a title up on OMDb, upsert it and return its serialized form.
+
+    Returns None when OMDb has no such movie and raises OMDbError when OMDb
+    cannot be reached. Hits and misses are cached under a normalized key.
+    While one process fetches a title it holds a lock in the shared cache
+    (SET NX on Redis), and concurrent lookups of the same title wait for
+    its result instead of calling OMDb themselves.
+    """
+    key = cache_key(title)
+    cached = cache.get(key)
+    if cached is not None:
+        return None if cached == NOT_FOUND else cached
+
+    lock_key = f'{key}:lock'
+    token = uuid.uuid4().hex
+    if not cache.add(lock_key, token, timeout=LOCK_TIMEOUT):
+        cached = wait_for_result(key, lock_key)
+        if cached is not None:
+            return None if cached == NOT_FOUND else cached
+        # The holder failed or timed out; fall through and fetch ourselves
+
+    try:
+        return fetch_and_store(title, key)
+    finally:
+        # Not atomic, but at worst a late holder deletes a lock that has
+        # already expired and been taken over, costing one extra fetch
+        if cache.get(lock_key) == token:
+            cache.delete(lock_key)
+
+def wait_for_result(key, lock_key):
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_INTERVAL)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+        if cache.get(lock_key) is None:
+            return cache.get(key)
+    return None
+
+def apply_changes(movie, defaults):
+    """Copy changed values onto movie; returns the names of the changed fields"""
+    changed = [field for field, value in defaults.items() if getattr(movie, field) != value]
+    for field in changed:
+        setattr(movie, field, defaults[field])
+    return changed
+
+def store_movie(data):
+    """
+    Insert or update the movie for an OMDb payload.
+
+    Unlike update_or_create, an unchanged row is not saved again: every
+    save bumps MOVIES_VERSION and so invalidates all cached event responses,
+    and most lookups just re-read a movie that is already stored as is.
+    """
+    defaults = movie_defaults(data)
+    movie, created = Movie.objects.get_or_create(imdb_id=data['imdbID'], defaults=defaults)
+    if not created:
+        changed = apply_changes(movie, defaults)
+        if changed:
+            movie.save(update_fields=changed)
+    return movie
+
+async def astore_movie(data):
+    """Async store_movie"""
+    defaults = movie_defaults(data)
+    movie, created = await Movie.objects.aget_or_create(imdb_id=data['imdbID'], defaults=defaults)
+    if not created:
+        changed = apply_changes(movie, defaults)
+        if changed:
+            await movie.asave(update_fields=changed)
+    return movie
+
+def fetch_and_store(title, key):
+    data = get_client().get_by_title(title)
+    if data is None:
+        cache.set(key, NOT_FOUND, timeout=NEGATIVE_CACHE_TIMEOUT)
+        return None
+
+    result = serialize_movie(store_movie(data))
+    cache.set(key, result, timeout=CACHE_TIMEOUT)
+    return result
+
+async def alookup_movie(title):
+    """Async lookup_movie for ASGI views, sharing its cache keys and lock"""
+    key = cache_key(title)
+    cached = await cache.aget(key)
+    if cached is not None:
+        return None if cached == NOT_FOUND else cached
+
+    lock_key = f'{key}:lock'
+    token = uuid.uuid4().hex
+    if not await cache.aadd(lock_key, token, timeout=LOCK_TIMEOUT):
+        cached = await await_result(key, lock_key)
+        if cached is not None:
+            return None if cached == NOT_FOUND else cached
+
+    try:
+        return await afetch_and_store(title, key)
+    finally:
+        if await cache.aget(lock_key) == token:
+            await cache.adelete(lock_key)
+
+async def await_result(key, lock_key):
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(WAIT_INTERVAL)
+        cached = await cache.aget(key)
+        if cached is not None:
+            return cached
+        if await cache.aget(lock_key) is None:
+            return await cache.aget(key)
+    return None
+
+async def afetch_and_store(title, key):
+    data = await get_async_client().get_by_title(title)
+    if data is None:
+        await cache.aset(key, NOT_FOUND, timeout=NEGATIVE_CACHE_TIMEOUT)
+        return None
+
+    result = serialize_movie(await astore_movie(data))
+    await cache.aset(key, result, timeout=CACHE_TIMEOUT)
+    return result
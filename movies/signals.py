@@ -0,0 +1,13 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from movie2gether.conditional import bump_version
+from .models import Movie
+
+# Responses that embed movie details include this version in their cache keys
+MOVIES_VERSION = 'movies'
+
+@receiver(post_save, sender=Movie)
+@receiver(post_delete, sender=Movie)
+def movie_changed(sender, **kwargs):
+    transaction.on_commit(lambda: bump_version(MOVIES_VERSION))
@@ -1,3 +1,370 @@
-from django.test import TestCase
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from movie2gether.conditional import get_version
+from movie2gether.testing import analyze, max_queries, no_sequential_scans
+from .fake_omdb import FakeOMDbServer
+from .management.commands.import_movies import Command as ImportMoviesCommand
+from .models import Movie
+from .omdb import DEFAULT_RELEASE_DATE, CircuitBreaker, OMDbClient, OMDbError, OMDbUnavailable
+from .services import cache_key, lookup_movie
+from .signals import MOVIES_VERSION
+
+User = get_user_model()
+
+
+class MovieSearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='user@example.com', username='user', password='pw')
+        Movie.objects.bulk_create(
+            Movie(
+                title=f'Movie {i}', description='', release_date=date(2000, 1, 1),
+                poster_url='https://example.com/poster.jpg', imdb_id=f'tt{i:07d}',
+            )
+            for i in range(30)
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_search_query_budget(self):
+        with max_queries(3):
+            response = self.client.get('/api/movies/search/', {'query': 'movie'})
+        self.assertEqual(response.data['count'], 30)
+        self.assertEqual(len(response.data['results']), 20)
+
+    def test_search_ranks_title_matches_first(self):
+        Movie.objects.create(
+            title='The Matrix', description='A hacker learns the truth about reality.',
+            release_date=date(1999, 3, 31), poster_url='https://example.com/matrix.jpg', imdb_id='tt0133093',
+        )
+        Movie.objects.create(
+            title='Hackers', description='Teenagers and a matrix of crime.',
+            release_date=date(1995, 9, 15), poster_url='https://example.com/hackers.jpg', imdb_id='tt0113243',
+        )
+        response = self.client.get('/api/movies/search/', {'query': 'matrix'})
+        titles = [movie['title'] for movie in response.data['results']]
+        self.assertEqual(titles, ['The Matrix', 'Hackers'])
+
+    def test_search_tolerates_typos(self):
+        Movie.objects.create(
+            title='Interstellar', description='', release_date=date(2014, 11, 7),
+            poster_url='https://example.com/interstellar.jpg', imdb_id='tt0816692',
+        )
+        response = self.client.get('/api/movies/search/', {'query': 'intersteller'})
+        self.assertEqual(response.data['results'][0]['title'], 'Interstellar')
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Search indexes are PostgreSQL only')
+class MovieSearchQueryPlanTests(TestCase):
+    """Search is served by the full-text and trigram indexes, not a scan of the catalog"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='user@example.com', username='user', password='pw')
+        # Distinct, unrelated titles, so that a query matches a handful of rows
+        titles = [hashlib.sha1(str(i).encode()).hexdigest() for i in range(20000)]
+        Movie.objects.bulk_create(
+            Movie(
+                title=f'{title[:8]} {title[8:14]}', description=f'Plot {title[14:24]}', release_date=date(2000, 1, 1),
+                poster_url='https://example.com/poster.jpg', imdb_id=f'tt{i:07d}',
+            )
+            for i, title in enumerate(titles)
+        )
+        analyze()
+        cls.query = titles[1234][:8]
+
+    def test_search(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with no_sequential_scans():
+            response = client.get('/api/movies/search/', {'query': self.query})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['imdb_id'], 'tt0001234')
+
+
+class OMDbClientTests(SimpleTestCase):
+
+    def setUp(self):
+        self.server = FakeOMDbServer(missing=['Nothing Here']).start()
+        self.addCleanup(self.server.stop)
+        self.client = OMDbClient(api_key='test', base_url=self.server.url, max_retries=2, backoff=0)
+
+    def test_lookup(self):
+        data = self.client.get_by_title('Heat')
+        self.assertEqual(data['Title'], 'Heat')
+        self.assertIsNone(self.client.get_by_title('Nothing Here'))
+
+    def test_retries_server_errors(self):
+        self.server.fail_next = 2
+        self.assertEqual(self.client.get_by_title('Heat')['Title'], 'Heat')
+        self.assertEqual(self.server.request_count, 3)
+
+    def test_gives_up_after_max_retries(self):
+        self.server.fail_next = 3
+        with self.assertRaises(OMDbError):
+            self.client.get_by_title('Heat')
+        self.assertEqual(self.server.request_count, 3)
+
+    def test_circuit_breaker_fails_fast(self):
+        now = [0.0]
+        self.client.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=lambda: now[0])
+        self.client.max_retries = 0
+        self.server.fail_next = 2
+        for _ in range(2):
+            with self.assertRaises(OMDbError):
+                self.client.get_by_title('Heat')
+        with self.assertRaises(OMDbUnavailable):
+            self.client.get_by_title('Heat')
+        self.assertEqual(self.server.request_count, 2)
+
+        # After the reset timeout a trial call goes through and closes the circuit
+        now[0] = 10
+        self.assertEqual(self.client.get_by_title('Heat')['Title'], 'Heat')
+        self.assertEqual(self.client.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_unexpected_error_ends_the_trial(self):
+        now = [0.0]
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=lambda: now[0])
+        breaker.record_failure()
+        now[0] = 10
+        transport = self.client.transport
+        self.client.breaker = breaker
+        with mock.patch.object(transport, 'get', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.client.get_by_title('Heat')
+        self.assertFalse(breaker.trial_in_flight)
+
+        # The next trial is let through once the breaker resets again
+        now[0] = 20
+        self.assertEqual(self.client.get_by_title('Heat')['Title'], 'Heat')
+
+    def test_interrupted_trial_is_not_a_failure(self):
+        now = [0.0]
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=lambda: now[0])
+        breaker.record_failure()
+        now[0] = 10
+        self.client.breaker = breaker
+        with mock.patch.object(self.client.transport, 'get', side_effect=KeyboardInterrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                self.client.get_by_title('Heat')
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertEqual(self.client.get_by_title('Heat')['Title'], 'Heat')
+
+
+class FakeOMDbMixin:
+    latency = 0
+
+    def setUp(self):
+        self.server = FakeOMDbServer(latency=self.latency, missing=['Nothing Here']).start()
+        self.addCleanup(self.server.stop)
+        settings_override = override_settings(OMDB_BASE_URL=self.server.url)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        cache.clear()
+
+
+class OMDbSearchViewTests(FakeOMDbMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='user@example.com', username='user', password='pw')
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_search_saves_movie(self):
+        response = self.client.get('/api/movies/omdb/', {'title': 'Heat'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(Movie.objects.filter(imdb_id=response.data['imdb_id'], title='Heat').exists())
+        self.assertIn('omdb;dur=', response['Server-Timing'])
+
+    def test_search_not_found(self):
+        response = self.client.get('/api/movies/omdb/', {'title': 'Nothing Here'})
+        self.assertEqual(response.status_code, 404)
+
+
+class OMDbLookupCacheTests(FakeOMDbMixin, TestCase):
+
+    def test_cache_key_is_normalized(self):
+        first = lookup_movie('Heat')
+        self.assertEqual(lookup_movie('  HEAT '), first)
+        self.assertEqual(self.server.request_count, 1)
+
+    def test_misses_are_cached(self):
+        self.assertIsNone(lookup_movie('Nothing Here'))
+        self.assertIsNone(lookup_movie('nothing here'))
+        self.assertEqual(self.server.request_count, 1)
+
+    def test_unchanged_movie_keeps_cached_events(self):
+        lookup_movie('Heat')
+        version = get_version(MOVIES_VERSION)
+        cache.delete(cache_key('Heat'))
+        with self.captureOnCommitCallbacks(execute=True):
+            lookup_movie('Heat')
+        self.assertEqual(get_version(MOVIES_VERSION), version)
+
+        Movie.objects.update(title='Old title')
+        cache.delete(cache_key('Heat'))
+        with self.captureOnCommitCallbacks(execute=True):
+            lookup_movie('Heat')
+        self.assertNotEqual(get_version(MOVIES_VERSION), version)
+        self.assertEqual(Movie.objects.get().title, 'Heat')
+
+
+class OMDbSingleFlightTests(FakeOMDbMixin, TransactionTestCase):
+    latency = 0.3
+
+    def test_concurrent_lookups_share_one_upstream_call(self):
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lookup_movie, ['Heat'] * 8))
+        self.assertEqual(len({result['imdb_id'] for result in results}), 1)
+        self.assertEqual(self.server.request_count, 1)
+
+
+class AsyncOMDbSearchViewTests(FakeOMDbMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='user@example.com', username='user', password='pw')
+        cls.headers = {'Authorization': f'Bearer {AccessToken.for_user(cls.user)}'}
+
+    async def test_search_saves_movie(self):
+        response = await self.async_client.get('/api/movies/omdb/async/', {'title': 'Heat'}, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(await Movie.objects.filter(imdb_id=response.json()['imdb_id']).aexists())
+        self.assertIn('omdb;dur=', response['Server-Timing'])
+
+    async def test_search_not_found(self):
+        response = await self.async_client.get('/api/movies/omdb/async/', {'title': 'Nothing Here'}, headers=self.headers)
+        self.assertEqual(response.status_code, 404)
+
+    async def test_requires_authentication(self):
+        response = await self.async_client.get('/api/movies/omdb/async/', {'title': 'Heat'})
+        self.assertEqual(response.status_code, 401)
+
+
+class ImportMoviesTests(TestCase):
+    """import_movies upserts IMDb and OMDb dumps and resumes from its checkpoint"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def write_tsv(self, rows):
+        path = os.path.join(self.directory, 'title.basics.tsv')
+        header = ['tconst', 'titleType', 'primaryTitle', 'originalTitle', 'isAdult', 'startYear', 'endYear',
+                  'runtimeMinutes', 'genres']
+        with open(path, 'w', encoding='utf-8') as f:
+            for row in [header] + rows:
+                f.write('\t'.join(row) + '\n')
+        return path
+
+    def write_jsonl_gz(self, payloads):
+        path = os.path.join(self.directory, 'omdb.jsonl.gz')
+        with gzip.open(path, 'wt', encoding='utf-8') as f:
+            for payload in payloads:
+                f.write((json.dumps(payload) if payload else '') + '\n')
+        return path
+
+    def import_movies(self, path, **options):
+        stdout = StringIO()
+        call_command('import_movies', path, stdout=stdout, **options)
+        return stdout.getvalue()
+
+    def test_imdb_tsv(self):
+        path = self.write_tsv([
+            ['tt0000001', 'movie', 'First', 'First', '0', '1999', '\\N', '90', 'Drama'],
+            ['tt0000002', 'tvSeries', 'A series', 'A series', '0', '2001', '2003', '\\N', 'Drama'],
+            ['tt0000003', 'tvMovie', 'T' * 300, 'Long', '0', '\\N', '\\N', '\\N', '\\N'],
+        ])
+        self.import_movies(path)
+        movies = {movie.imdb_id: movie for movie in Movie.objects.all()}
+        self.assertEqual(set(movies), {'tt0000001', 'tt0000003'})
+        self.assertEqual(movies['tt0000001'].release_date, date(1999, 1, 1))
+        self.assertEqual(movies['tt0000003'].release_date, DEFAULT_RELEASE_DATE)
+        self.assertEqual(len(movies['tt0000003'].title), Movie._meta.get_field('title').max_length)
+
+        # A re-import updates titles and dates, and keeps plots and posters
+        Movie.objects.filter(imdb_id='tt0000001').update(description='Plot', poster_url='https://example.com/p.jpg')
+        path = self.write_tsv([['tt0000001', 'movie', 'First, renamed', 'First', '0', '2000', '\\N', '90', 'Drama']])
+        self.import_movies(path)
+        movie = Movie.objects.get(imdb_id='tt0000001')
+        self.assertEqual((movie.title, movie.release_date), ('First, renamed', date(2000, 1, 1)))
+        self.assertEqual((movie.description, movie.poster_url), ('Plot', 'https://example.com/p.jpg'))
+        self.assertEqual(Movie.objects.count(), 2)
+
+    def test_omdb_jsonl_gz(self):
+        path = self.write_jsonl_gz([
+            {'imdbID': 'tt0000001', 'Title': 'First', 'Plot': 'A plot', 'Released': '01 Jan 2000',
+             'Poster': 'https://example.com/p.jpg', 'Response': 'True'},
+            None,
+            {'Response': 'False', 'Error': 'Movie not found!'},
+            {'imdbID': 'tt0000002', 'Title': 'Second', 'Plot': 'N/A', 'Released': 'N/A', 'Poster': 'N/A'},
+        ])
+        self.import_movies(path)
+        movies = {movie.imdb_id: movie for movie in Movie.objects.all()}
+        self.assertEqual(set(movies), {'tt0000001', 'tt0000002'})
+        self.assertEqual(movies['tt0000001'].release_date, date(2000, 1, 1))
+        self.assertEqual(movies['tt0000002'].release_date, DEFAULT_RELEASE_DATE)
+        self.assertEqual(movies['tt0000002'].poster_url, '')
+
+    def test_malformed_lines_are_skipped(self):
+        path = os.path.join(self.directory, 'omdb.jsonl')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'imdbID': 'tt0000001', 'Title': 'First', 'Released': '01 Jan 2000'}) + '\n')
+            f.write('{"imdbID": "tt0000002", "Title": \n')
+            f.write('42\n')
+            f.write(json.dumps({'imdbID': 'tt0000003'}) + '\n')
+            f.write(json.dumps({'imdbID': 'tt0000004', 'Title': 'Fourth', 'Released': 'N/A'}) + '\n')
+        stderr = StringIO()
+        call_command('import_movies', path, stdout=StringIO(), stderr=stderr)
+        self.assertEqual(set(Movie.objects.values_list('imdb_id', flat=True)), {'tt0000001', 'tt0000004'})
+        self.assertIn('Line 2: invalid JSON', stderr.getvalue())
+        self.assertIn('Skipped 3 malformed lines', stderr.getvalue())
+
+    def test_resume(self):
+        path = self.write_tsv([
+            [f'tt{i:07d}', 'movie', f'Movie {i}', f'Movie {i}', '0', '2000', '\\N', '90', 'Drama'] for i in range(6)
+        ])
+        flush = ImportMoviesCommand.flush
+        calls = []
+
+        def interrupted(command, *args):
+            calls.append(args)
+            if len(calls) == 2:
+                raise KeyboardInterrupt
+            return flush(command, *args)
+
+        with mock.patch.object(ImportMoviesCommand, 'flush', interrupted), self.assertRaises(KeyboardInterrupt):
+            self.import_movies(path, batch_size=2)
+        self.assertEqual(Movie.objects.count(), 2)
+        with open(f'{path}.checkpoint') as f:
+            self.assertEqual(f.read(), '2')
+
+        # The second run upserts only the records after the checkpoint
+        output = self.import_movies(path, batch_size=2, resume=True)
+        self.assertIn('Resuming after 2 records', output)
+        self.assertIn('Imported 4 movies', output)
+        self.assertEqual(Movie.objects.count(), 6)
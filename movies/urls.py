@@ -1,11 +1,12 @@
 # movies/urls.py
 
 from django.urls import path
-from .views import MovieSearchView, OMDbSearchView
+from .views import AsyncOMDbSearchView, MovieSearchView, OMDbSearchView
 
 urlpatterns = [
     path('search/', MovieSearchView.as_view(), name='movie-search'),
     path('omdb/', OMDbSearchView.as_view(), name='omdb-search'),
+    path('omdb/async/', AsyncOMDbSearchView.as_view(), name='omdb-search-async'),
     # Deprecated: Event URLs have been moved to the events app
     # path('events/', MovieEventListCreateView.as_view(), name='event-list'),
     # path('events/<int:pk>/', MovieEventDetailView.as_view(), name='event-detail'),
@@ -1,14 +1,20 @@
 # movies/views.py
 
-from django.core.cache import cache
-from rest_framework import generics, status
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse
+from django.views import View
+from rest_framework import exceptions, generics, status
+from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-import requests
-from django.conf import settings
+from rest_framework.settings import api_settings
 from .models import Movie
+from .omdb import OMDbError
 from .serializers import MovieSerializer, OMDbSearchSerializer
-from datetime import datetime
+from .search import search_movies
+from .services import alookup_movie, lookup_movie
+from movie2gether.pagination import RankedPagination
 import logging
 
 logger = logging.getLogger(__name__)
@@ -16,12 +22,13 @@ logger = logging.getLogger(__name__)
 class MovieSearchView(generics.ListAPIView):
     serializer_class = MovieSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = RankedPagination
 
     def get_queryset(self):
-        query = self.request.query_params.get('query', '')
+        query = self.request.query_params.get('query', '').strip()
         if query:
-            return Movie.objects.filter(title__icontains=query).order_by('-id')
-        return Movie.objects.all().order_by('-id')[:20]  # Return last 20 movies by default
+            return search_movies(query)  # Best match first
+        return Movie.objects.all().order_by('-id')  # Most recently added first
 
 class OMDbSearchView(generics.GenericAPIView):
     serializer_class = OMDbSearchSerializer
@@ -32,58 +39,72 @@ class OMDbSearchView(generics.GenericAPIView):
         serializer.is_valid(raise_exception=True)
         
         title = serializer.validated_data['title']
-        
-        cache_key = f'omdb_{title}'
-        cached_result = cache.get(cache_key)
-        
-        if cached_result:
-            return Response(cached_result)
-            
+
         try:
-            api_key = settings.OMDB_API_KEY
-            # Get exact match by using t= instead of s=
-            response = requests.get(
-                f'http://www.omdbapi.com/?apikey={api_key}&t={title}'
+            result = lookup_movie(title)
+        except OMDbError as e:
+            logger.error('Error searching OMDB: %s', e)
+            return Response(
+                {'message': 'Error searching movie'}, 
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
             )
-            data = response.json()
-            
-            if data.get('Response') == 'True':
-                try:
-                    # Save or update movie in database
-                    movie, created = Movie.objects.update_or_create(
-                        imdb_id=data['imdbID'],
-                        defaults={
-                            'title': data['Title'],
-                            'description': data.get('Plot', ''),
-                            'release_date': datetime.strptime(data.get('Released', '01 Jan 1900'), '%d %b %Y').date(),
-                            'poster_url': data.get('Poster', ''),
-                        }
-                    )
-                    
-                    result = {
-                        'id': movie.id,
-                        'title': movie.title,
-                        'description': movie.description,
-                        'release_date': movie.release_date,
-                        'poster': movie.poster_url,
-                        'imdb_id': movie.imdb_id,
-                    }
-                    
-                    cache.set(cache_key, result, timeout=3600)  # Cache for 1 hour
-                    return Response(result)
-                    
-                except Exception as e:
-                    logger.error(f"Error saving movie {data['Title']}: {str(e)}")
-                    return Response(
-                        {'message': 'Error saving movie'}, 
-                        status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                    )
-                
-            return Response({'message': 'No movie found'}, status=status.HTTP_404_NOT_FOUND)
-            
         except Exception as e:
-            logger.error(f"Error searching OMDB: {str(e)}")
+            logger.error('Error saving movie %s: %s', title, e)
             return Response(
+                {'message': 'Error saving movie'}, 
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+        if result is None:
+            return Response({'message': 'No movie found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(result)
+
+class AsyncOMDbSearchView(View):
+    """
+    Async variant of OMDbSearchView, for ASGI deployments.
+
+    The OMDb call awaits on a pooled async HTTP client instead of blocking
+    a worker thread, so one ASGI worker can keep hundreds of lookups in
+    flight. DRF views cannot be async, so authentication and validation are
+    run through DRF by hand and the response mirrors OMDbSearchView's.
+    """
+
+    async def get(self, request):
+        try:
+            await sync_to_async(self.authenticate)(request)
+        except exceptions.APIException as e:
+            data = e.detail if isinstance(e.detail, (list, dict)) else {'detail': e.detail}
+            return JsonResponse(data, status=e.status_code, safe=False)
+
+        serializer = OMDbSearchSerializer(data=request.GET)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        title = serializer.validated_data['title']
+
+        try:
+            result = await alookup_movie(title)
+        except OMDbError as e:
+            logger.error('Error searching OMDB: %s', e)
+            return JsonResponse(
                 {'message': 'Error searching movie'}, 
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        except Exception as e:
+            logger.error('Error saving movie %s: %s', title, e)
+            return JsonResponse(
+                {'message': 'Error saving movie'}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
\ No newline at end of file
+            )
+
+        if result is None:
+            return JsonResponse({'message': 'No movie found'}, status=status.HTTP_404_NOT_FOUND)
+        return JsonResponse(result, encoder=DjangoJSONEncoder)
+
+    def authenticate(self, request):
+        drf_request = Request(
+            request,
+            authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES],
+        )
+        if not drf_request.user.is_authenticated:
+            raise exceptions.NotAuthenticated()
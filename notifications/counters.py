@@ -0,0 +1,63 @@
+# notifications/counters.py
+"""
+Per-user unread notification counts, kept in the cache.
+
+Reading a count is a single cache GET; only a missing counter falls back
+to counting the unread rows (an index-only count over the partial unread
+index). Creating a notification and marking notifications read adjust the
+counter with atomic INCR/DECR once the change commits.
+
+A counter can still drift, e.g. when a recount races with an increment.
+Three things bring it back: counters expire after UNREAD_TIMEOUT,
+marking everything read resets the counter to zero, and the periodic
+reconcile_unread_counts task recounts users who received notifications
+recently.
+"""
+
+from django.core.cache import cache
+from django.db.models import Count
+
+from .models import Notification
+
+UNREAD_TIMEOUT = 3600
+
+def unread_key(user_id):
+    return f'notifications:unread:{user_id}'
+
+def count_unread(user_id):
+    return Notification.objects.filter(user_id=user_id, is_read=False).count()
+
+def get_unread_count(user_id):
+    key = unread_key(user_id)
+    count = cache.get(key)
+    if count is None or count < 0:
+        count = count_unread(user_id)
+        cache.set(key, count, timeout=UNREAD_TIMEOUT)
+    return count
+
+def change_unread_count(user_id, delta):
+    """Adjust a cached counter; a missing one is recounted on its next read"""
+    try:
+        count = cache.incr(unread_key(user_id), delta)
+    except ValueError:
+        return
+    if count < 0:
+        cache.delete(unread_key(user_id))
+
+def reset_unread_count(user_id):
+    cache.set(unread_key(user_id), 0, timeout=UNREAD_TIMEOUT)
+
+def recount_recent_users(since):
+    """Recount every user who received a notification after `since`; returns how many"""
+    user_ids = set(
+        Notification.objects.filter(created_at__gte=since).values_list('user_id', flat=True).distinct()
+    )
+    if not user_ids:
+        return 0
+    counts = dict.fromkeys(user_ids, 0)
+    counts.update(
+        Notification.objects.filter(user_id__in=user_ids, is_read=False)
+        .values_list('user_id').annotate(unread=Count('id')).order_by()
+    )
+    cache.set_many({unread_key(user_id): count for user_id, count in counts.items()}, timeout=UNREAD_TIMEOUT)
+    return len(counts)
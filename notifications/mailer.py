@@ -0,0 +1,100 @@
+import smtplib
+import socket
+import threading
+import time
+
+from celery.signals import worker_process_shutdown
+from django.conf import settings
+from django.core.mail import get_connection
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Errors that mean the SMTP session is gone, rather than that the server
+# rejected this particular message; the message is retried on a new session
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError, socket.timeout)
+
+class EmailDispatcher:
+    """
+    Send email over one long-lived mail connection instead of one per message.
+
+    `send_many()` sends a list of messages and returns one result per
+    message ({'to': [...], 'sent': bool, 'error': str or None}). A dropped
+    session is reopened and the message retried, and a connection idle for
+    longer than `max_idle` seconds is replaced before the servers time it out.
+    """
+
+    def __init__(self, max_idle=30.0, max_reconnects=2, connection_factory=None):
+        self.max_idle = max_idle
+        self.max_reconnects = max_reconnects
+        self.connection_factory = connection_factory or (lambda: get_connection(fail_silently=False))
+        self.connection = None
+        self.last_used = 0.0
+        self.send_lock = threading.Lock()
+
+    def send_many(self, messages):
+        with self.send_lock:
+            return [self.send_one(message) for message in messages]
+
+    def send_one(self, message):
+        error = None
+        for attempt in range(self.max_reconnects + 1):
+            try:
+                sent = self.get_connection().send_messages([message])
+            except CONNECTION_ERRORS as e:
+                logger.warning('Mail connection lost (%s), reconnecting (attempt %d)', e, attempt + 1)
+                self.discard_connection()
+                error = e
+                continue
+            except Exception as e:
+                error = e
+                break
+            self.last_used = time.monotonic()
+            if sent:
+                return {'to': message.to, 'sent': True, 'error': None}
+            error = 'message has no recipients'
+            break
+        return {'to': message.to, 'sent': False, 'error': str(error)}
+
+    def get_connection(self):
+        if self.connection is not None and time.monotonic() - self.last_used > self.max_idle:
+            self.discard_connection()
+        if self.connection is None:
+            self.connection = self.connection_factory()
+            self.connection.open()
+            self.last_used = time.monotonic()
+        return self.connection
+
+    def discard_connection(self):
+        connection, self.connection = self.connection, None
+        if connection is not None:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+    def close(self):
+        with self.send_lock:
+            self.discard_connection()
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+def get_dispatcher():
+    """
+    The dispatcher of the current process.
+
+    Created lazily so that each Celery worker process opens its own
+    connection after the fork instead of sharing the parent's socket.
+    """
+    global _dispatcher
+    if _dispatcher is None:
+        with _dispatcher_lock:
+            if _dispatcher is None:
+                _dispatcher = EmailDispatcher(max_idle=settings.EMAIL_CONNECTION_MAX_IDLE)
+    return _dispatcher
+
+@worker_process_shutdown.connect
+def close_dispatcher(**kwargs):
+    if _dispatcher is not None:
+        _dispatcher.close()
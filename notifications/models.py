@@ -40,6 +40,50 @@ class Notification(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Inbox pages, newest first, in KeysetPagination order
+            models.Index(fields=['user', '-created_at', '-id'], name='notification_inbox_idx'),
+            # Unread pages and bulk mark-read only touch the (few) unread rows
+            models.Index(
+                fields=['user', '-created_at', '-id'],
+                condition=models.Q(is_read=False),
+                name='notification_unread_idx',
+            ),
+            # Finds the recently notified users whose unread counters are reconciled
+            models.Index(fields=['created_at'], name='notification_created_idx'),
+        ]
 
     def __str__(self):
         return f'{self.notification_type} notification for {self.user.email}: {self.message}'
+
+
+class OutboxMessage(models.Model):
+    """
+    A side effect to publish once the transaction that recorded it commits.
+
+    Rows are written in the same transaction as the change that causes them,
+    so a message exists if and only if that change was committed. The
+    drain_outbox task publishes pending rows in batches; idempotency_key
+    makes the write itself idempotent and travels with the published
+    message so that a retried publish can be recognised.
+    """
+    TOPICS = [
+        ('invitation_email', 'Invitation email'),
+    ]
+
+    topic = models.CharField(max_length=50, choices=TOPICS)
+    payload = models.JSONField(default=dict)
+    idempotency_key = models.CharField(max_length=100, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    published_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            # The drainer only ever looks at pending rows
+            models.Index(fields=['id'], condition=models.Q(published_at__isnull=True), name='outbox_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.topic} {self.idempotency_key}'
@@ -0,0 +1,181 @@
+# notifications/outbox.py
+"""
+Transactional outbox for side effects of committed changes.
+
+Instead of queueing a Celery task straight from a view or signal (which
+fires even if the surrounding transaction later rolls back, and fires
+again if the code path runs twice), the change records an OutboxMessage
+in its own transaction. `drain()` then claims pending rows with
+SELECT ... FOR UPDATE SKIP LOCKED, so concurrent drainers never publish
+the same row, and marks them published in the same transaction.
+"""
+
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .mailer import get_dispatcher
+from .models import OutboxMessage
+import logging
+
+logger = logging.getLogger(__name__)
+
+INVITATION_EMAIL = 'invitation_email'
+
+# Set while a drain job is queued, so a burst of commits queues only one
+DRAIN_SCHEDULED_KEY = 'outbox:drain_scheduled'
+DRAIN_SCHEDULED_TIMEOUT = 60
+
+# How long a published key is remembered. Covers a drainer that dies after
+# sending but before its transaction commits: the row is claimed again, but
+# the message is not sent twice.
+SENT_TIMEOUT = 7 * 24 * 3600
+
+def invitation_email_key(invitation_id):
+    return f'{INVITATION_EMAIL}-{invitation_id}'
+
+def sent_cache_key(idempotency_key):
+    return f'outbox:sent:{idempotency_key}'
+
+def enqueue_invitation_emails(invitation_ids):
+    """
+    Record the emails for these invitations in the caller's transaction.
+
+    The idempotency key is unique per invitation, so recording the same
+    invitation twice still yields a single email.
+    """
+    OutboxMessage.objects.bulk_create([
+        OutboxMessage(
+            topic=INVITATION_EMAIL,
+            payload={'invitation_id': invitation_id},
+            idempotency_key=invitation_email_key(invitation_id),
+        )
+        for invitation_id in invitation_ids
+    ], ignore_conflicts=True)
+    transaction.on_commit(schedule_drain)
+
+def schedule_drain():
+    """Queue a drain job unless one is already waiting to run"""
+    from .tasks import drain_outbox
+
+    try:
+        if cache.add(DRAIN_SCHEDULED_KEY, 1, timeout=DRAIN_SCHEDULED_TIMEOUT):
+            drain_outbox.delay()
+    except Exception as e:
+        # The rows are committed; the periodic drain will publish them
+        cache.delete(DRAIN_SCHEDULED_KEY)
+        logger.error('Error scheduling outbox drain: %s', e)
+
+def drain(batch_size=100, max_attempts=10):
+    """Publish pending messages in batches; returns how many were published"""
+    # Commits from now on must queue a new job, this one may already be past them
+    cache.delete(DRAIN_SCHEDULED_KEY)
+
+    published = 0
+    failed_ids = []
+    while True:
+        with transaction.atomic():
+            messages = list(
+                OutboxMessage.objects
+                .select_for_update(skip_locked=True)
+                .filter(published_at__isnull=True, attempts__lt=max_attempts)
+                .exclude(id__in=failed_ids)
+                .order_by('id')[:batch_size]
+            )
+            if not messages:
+                break
+
+            errors = publish(messages)
+            now = timezone.now()
+            for message in messages:
+                message.attempts += 1
+                error = errors.get(message.id)
+                if error is None:
+                    message.published_at = now
+                    message.last_error = ''
+                    published += 1
+                else:
+                    message.last_error = error
+                    failed_ids.append(message.id)
+            OutboxMessage.objects.bulk_update(messages, ['attempts', 'published_at', 'last_error'])
+
+        if len(messages) < batch_size:
+            break
+
+    if failed_ids:
+        logger.warning('%s outbox messages failed and will be retried', len(failed_ids))
+    return published
+
+def purge_published(before, batch_size=1000):
+    """
+    Delete messages published before `before`, a batch per transaction;
+    returns how many were deleted. Pending and failed rows are kept.
+    """
+    purged = 0
+    while True:
+        ids = list(
+            OutboxMessage.objects.filter(published_at__lt=before).order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return purged
+        with transaction.atomic():
+            OutboxMessage.objects.filter(id__in=ids).delete()
+        purged += len(ids)
+
+def publish(messages):
+    """Publish claimed messages; returns {message id: error} for the ones that failed"""
+    by_topic = defaultdict(list)
+    for message in messages:
+        by_topic[message.topic].append(message)
+
+    errors = {}
+    for topic, batch in by_topic.items():
+        publisher = PUBLISHERS.get(topic)
+        if publisher is None:
+            errors.update((message.id, f'Unknown topic {topic}') for message in batch)
+        else:
+            errors.update(publisher(batch))
+    return errors
+
+def publish_invitation_emails(messages):
+    from events.models import Invitation
+    from .tasks import build_invitation_email
+
+    already_sent = cache.get_many([sent_cache_key(message.idempotency_key) for message in messages])
+    invitations = Invitation.objects.select_related('event__host').in_bulk(
+        [message.payload['invitation_id'] for message in messages]
+    )
+
+    pending = []
+    for message in messages:
+        invitation = invitations.get(message.payload['invitation_id'])
+        if sent_cache_key(message.idempotency_key) in already_sent:
+            continue
+        if invitation is None:
+            # Deleted before the email went out; nothing left to send
+            logger.warning('Invitation %s not found, dropping its email', message.payload['invitation_id'])
+            continue
+        email = build_invitation_email(invitation)
+        # A stable Message-ID lets mail servers drop a duplicate delivery
+        email.extra_headers['Message-ID'] = f'<{message.idempotency_key}@{settings.OUTBOX_MESSAGE_ID_DOMAIN}>'
+        email.extra_headers['X-Idempotency-Key'] = message.idempotency_key
+        pending.append((message, email))
+
+    errors = {}
+    sent = {}
+    results = get_dispatcher().send_many([email for message, email in pending])
+    for (message, email), result in zip(pending, results):
+        if result['sent']:
+            sent[sent_cache_key(message.idempotency_key)] = 1
+        else:
+            logger.error('Error sending invitation email to %s: %s', ', '.join(result['to']), result['error'])
+            errors[message.id] = result['error']
+    cache.set_many(sent, timeout=SENT_TIMEOUT)
+    return errors
+
+PUBLISHERS = {
+    INVITATION_EMAIL: publish_invitation_emails,
+}
@@ -0,0 +1,197 @@
+# notifications/realtime.py
+"""
+Push notification and invitation updates to connected browsers.
+
+Producers (views, signals, Celery workers) call `publish()` or
+`publish_many()` from ordinary sync code. Consumers are the streams held
+open by NotificationStreamView: each one registers a queue with its
+process's broker via `subscribe()`.
+
+With the Redis broker, a process keeps a single pub/sub connection and
+subscribes it to a user's channel only while that user has a stream open
+in the process, then hands every message to that user's local queues. An
+idle stream therefore costs one small queue and a suspended coroutine, not
+a Redis connection or a thread. The in-memory broker does the same fan-out
+within one process, for tests and single-process development.
+
+Delivery is best effort: a stream that falls too far behind, or was not
+connected when the message was published, catches up by re-fetching.
+"""
+
+import asyncio
+import json
+import threading
+import weakref
+from collections import defaultdict
+
+import redis
+import redis.asyncio
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Messages buffered per stream; a stream that falls further behind drops them
+QUEUE_SIZE = 100
+# Pause before reading again after the Redis connection fails
+RECONNECT_DELAY = 1.0
+
+def channel_name(user_id):
+    return f'notifications:user:{user_id}'
+
+class Broker:
+    """Fans the messages for a user out to that user's streams on this event loop"""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.queues = defaultdict(set)
+
+    async def subscribe(self, user_id):
+        """Return a queue that receives the user's messages until unsubscribed"""
+        queue = asyncio.Queue(QUEUE_SIZE)
+        first = not self.queues[user_id]
+        self.queues[user_id].add(queue)
+        if first:
+            await self.watch(user_id)
+        return queue
+
+    async def unsubscribe(self, user_id, queue):
+        self.queues[user_id].discard(queue)
+        if not self.queues[user_id]:
+            del self.queues[user_id]
+            await self.unwatch(user_id)
+
+    def deliver(self, user_id, data):
+        for queue in self.queues.get(user_id, ()):
+            try:
+                queue.put_nowait(data)
+            except asyncio.QueueFull:
+                logger.warning('Dropping a notification for user %s, their stream is too slow', user_id)
+
+    async def watch(self, user_id):
+        """Start receiving messages for this user"""
+
+    async def unwatch(self, user_id):
+        """Stop receiving messages for this user"""
+
+class MemoryBroker(Broker):
+    """Receives messages published in this process only"""
+
+class RedisBroker(Broker):
+    """Receives messages through one Redis pub/sub connection per process"""
+
+    def __init__(self, loop, url):
+        super().__init__(loop)
+        self.pubsub = redis.asyncio.from_url(url).pubsub(ignore_subscribe_messages=True)
+        self.reader = None
+
+    async def watch(self, user_id):
+        await self.pubsub.subscribe(channel_name(user_id))
+        if self.reader is None:
+            self.reader = asyncio.create_task(self.read())
+
+    async def unwatch(self, user_id):
+        try:
+            await self.pubsub.unsubscribe(channel_name(user_id))
+        except redis.RedisError as e:
+            # Resubscribing after a reconnect only restores live channels
+            logger.warning('Error unsubscribing from notifications: %s', e)
+
+    async def read(self):
+        # Runs for the life of the process; an idle pub/sub connection is cheap.
+        # Every error is survived, since a dead reader silences all the
+        # process's streams; the pub/sub reconnects on the next read.
+        while True:
+            try:
+                message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=None)
+                if message is None or message['type'] != 'message':
+                    continue
+                user_id = int(message['channel'].decode().rsplit(':', 1)[1])
+                self.deliver(user_id, message['data'].decode())
+            except redis.RedisError as e:
+                logger.error('Notification subscription failed, reconnecting: %s', e)
+                await asyncio.sleep(RECONNECT_DELAY)
+            except Exception:
+                logger.exception('Notification reader failed, reconnecting')
+                await asyncio.sleep(RECONNECT_DELAY)
+
+# One broker per event loop, since asyncio queues and connections cannot be
+# shared between loops; in production that is one per ASGI worker process
+_brokers = weakref.WeakKeyDictionary()
+_redis = None
+_redis_lock = threading.Lock()
+
+def get_broker():
+    loop = asyncio.get_running_loop()
+    broker = _brokers.get(loop)
+    if broker is None:
+        if settings.NOTIFICATIONS_BROKER == 'memory':
+            broker = MemoryBroker(loop)
+        else:
+            broker = RedisBroker(loop, settings.NOTIFICATIONS_REDIS_URL)
+        _brokers[loop] = broker
+    return broker
+
+def get_redis():
+    global _redis
+    if _redis is None:
+        with _redis_lock:
+            if _redis is None:
+                _redis = redis.Redis.from_url(settings.NOTIFICATIONS_REDIS_URL)
+    return _redis
+
+def notification_message(notification):
+    from .serializers import NotificationSerializer
+    return {'type': 'notification', 'notification': NotificationSerializer(notification).data}
+
+def invitation_message(invitation):
+    from events.serializers import InvitationSerializer
+    return {'type': 'invitation', 'invitation': InvitationSerializer(invitation).data}
+
+def invitation_change_message(invitation):
+    """A response to an invitation, without the nested event"""
+    return {
+        'type': 'invitation_change',
+        'invitation': {
+            'id': invitation.id,
+            'event_id': invitation.event_id,
+            'invitee_email': invitation.invitee_email,
+            'status': invitation.status,
+            'responded_at': invitation.responded_at,
+        },
+    }
+
+def publish(user_id, message):
+    publish_many([(user_id, message)])
+
+def publish_many(messages):
+    """Push (user id, message) pairs to the users' open streams"""
+    if not messages:
+        return
+    encoded = [(user_id, json.dumps(message, cls=DjangoJSONEncoder)) for user_id, message in messages]
+    try:
+        if settings.NOTIFICATIONS_BROKER == 'memory':
+            for broker in list(_brokers.values()):
+                if broker.loop.is_closed():
+                    continue
+                for user_id, data in encoded:
+                    broker.loop.call_soon_threadsafe(broker.deliver, user_id, data)
+        else:
+            pipeline = get_redis().pipeline(transaction=False)
+            for user_id, data in encoded:
+                pipeline.publish(channel_name(user_id), data)
+            pipeline.execute()
+    except Exception as e:
+        # Pushes are a convenience; the data is already committed
+        logger.error('Error publishing notifications: %s', e)
+
+@receiver(setting_changed)
+def reset_brokers(setting, **kwargs):
+    """Start over when tests switch brokers"""
+    global _redis
+    if setting.startswith('NOTIFICATIONS_'):
+        _brokers.clear()
+        _redis = None
@@ -5,7 +5,16 @@ from .models import Notification
 class NotificationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Notification
-        fields = ['id', 'recipient', 'sender', 'event', 'notification_type', 'message', 'created_at', 'is_read']
+        fields = ['id', 'user', 'sender', 'event', 'notification_type', 'message', 'created_at', 'is_read']
 
 class JoinRequestSerializer(serializers.Serializer):
-    event_id = serializers.IntegerField(required=True)
\ No newline at end of file
+    event_id = serializers.IntegerField(required=True)
+
+class MarkReadSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False, max_length=1000)
+    all = serializers.BooleanField(default=False)
+
+    def validate(self, data):
+        if not data.get('ids') and not data['all']:
+            raise serializers.ValidationError('Provide the notification ids to mark read, or all=true.')
+        return data
@@ -1,12 +1,15 @@
 import logging
+from django.db import transaction
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.conf import settings
-from events.models import Invitation
+from events.models import Event, Invitation
 from django.core.mail import send_mail
 from django.template.loader import render_to_string
 from .models import Notification
-from .tasks import send_invitation_email
+from .counters import change_unread_count
+from .outbox import enqueue_invitation_emails
+from .realtime import invitation_change_message, invitation_message, notification_message, publish, publish_many
 
 logger = logging.getLogger(__name__)
 
@@ -14,10 +17,38 @@ logger = logging.getLogger(__name__)
 def invitation_post_save(sender, instance, created, **kwargs):
     """
     Signal handler to send email notifications when a new invitation is created
+
+    The email is recorded in the outbox within the invitation's transaction
+    and sent once it commits; see notifications.outbox.
     """
-    try:
-        if created:
-            logger.info(f"Sending invitation email for invitation {instance.id}")
-            send_invitation_email.delay(instance.id)
-    except Exception as e:
-        logger.error(f"Error queuing invitation email: {str(e)}")
+    if created:
+        logger.info("Recording invitation email for invitation %s", instance.id)
+        enqueue_invitation_emails([instance.id])
+
+    # A signed-up invitee hears about a new invitation, with the event in
+    # full; the invitee and the host hear about changes, with just the
+    # invitation's own fields. Built after commit, and only when needed.
+    if created:
+        if instance.invitee_id:
+            transaction.on_commit(lambda: publish(instance.invitee_id, invitation_message(instance)))
+        return
+    message = invitation_change_message(instance)
+    event = instance.event if Invitation.event.is_cached(instance) else None
+    transaction.on_commit(lambda: publish_invitation_change(instance.invitee_id, instance.event_id, event, message))
+
+def publish_invitation_change(invitee_id, event_id, event, message):
+    # The event is only loaded when the caller had it; otherwise fetch the host id alone
+    if event is not None:
+        host_id = event.host_id
+    else:
+        host_id = Event.objects.filter(pk=event_id).values_list('host_id', flat=True).first()
+    publish_many([(user_id, message) for user_id in (invitee_id, host_id) if user_id])
+
+@receiver(post_save, sender=Notification)
+def notification_post_save(sender, instance, created, **kwargs):
+    """Count new notifications as unread and push them to the recipient's open streams"""
+    if created:
+        message = notification_message(instance)
+        if not instance.is_read:
+            transaction.on_commit(lambda: change_unread_count(instance.user_id, 1))
+        transaction.on_commit(lambda: publish(instance.user_id, message))
@@ -1,59 +1,68 @@
+from datetime import timedelta
+
 from celery import shared_task
-from django.core.mail import send_mail
+from django.core.mail import EmailMessage
 from django.conf import settings
+from django.utils import timezone
+from .mailer import get_dispatcher
 import logging
 
 logger = logging.getLogger(__name__)
 
+def build_invitation_email(invitation):
+    """Build the email inviting invitation.invitee_email to the event"""
+    event = invitation.event
+
+    subject = f'Invitation to Movie Event: {event.title}'
+    message = (
+        f"Hello!\n\n"
+        f"You have been invited to join a movie event!\n\n"
+        f"Event Details:\n"
+        f"- Movie: {event.title}\n"
+        f"- Date: {event.date}\n"
+        f"- Location: {event.location}\n"
+        f"- Host: {event.host.email}\n\n"
+        f"Description: {event.description}\n\n"
+        f"Please log in to Movie2gether to accept or decline this invitation.\n\n"
+        f"Best regards,\n"
+        f"Movie2gether Team"
+    )
+
+    return EmailMessage(
+        subject=subject,
+        body=message,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[invitation.invitee_email],
+    )
+
 @shared_task
-def send_invitation_email(invitation_id):
-    """Send an invitation email to a user for an event"""
-    try:
-        # Import models here to avoid circular imports
-        from events.models import Invitation
-        
-        # Get the invitation details
-        invitation = Invitation.objects.get(id=invitation_id)
-        event = invitation.event
-        
-        subject = f'Invitation to Movie Event: {event.title}'
-        message = (
-            f"Hello!\n\n"
-            f"You have been invited to join a movie event!\n\n"
-            f"Event Details:\n"
-            f"- Movie: {event.title}\n"
-            f"- Date: {event.date}\n"
-            f"- Location: {event.location}\n"
-            f"- Host: {event.host.email}\n\n"
-            f"Description: {event.description}\n\n"
-            f"Please log in to Movie2gether to accept or decline this invitation.\n\n"
-            f"Best regards,\n"
-            f"Movie2gether Team"
-        )
-        
-        email_from = settings.DEFAULT_FROM_EMAIL
-        recipient_list = [invitation.invitee_email]
-        
-        logger.info(f'Sending invitation email for event {event.id} to {invitation.invitee_email}')
-        
-        # Send the email
-        send_mail(
-            subject=subject,
-            message=message,
-            from_email=email_from,
-            recipient_list=recipient_list,
-            fail_silently=False,
-        )
-        
-        logger.info(f'Invitation email sent successfully to {invitation.invitee_email}')
-        return True
-        
-    except Invitation.DoesNotExist:
-        logger.error(f'Invitation with id {invitation_id} not found')
-        return False
-    except Exception as e:
-        logger.error(f'Error sending invitation email: {str(e)}')
-        return False
+def drain_outbox():
+    """Publish pending outbox messages, such as invitation emails"""
+    from .outbox import drain
+
+    published = drain(batch_size=settings.OUTBOX_BATCH_SIZE, max_attempts=settings.OUTBOX_MAX_ATTEMPTS)
+    if published:
+        logger.info('Published %s outbox messages', published)
+    return published
+
+@shared_task
+def purge_outbox():
+    """Delete outbox messages published more than OUTBOX_RETENTION_DAYS ago"""
+    from .outbox import purge_published
+
+    before = timezone.now() - timedelta(days=settings.OUTBOX_RETENTION_DAYS)
+    purged = purge_published(before, batch_size=settings.OUTBOX_PURGE_BATCH_SIZE)
+    if purged:
+        logger.info('Purged %s published outbox messages', purged)
+    return purged
+
+@shared_task
+def reconcile_unread_counts():
+    """Repair the cached unread counters of users who got notifications recently"""
+    from .counters import recount_recent_users
+
+    since = timezone.now() - timedelta(seconds=settings.NOTIFICATIONS_RECONCILE_WINDOW)
+    return recount_recent_users(since)
 
 @shared_task
 def send_join_request_email(user_email, event_id):
@@ -91,14 +100,16 @@ def send_join_request_email(user_email, event_id):
         logger.info(f'Sending join request email for event {event_id} to {event.host.email}')
         logger.info(f'Using sender email: {sender_email}')
         
-        # Send the email
-        send_mail(
+        # Send the email over the worker's shared connection, right away
+        email = EmailMessage(
             subject=subject,
-            message=message,
+            body=message,
             from_email=sender_email,
-            recipient_list=[event.host.email],
-            fail_silently=False,
+            to=[event.host.email],
         )
+        result = get_dispatcher().send_many([email])[0]
+        if not result['sent']:
+            raise RuntimeError(result['error'])
         
         logger.info(f'Join request email sent successfully to {event.host.email}')
         return True
@@ -1,3 +1,372 @@
-from django.test import TestCase
+import asyncio
+import json
+import smtplib
+from datetime import date, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from asgiref.sync import sync_to_async
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from events.models import Event, Invitation
+from movie2gether.testing import analyze, eager_tasks, max_queries, no_sequential_scans
+from movies.models import Movie
+from .mailer import EmailDispatcher
+from .realtime import RedisBroker
+from .models import Notification, OutboxMessage
+from .counters import unread_key
+from .tasks import drain_outbox, purge_outbox, reconcile_unread_counts
+
+User = get_user_model()
+
+
+class FlakyConnection:
+    """
+    Wraps the locmem backend, drops the session after `drop_after` messages
+    and refuses the recipients in `refuse`, like an SMTP server would
+    """
+
+    opened = 0
+
+    def __init__(self, drop_after=100, refuse=()):
+        self.backend = get_connection()
+        self.drop_after = drop_after
+        self.refuse = refuse
+
+    def open(self):
+        FlakyConnection.opened += 1
+
+    def close(self):
+        pass
+
+    def send_messages(self, messages):
+        if self.drop_after == 0:
+            raise smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+        self.drop_after -= 1
+        for recipient in messages[0].to:
+            if recipient in self.refuse:
+                raise smtplib.SMTPRecipientsRefused({recipient: (550, b'No such user')})
+        return self.backend.send_messages(messages)
+
+
+def message(to):
+    return EmailMessage(subject='Hello', body='Body', from_email='noreply@example.com', to=[to])
+
+
+class EmailDispatcherTests(SimpleTestCase):
+
+    def setUp(self):
+        FlakyConnection.opened = 0
+
+    def test_send_many_reuses_one_connection(self):
+        dispatcher = EmailDispatcher(connection_factory=FlakyConnection)
+        results = dispatcher.send_many([message(f'guest{i}@example.com') for i in range(10)])
+        self.assertTrue(all(result['sent'] for result in results))
+        self.assertEqual(len(mail.outbox), 10)
+        self.assertEqual(FlakyConnection.opened, 1)
+
+    def test_reconnects_when_the_session_drops(self):
+        dispatcher = EmailDispatcher(connection_factory=lambda: FlakyConnection(drop_after=2))
+        results = dispatcher.send_many([message(f'guest{i}@example.com') for i in range(5)])
+        self.assertTrue(all(result['sent'] for result in results))
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(FlakyConnection.opened, 3)
+
+    def test_reports_per_message_failures(self):
+        dispatcher = EmailDispatcher(connection_factory=lambda: FlakyConnection(refuse=['nobody@example.com']))
+        results = dispatcher.send_many([message('nobody@example.com'), message('guest@example.com')])
+        self.assertEqual([result['sent'] for result in results], [False, True])
+        self.assertIn('No such user', results[0]['error'])
+        self.assertEqual(FlakyConnection.opened, 1)
+
+
+class EventTestCase(TestCase):
+    """Tests around one upcoming event, its host and a guest, with tasks run eagerly"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.host = User.objects.create_user(email='host@example.com', username='host', password='pw')
+        cls.guest = User.objects.create_user(email='guest@example.com', username='guest', password='pw')
+        movie = Movie.objects.create(
+            title='Movie', description='', release_date=date(2000, 1, 1),
+            poster_url='https://example.com/poster.jpg', imdb_id='tt0000001',
+        )
+        cls.event = Event.objects.create(
+            movie=movie, title='Event', date=timezone.now() + timedelta(days=1), location='Somewhere', host=cls.host,
+        )
+
+    def setUp(self):
+        cache.clear()
+        # Committed invitations and join requests queue outbox drains
+        tasks = eager_tasks()
+        tasks.__enter__()
+        self.addCleanup(tasks.__exit__, None, None, None)
+        self.client = APIClient()
+
+
+class OutboxTests(EventTestCase):
+    """Each committed invitation gets exactly one email"""
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.host)
+
+    def test_invitation_is_emailed_once(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                f'/api/events/{self.event.id}/invite/', {'invitee_email': 'guest@example.com'}, format='json'
+            )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(OutboxMessage.objects.count(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].extra_headers['X-Idempotency-Key'], f'invitation_email-{response.data["id"]}')
+        self.assertIsNotNone(OutboxMessage.objects.get().published_at)
+
+        # Draining again publishes nothing new
+        self.assertEqual(drain_outbox(), 0)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_old_published_messages_are_purged(self):
+        now = timezone.now()
+        for i, published_at in enumerate([now - timedelta(days=30), now - timedelta(days=8), now, None]):
+            OutboxMessage.objects.create(
+                topic='invitation_email', payload={}, idempotency_key=f'key-{i}', published_at=published_at,
+            )
+        with override_settings(OUTBOX_PURGE_BATCH_SIZE=1):
+            self.assertEqual(purge_outbox(), 2)
+        self.assertEqual(sorted(OutboxMessage.objects.values_list('idempotency_key', flat=True)), ['key-2', 'key-3'])
+
+    def test_bulk_invitations_are_emailed_in_one_drain(self):
+        emails = [f'friend{i}@example.com' for i in range(5)]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/events/{self.event.id}/invite/bulk/', {'emails': emails}, format='json')
+        self.assertFalse(OutboxMessage.objects.filter(published_at__isnull=True).exists())
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), emails)
+
+    def test_rolled_back_invitation_is_not_emailed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    Invitation.objects.create(event=self.event, invitee_email='guest@example.com')
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertFalse(OutboxMessage.objects.exists())
+        self.assertEqual(drain_outbox(), 0)
+        self.assertEqual(len(mail.outbox), 0)
+
+
+@override_settings(NOTIFICATIONS_BROKER='memory')
+class NotificationStreamTests(EventTestCase):
+    """New notifications and invitations reach the user's open stream"""
+
+    async def get_ticket(self, user):
+        response = await self.async_client.post(
+            '/api/notifications/stream/ticket/', headers={'Authorization': f'Bearer {AccessToken.for_user(user)}'},
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.json()['ticket']
+
+    async def open_stream(self, user):
+        response = await self.async_client.get('/api/notifications/stream/', {'ticket': await self.get_ticket(user)})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = response.streaming_content.__aiter__()
+        self.assertEqual(await stream.__anext__(), b'retry: 5000\n\n')  # Subscribed from here on
+        return stream
+
+    async def next_message(self, stream):
+        chunk = await asyncio.wait_for(stream.__anext__(), timeout=1)
+        self.assertTrue(chunk.startswith(b'data: '))
+        return json.loads(chunk[len(b'data: '):])
+
+    def commit(self, create):
+        with self.captureOnCommitCallbacks(execute=True):
+            return create()
+
+    async def test_streams_notifications_and_invitations(self):
+        stream = await self.open_stream(self.host)
+        notification = await sync_to_async(self.commit)(lambda: Notification.objects.create(
+            user=self.host, sender=self.guest, event=self.event,
+            notification_type='join_request', message='guest@example.com wants to join your event',
+        ))
+        message = await self.next_message(stream)
+        self.assertEqual(message['type'], 'notification')
+        self.assertEqual(message['notification']['id'], notification.id)
+
+        guest_stream = await self.open_stream(self.guest)
+        invitation = await sync_to_async(self.commit)(lambda: Invitation.objects.create(
+            event=self.event, invitee=self.guest, invitee_email=self.guest.email,
+        ))
+        message = await self.next_message(guest_stream)
+        self.assertEqual(message['type'], 'invitation')
+        self.assertEqual(message['invitation']['id'], invitation.id)
+
+        # Responses reach the host as a flat payload
+        def respond():
+            invitation = Invitation.objects.get(event=self.event, invitee=self.guest)
+            invitation.status = 'accepted'
+            invitation.save()
+        await sync_to_async(self.commit)(respond)
+        message = await self.next_message(stream)
+        self.assertEqual(message['type'], 'invitation_change')
+        self.assertEqual((message['invitation']['id'], message['invitation']['status']), (invitation.id, 'accepted'))
+        self.assertEqual((await self.next_message(guest_stream))['type'], 'invitation_change')
+        await stream.aclose()
+        await guest_stream.aclose()
+
+    async def test_requires_authentication(self):
+        response = await self.async_client.get('/api/notifications/stream/', {'ticket': 'not-a-ticket'})
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.get('/api/notifications/stream/')
+        self.assertEqual(response.status_code, 401)
+        # Access tokens are not accepted in the URL
+        response = await self.async_client.get('/api/notifications/stream/', {'token': str(AccessToken.for_user(self.host))})
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.post('/api/notifications/stream/ticket/')
+        self.assertEqual(response.status_code, 401)
+
+    async def test_tickets_are_single_use(self):
+        ticket = await self.get_ticket(self.host)
+        response = await self.async_client.get('/api/notifications/stream/', {'ticket': ticket})
+        self.assertEqual(response.status_code, 200)
+        await response.streaming_content.__aiter__().aclose()
+        response = await self.async_client.get('/api/notifications/stream/', {'ticket': ticket})
+        self.assertEqual(response.status_code, 401)
+
+
+class RedisBrokerTests(SimpleTestCase):
+
+    async def test_reader_survives_unexpected_errors(self):
+        broker = RedisBroker(asyncio.get_running_loop(), 'redis://localhost:6379/0')
+        messages = [RuntimeError('boom'), {'type': 'message', 'channel': b'notifications:user:1', 'data': b'{}'}]
+
+        async def get_message(**kwargs):
+            if not messages:
+                await asyncio.Event().wait()
+            message = messages.pop(0)
+            if isinstance(message, Exception):
+                raise message
+            return message
+
+        broker.pubsub = mock.Mock(get_message=get_message, subscribe=mock.AsyncMock())
+        with mock.patch('notifications.realtime.RECONNECT_DELAY', 0):
+            queue = await broker.subscribe(1)
+            self.assertEqual(await asyncio.wait_for(queue.get(), timeout=1), '{}')
+        broker.reader.cancel()
+
+
+class InboxTests(TestCase):
+    """The inbox pages by cursor and marks many notifications read at once"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='guest@example.com', username='guest', password='pw')
+        other = User.objects.create_user(email='other@example.com', username='other', password='pw')
+        Notification.objects.bulk_create(
+            [Notification(user=cls.user, message=f'Message {i}', is_read=i % 3 == 0) for i in range(30)]
+            + [Notification(user=other, message='Not yours') for i in range(5)]
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def collect(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids += [notification['id'] for notification in response.data['results']]
+            url = response.data['next']
+        return ids
+
+    def test_pages_through_inbox(self):
+        ids = self.collect('/api/notifications/?page_size=7')
+        expected = list(Notification.objects.filter(user=self.user).order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+
+        unread = self.collect('/api/notifications/?unread=true&page_size=7')
+        self.assertEqual(len(unread), 20)
+
+    def test_mark_read(self):
+        some = list(Notification.objects.filter(user=self.user, is_read=False).values_list('id', flat=True)[:3])
+        other = Notification.objects.exclude(user=self.user).values_list('id', flat=True)[0]
+        with max_queries(1):
+            response = self.client.post('/api/notifications/mark-read/', {'ids': some + [other]}, format='json')
+        self.assertEqual(response.data['updated'], 3)
+        self.assertFalse(Notification.objects.get(id=other).is_read)
+
+        response = self.client.post('/api/notifications/mark-read/', {'all': True}, format='json')
+        self.assertEqual(response.data['updated'], 17)
+        self.assertFalse(Notification.objects.filter(user=self.user, is_read=False).exists())
+
+        response = self.client.post('/api/notifications/mark-read/', {}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class UnreadCountTests(EventTestCase):
+    """The unread count comes from the cache and follows notifications as they change"""
+
+    def unread(self):
+        self.client.force_authenticate(self.host)
+        return self.client.get('/api/notifications/unread-count/').data['unread']
+
+    def test_counter_follows_join_requests_and_reads(self):
+        self.assertEqual(self.unread(), 0)
+
+        self.client.force_authenticate(self.guest)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/notifications/join-request/', {'event_id': self.event.id}, format='json')
+        self.assertEqual(response.status_code, 201)
+
+        with max_queries(0):
+            self.assertEqual(self.unread(), 1)
+
+        self.client.post('/api/notifications/mark-read/', {'ids': [response.data['notification_id']]}, format='json')
+        self.assertEqual(self.unread(), 0)
+
+    def test_reconcile_repairs_drift(self):
+        Notification.objects.create(user=self.host, message='Hello')
+        cache.set(unread_key(self.host.id), 42)
+        self.assertEqual(reconcile_unread_counts(), 1)
+        self.assertEqual(self.unread(), 1)
+
+
+class NotificationQueryPlanTests(TestCase):
+    """Inbox queries are index lookups at production-like volumes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        users = User.objects.bulk_create([
+            User(email=f'user{i}@example.com', username=f'user{i}', password='!') for i in range(200)
+        ])
+        Notification.objects.bulk_create([
+            Notification(user=users[i % 200], message=f'Message {i}', is_read=i % 10 != 0) for i in range(20000)
+        ])
+        analyze()
+        cls.user = users[0]
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_inbox_endpoints(self):
+        with no_sequential_scans():
+            first = self.client.get('/api/notifications/')
+            second = self.client.get(first.data['next'])
+            unread = self.client.get('/api/notifications/?unread=true')
+            count = self.client.get('/api/notifications/unread-count/')
+        # An error page runs fewer queries and would pass the plan check
+        for response in (first, second, unread, count):
+            self.assertEqual(response.status_code, 200)
+        for response in (first, second, unread):
+            self.assertTrue(response.data['results'])
+        self.assertEqual(count.data['unread'], 100)
@@ -0,0 +1,33 @@
+# notifications/tickets.py
+"""
+Single-use tickets for opening a notification stream.
+
+EventSource cannot send an Authorization header, and a JWT put in the
+query string instead ends up in proxy and server access logs. A client
+therefore POSTs for a ticket with its usual credentials and opens the
+stream with `?ticket=`. A ticket is a random string, good for one stream
+and for NOTIFICATIONS_STREAM_TICKET_TIMEOUT seconds, that grants nothing
+else; a reconnecting client asks for a new one.
+"""
+
+import secrets
+
+from django.conf import settings
+from django.core.cache import cache
+
+def ticket_key(ticket):
+    return f'notifications:stream-ticket:{ticket}'
+
+def issue_ticket(user_id):
+    ticket = secrets.token_urlsafe(32)
+    cache.set(ticket_key(ticket), user_id, timeout=settings.NOTIFICATIONS_STREAM_TICKET_TIMEOUT)
+    return ticket
+
+def redeem_ticket(ticket):
+    """The id of the user the ticket was issued to, or None; each ticket works once"""
+    key = ticket_key(ticket)
+    user_id = cache.get(key)
+    # Of two concurrent redemptions, only one gets to delete the key
+    if user_id is None or not cache.delete(key):
+        return None
+    return user_id
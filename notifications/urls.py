@@ -1,6 +1,14 @@
 from django.urls import path
-from .views import JoinRequestView
+from .views import (
+    JoinRequestView, NotificationListView, NotificationMarkReadView, NotificationStreamView, StreamTicketView,
+    UnreadCountView,
+)
 
 urlpatterns = [
+    path('', NotificationListView.as_view(), name='notification-list'),
+    path('mark-read/', NotificationMarkReadView.as_view(), name='notification-mark-read'),
+    path('unread-count/', UnreadCountView.as_view(), name='notification-unread-count'),
     path('join-request/', JoinRequestView.as_view(), name='join-request'),
+    path('stream/', NotificationStreamView.as_view(), name='notification-stream'),
+    path('stream/ticket/', StreamTicketView.as_view(), name='notification-stream-ticket'),
 ]
\ No newline at end of file
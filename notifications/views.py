@@ -1,11 +1,24 @@
-from rest_framework import generics, permissions, status
+import asyncio
+
+from asgiref.sync import sync_to_async
+from rest_framework import exceptions, generics, permissions, status
+from rest_framework.request import Request
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from django.conf import settings
+from django.db import connections
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.contrib.auth import get_user_model
+from django.views import View
 from events.models import Event, Invitation
 from .models import Notification
 from .tasks import send_join_request_email
-from .serializers import NotificationSerializer, JoinRequestSerializer
+from .counters import change_unread_count, get_unread_count, reset_unread_count
+from .realtime import get_broker
+from .tickets import issue_ticket, redeem_ticket
+from .serializers import NotificationSerializer, JoinRequestSerializer, MarkReadSerializer
+from movie2gether.pagination import KeysetPagination
 import logging
 
 logger = logging.getLogger(__name__)
@@ -13,11 +26,112 @@ logger = logging.getLogger(__name__)
 User = get_user_model()
 
 class NotificationListView(generics.ListAPIView):
+    """The user's inbox, newest first; `?unread=true` lists only unread notifications"""
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
-        return Notification.objects.filter(user=self.request.user).order_by('-created_at')
+        queryset = Notification.objects.filter(user=self.request.user)
+        if self.request.query_params.get('unread', '').lower() in ('true', '1'):
+            queryset = queryset.filter(is_read=False)
+        return queryset
+
+class NotificationMarkReadView(generics.GenericAPIView):
+    """Mark the given notifications, or all of them, read with a single UPDATE"""
+    serializer_class = MarkReadSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        queryset = Notification.objects.filter(user=request.user, is_read=False)
+        if serializer.validated_data['all']:
+            updated = queryset.update(is_read=True)
+            reset_unread_count(request.user.id)
+        else:
+            updated = queryset.filter(id__in=serializer.validated_data['ids']).update(is_read=True)
+            change_unread_count(request.user.id, -updated)
+        return Response({'updated': updated})
+
+class UnreadCountView(generics.GenericAPIView):
+    """The user's unread notification count, served from the cache"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        return Response({'unread': get_unread_count(request.user.id)})
+
+class NotificationStreamView(View):
+    """
+    Server-Sent Events stream of the user's new notifications and invitation changes.
+
+    Each event's data is a JSON object whose `type` is "notification",
+    "invitation" (a new invitation, with its event) or "invitation_change"
+    (a response, with the invitation's own fields only). EventSource cannot
+    send an Authorization header, so the stream is opened with a single-use
+    `?ticket=` from StreamTicketView; the session cookie works too. Serve
+    this under ASGI (uvicorn): there an open stream is a suspended
+    coroutine rather than a blocked worker thread.
+    """
+
+    async def get(self, request):
+        try:
+            user_id = await sync_to_async(self.authenticate)(request)
+        except exceptions.APIException as e:
+            return JsonResponse({'detail': e.detail}, status=e.status_code)
+
+        response = StreamingHttpResponse(self.stream(user_id), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # Stop nginx from holding events back
+        return response
+
+    async def stream(self, user_id):
+        broker = get_broker()
+        queue = await broker.subscribe(user_id)
+        try:
+            # Reconnect delay for the browser, in milliseconds
+            yield 'retry: 5000\n\n'
+            while True:
+                try:
+                    data = await asyncio.wait_for(queue.get(), timeout=settings.NOTIFICATIONS_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    # A comment line keeps proxies from closing an idle stream
+                    yield ': keepalive\n\n'
+                    continue
+                yield f'data: {data}\n\n'
+        finally:
+            # Runs when the client disconnects and the response is cancelled
+            await broker.unsubscribe(user_id, queue)
+
+    def authenticate(self, request):
+        try:
+            ticket = request.GET.get('ticket')
+            if ticket:
+                user_id = redeem_ticket(ticket)
+                if user_id is None:
+                    raise exceptions.AuthenticationFailed('Invalid or expired stream ticket')
+                return user_id
+            user = Request(
+                request,
+                authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES],
+            ).user
+            if not user.is_authenticated:
+                raise exceptions.NotAuthenticated()
+            return user.id
+        finally:
+            # The stream outlives the request handling; do not pin a database
+            # connection to it for hours
+            for connection in connections.all(initialized_only=True):
+                if not connection.in_atomic_block:
+                    connection.close()
+
+class StreamTicketView(generics.GenericAPIView):
+    """Issue a short-lived, single-use ticket for opening NotificationStreamView"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        return Response({'ticket': issue_ticket(request.user.id)}, status=status.HTTP_201_CREATED)
 
 class JoinRequestView(generics.CreateAPIView):
     serializer_class = JoinRequestSerializer
@@ -63,7 +177,7 @@ class JoinRequestView(generics.CreateAPIView):
                 message=f"{user.email} wants to join your event"
             )
 
-            logger.info(f"Created notification {notification.id} for join request to event {event_id}")
+            logger.info("Created notification %s for join request to event %s", notification.id, event_id)
 
             # Send email to host
             send_join_request_email.delay(
@@ -71,7 +185,7 @@ class JoinRequestView(generics.CreateAPIView):
                 event.id
             )
 
-            logger.info(f"Queued join request email for event {event_id}")
+            logger.info("Queued join request email for event %s", event_id)
 
             return Response({
                 "message": "Join request sent successfully",